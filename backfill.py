@@ -0,0 +1,214 @@
+import os
+import subprocess
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime
+
+import mysql.connector
+import yaml
+
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append("ingestion")
+from async_fetch import shared_rate_limit
+from providers import get_provider
+from loader import frame_rows
+from indices import configured_indices
+from revisions import (ensure_revisions_table, upsert_query, stored_hashes, split_changes,
+                       record_revisions)
+
+python_exe = sys.executable
+
+with open('config/config.yml', 'r') as file:
+    config = yaml.safe_load(file)
+
+# =====================================================
+# BACKFILL
+# =====================================================
+# Fetch is split into (symbol, year) chunks across a process pool; each
+# chunk upserts only new or changed bars and records them as a price
+# revision, so a rerun writes nothing and downstream stages recompute
+# exactly the backfilled symbols from their first written date.
+# Downstream stages then run once over the whole backfill; quality and
+# outcomes are scoped to the backfilled symbols and date range.
+
+DOWNSTREAM = [
+    ("quality_gate/quality_setup.py", "QUALITY"),
+    ("feature_store/technical_indicator.py", "FEATURE_ENGINEERING"),
+    ("decision_engine/decision_setup.py", "DECISION_ENGINE"),
+    ("feedback_system/feedback_setup.py", "FEEDBACK"),
+]
+
+
+def _connect():
+    return mysql.connector.connect(
+        host=config["mysql"]["host"],
+        user=config["mysql"]["user"],
+        password=config["mysql"]["password"],
+        database=config["mysql"]["database"]
+    )
+
+
+def plan_chunks(symbols, start, end):
+    """[(symbol, chunk_start, chunk_end)] per calendar year; chunk_end is exclusive."""
+    first, last = date.fromisoformat(start), date.fromisoformat(end)
+    chunks = []
+    for symbol in symbols:
+        for year in range(first.year, last.year + 1):
+            lo = max(first, date(year, 1, 1))
+            hi = min(last, date(year + 1, 1, 1))
+            if lo < hi:
+                chunks.append((symbol, lo.isoformat(), hi.isoformat()))
+    return chunks
+
+
+# One provider per worker process: the download cache index is built once,
+# and every worker draws from the same request budget
+_provider = None
+
+
+def init_worker(provider_name, rate_limit):
+    global _provider
+    # A backfill repairs history, so cached bars (which never expire for past years) are bypassed
+    _provider = get_provider(config, provider_name, refresh_cache=True, rate_limit=rate_limit)
+
+
+def backfill_chunk(symbol, start, end, run_id):
+    """Fetch and upsert one (symbol, year) chunk on its own connection. Returns a report dict."""
+    report = {"symbol": symbol, "start": start, "new": 0, "changed": 0, "error": None}
+    index_names = {i["name"] for i in configured_indices(config)}
+    table, key_column = ("index_prices", "index_name") if symbol in index_names else ("raw_prices", "stock_symbol")
+
+    try:
+        fetched = _provider.fetch([symbol], start, end, config["market_data"]["interval"])
+        if symbol not in fetched.frames:
+            report["error"] = fetched.failed.get(symbol, "no data")
+            return report
+
+        rows = frame_rows(symbol, fetched.frames[symbol], run_id)
+
+        con = _connect()
+        try:
+            new_rows, changed_rows, revised = split_changes(
+                rows, stored_hashes(con, table, key_column, [symbol], start)
+            )
+            # New bars count as a revision too: features and decisions replay from there
+            for row in new_rows:
+                first, count = revised.get(symbol, (row[1], 0))
+                revised[symbol] = (min(first, row[1]), count + 1)
+
+            cursor = con.cursor()
+            cursor.executemany(upsert_query(table, key_column), new_rows + changed_rows)
+            record_revisions(cursor, run_id, revised)
+            con.commit()
+            cursor.close()
+        finally:
+            con.close()
+
+        report["new"], report["changed"] = len(new_rows), len(changed_rows)
+    except Exception as e:
+        report["error"] = repr(e)
+    return report
+
+
+def run_downstream(workers, symbols, start, end):
+    scope = ["--symbols", ",".join(symbols), "--from", start, "--to", end]
+    for file, stage in DOWNSTREAM:
+        command = [python_exe, file]
+        if stage == "FEATURE_ENGINEERING":
+            command += ["--workers", str(workers)]
+        elif stage in ("QUALITY", "FEEDBACK"):
+            command += scope
+        print(f"[{stage}] Executing {file} ...")
+        started = time.monotonic()
+        result = subprocess.run(command)
+        if result.returncode != 0:
+            print(f"[{stage}] FAILED")
+            return False
+        print(f"[{stage}] OK in {time.monotonic() - started:.1f}s")
+    return True
+
+
+def run_backfill(symbols, start, end, workers=4, provider_name=None, downstream=True):
+    run_id = f"BACKFILL_{uuid.uuid4().hex[:8]}"
+    chunks = plan_chunks(symbols, start, end)
+    print(f"Backfill {run_id}: {len(symbols)} symbols, {start} -> {end}, "
+          f"{len(chunks)} (symbol, year) chunks on {workers} workers")
+
+    con = _connect()
+    cursor = con.cursor()
+    ensure_revisions_table(con)
+    cursor.execute("""
+    INSERT INTO ingestion_logs (run_id, pipeline_type, start_time, status)
+    VALUES (%s, %s, %s, %s)
+    """, (run_id, "backfill", datetime.now(), "RUNNING"))
+    con.commit()
+
+    started = time.monotonic()
+    done, rows, failed = 0, 0, []
+    rate_limit = shared_rate_limit(config["ingestion"].get("fetch", {}))
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(provider_name, rate_limit)) as pool:
+        futures = [pool.submit(backfill_chunk, s, lo, hi, run_id) for s, lo, hi in chunks]
+        for future in as_completed(futures):
+            report = future.result()
+            done += 1
+            rows += report["new"] + report["changed"]
+            if report["error"]:
+                failed.append(report)
+
+            elapsed = time.monotonic() - started
+            if done % 50 == 0 or done == len(chunks):
+                rate = done / elapsed if elapsed else 0.0
+                eta = (len(chunks) - done) / rate if rate else 0.0
+                print(f"  [{done}/{len(chunks)}] {rows} rows written | {rate:.1f} chunks/s "
+                      f"{rows / elapsed if elapsed else 0:.0f} rows/s | ETA {eta:.0f}s | failed {len(failed)}")
+
+    for report in failed:
+        print(f"WARNING: {report['symbol']} {report['start'][:4]} failed: {report['error']}", file=sys.stderr)
+
+    status = "SUCCESS" if not failed else "PARTIAL"
+    cursor.execute("""
+        UPDATE ingestion_logs
+        SET end_time=%s, status=%s, records_loaded=%s
+        WHERE run_id=%s
+        """, (datetime.now(), status, rows, run_id))
+    con.commit()
+    cursor.close()
+    con.close()
+
+    fetch_seconds = time.monotonic() - started
+    print(f"Fetch finished: {rows} rows in {fetch_seconds:.1f}s, {len(failed)} failed chunks.")
+
+    if downstream and not run_downstream(workers, symbols, start, end):
+        sys.exit(1)
+    print(f"Backfill {run_id} completed in {time.monotonic() - started:.1f}s")
+    return run_id
+
+
+if __name__ == "__main__":
+    # --symbols A,B,C or --symbols-file <one symbol per line>
+    # --from YYYY-MM-DD (default market_data.start_date) --to YYYY-MM-DD (default today, exclusive)
+    # --workers N, --provider <name>, --fetch-only (skip quality/features/decisions/outcomes)
+    def arg(name, default=None):
+        return sys.argv[sys.argv.index(name) + 1] if name in sys.argv else default
+
+    if "--symbols-file" in sys.argv:
+        with open(arg("--symbols-file")) as f:
+            symbols = [line.strip() for line in f if line.strip()]
+    elif "--symbols" in sys.argv:
+        symbols = [s.strip() for s in arg("--symbols").split(",") if s.strip()]
+    else:
+        print("Usage: python backfill.py --symbols A,B | --symbols-file path [--from D] [--to D] [--workers N]")
+        sys.exit(2)
+
+    backfill_cfg = config.get("backfill", {})
+    run_backfill(
+        symbols,
+        arg("--from", config["market_data"]["start_date"]),
+        arg("--to", date.today().isoformat()),
+        workers=int(arg("--workers", backfill_cfg.get("workers", 4))),
+        provider_name=arg("--provider"),
+        downstream="--fetch-only" not in sys.argv
+    )
@@ -0,0 +1,135 @@
+import os
+import queue
+import threading
+
+import mysql.connector
+import mysql.connector.pooling
+
+_STOP = object()
+
+
+def connection_factory(mysql_cfg):
+    """Zero-arg callable opening a fresh connection from the `mysql` config block."""
+    def connect():
+        return mysql.connector.connect(
+            host=mysql_cfg["host"],
+            user=mysql_cfg["user"],
+            password=mysql_cfg["password"],
+            database=mysql_cfg["database"]
+        )
+    return connect
+
+
+def connection_pool(mysql_cfg, size=8, name="n_airs"):
+    """
+    Zero-arg callable like connection_factory(), handing out connections
+    from one shared pool; close() returns a connection to the pool. Past
+    `size` busy connections, extra ones are opened directly. A forked
+    child (process pool) gets fresh connections, never the parent's sockets.
+    """
+    pool = mysql.connector.pooling.MySQLConnectionPool(
+        pool_name=name,
+        pool_size=size,
+        host=mysql_cfg["host"],
+        user=mysql_cfg["user"],
+        password=mysql_cfg["password"],
+        database=mysql_cfg["database"]
+    )
+    owner = os.getpid()
+    direct = connection_factory(mysql_cfg)
+
+    def connect():
+        if os.getpid() != owner:
+            return direct()
+        try:
+            return pool.get_connection()
+        except mysql.connector.errors.PoolError:
+            return direct()
+    return connect
+
+
+class BackgroundWriter:
+    """
+    Flush record batches to MySQL on a background thread.
+
+    Producers call submit(batch) and carry on computing while the previous
+    batch is in flight. The queue is bounded (queue_size=2 -> double
+    buffering), so a producer that outpaces the database blocks instead of
+    buffering the whole run in memory. The thread owns its own connection.
+
+    A failed write is re-raised in the producer on the next submit(),
+    flush() or close(); later batches are discarded.
+    """
+
+    def __init__(self, query, connect, queue_size=2, name="db-writer"):
+        self.query = query
+        self.rows_written = 0
+        self._connect = connect
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        con = None
+        cur = None
+        try:
+            while True:
+                batch = self._queue.get()
+                try:
+                    if batch is _STOP:
+                        return
+                    if self._error is not None:
+                        continue
+                    if con is None:
+                        con = self._connect()
+                        cur = con.cursor()
+                    cur.executemany(self.query, batch)
+                    con.commit()
+                    self.rows_written += len(batch)
+                except Exception as e:
+                    self._error = e
+                finally:
+                    self._queue.task_done()
+        finally:
+            if cur is not None:
+                cur.close()
+            if con is not None and con.is_connected():
+                con.close()
+
+    def _raise_if_failed(self):
+        if self._error is not None:
+            raise self._error
+
+    def submit(self, records):
+        """Queue one batch; blocks while the queue is full."""
+        self._raise_if_failed()
+        if records:
+            self._queue.put(list(records))
+
+    def flush(self):
+        """Wait until every submitted batch is committed."""
+        self._queue.join()
+        self._raise_if_failed()
+
+    def close(self):
+        """Flush, stop the thread and return the number of rows written."""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+        self._raise_if_failed()
+        return self.rows_written
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            # Don't mask the producer's own exception with a write error
+            try:
+                self.close()
+            except Exception:
+                pass
+        return False
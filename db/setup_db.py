@@ -30,10 +30,11 @@ def run_cmd(label, command):
 
 
 # 1) Ensure DB exists
-run_cmd("Creating database", ["python", "create_db.py"])
+run_cmd("Creating database", [sys.executable, "create_db.py"])
 
 
 # 2) Check metadata / initialization status
+initialized = False
 try:
     connection = mysql.connector.connect(
         host=config['host'],
@@ -49,13 +50,8 @@ try:
     if exists:
         cursor.execute("SELECT is_initialized FROM system_metadata WHERE id = 1;")
         state = cursor.fetchone()
+        initialized = bool(state and state[0] == 1)
 
-        if state and state[0] == 1:
-            log("Database already initialized → Skipping schema setup.")
-            cursor.close(); connection.close()
-            sys.exit(0)
-
-    log("Database not initialized, proceeding...")
     cursor.close(); connection.close()
 
 except Exception as e:
@@ -63,7 +59,55 @@ except Exception as e:
 
 
 # 3) Initialize schema
-run_cmd("Initializing schema", ["python", "init_schema.py"])
+if initialized:
+    log("Database already initialized → Skipping schema setup.")
+else:
+    log("Database not initialized, proceeding...")
+    run_cmd("Initializing schema", [sys.executable, "init_schema.py"])
+
+
+# 4) One-time migrations (each is a no-op once applied)
+def ensure_outcome_key(cursor, table, key_column):
+    """
+    Add UNIQUE (key_column, signal_date) to an outcomes table created
+    before outcome writes became upserts, collapsing duplicate rows first
+    (rows with known returns win). The deduplicated copy is swapped in
+    with one RENAME, so an interrupted migration leaves the table
+    untouched and starts over.
+    """
+    cursor.execute(f"SHOW TABLES LIKE '{table}'")
+    if not cursor.fetchall():
+        return
+    cursor.execute(f"SHOW INDEX FROM {table} WHERE Key_name = 'uq_outcome'")
+    if not cursor.fetchall():
+        log(f"Adding outcome key to {table} ...")
+        cursor.execute(f"DROP TABLE IF EXISTS {table}__dedup")
+        cursor.execute(f"CREATE TABLE {table}__dedup LIKE {table}")
+        cursor.execute(f"ALTER TABLE {table}__dedup ADD UNIQUE KEY uq_outcome ({key_column}, signal_date)")
+        cursor.execute(f"""
+        INSERT IGNORE INTO {table}__dedup
+        SELECT * FROM {table}
+        ORDER BY return_5d IS NULL, return_10d IS NULL
+        """)
+        cursor.execute(f"RENAME TABLE {table} TO {table}__old, {table}__dedup TO {table}")
+    cursor.execute(f"DROP TABLE IF EXISTS {table}__old")
+
+
+try:
+    connection = mysql.connector.connect(
+        host=config['host'],
+        user=config['user'],
+        password=config['password'],
+        database=config['database']
+    )
+    cursor = connection.cursor()
+    ensure_outcome_key(cursor, "index_prices_signal_outcomes", "index_symbol")
+    ensure_outcome_key(cursor, "raw_prices_signal_outcomes", "stock_symbol")
+    connection.commit()
+    cursor.close(); connection.close()
+except mysql.connector.Error as e:
+    print(f"Migrations FAILED: {e}")
+    sys.exit(1)
 
 log("N-AIRS database setup completed successfully.")
 sys.exit(0)
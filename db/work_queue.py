@@ -0,0 +1,179 @@
+import json
+import os
+import socket
+import threading
+import uuid
+
+# =========================
+# Leased Work Queue
+# =========================
+# A run is split into shards, one row each in `work_shards`. Workers on
+# any host lease the next PENDING shard with a single UPDATE, so two
+# workers can never hold the same shard. A worker heartbeats while it
+# works; a lease that is not renewed expires, and the shard is handed to
+# the next worker that asks. A shard that fails or expires `max_attempts`
+# times is marked FAILED instead of being retried forever.
+
+WORK_SHARDS_DDL = """
+CREATE TABLE IF NOT EXISTS work_shards (
+    run_id VARCHAR(64) NOT NULL,
+    stage VARCHAR(32) NOT NULL,
+    shard_no INT NOT NULL,
+    payload_json LONGTEXT NOT NULL,
+    status VARCHAR(10) NOT NULL DEFAULT 'PENDING',
+    lease_owner VARCHAR(100),
+    lease_expires_at DATETIME,
+    heartbeat_at DATETIME,
+    attempts INT NOT NULL DEFAULT 0,
+    result_json TEXT,
+    error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    finished_at DATETIME,
+    PRIMARY KEY (run_id, stage, shard_no),
+    INDEX idx_work_shards_lease (run_id, stage, status, lease_expires_at)
+)
+"""
+
+
+class ShardLease:
+    """One leased shard. The heartbeat thread renews it on its own connection until released."""
+
+    def __init__(self, queue, run_id, stage, shard_no, payload, owner):
+        self.queue = queue
+        self.run_id = run_id
+        self.stage = stage
+        self.shard_no = shard_no
+        self.payload = payload
+        self.owner = owner
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._heartbeat, name=f"lease-{stage}-{shard_no}", daemon=True)
+        self._thread.start()
+
+    def _heartbeat(self):
+        con = self.queue.connect()
+        try:
+            cur = con.cursor()
+            while not self._stop.wait(self.queue.heartbeat_seconds):
+                cur.execute("""
+                    UPDATE work_shards
+                    SET heartbeat_at = NOW(),
+                        lease_expires_at = NOW() + INTERVAL %s SECOND
+                    WHERE run_id=%s AND stage=%s AND shard_no=%s
+                      AND status='LEASED' AND lease_owner=%s
+                """, (self.queue.lease_seconds, self.run_id, self.stage, self.shard_no, self.owner))
+                con.commit()
+                if cur.rowcount == 0:
+                    # Expired and taken over by another worker; its result will win
+                    self.lost = True
+                    return
+            cur.close()
+        finally:
+            con.close()
+
+    def release(self):
+        self._stop.set()
+        self._thread.join()
+
+
+class WorkQueue:
+    def __init__(self, connect, lease_seconds=300, max_attempts=3):
+        self.connect = connect
+        self.lease_seconds = int(lease_seconds)
+        self.heartbeat_seconds = max(1.0, self.lease_seconds / 3)
+        self.max_attempts = max_attempts
+        self.owner_prefix = f"{socket.gethostname()}:{os.getpid()}"
+
+    def _execute(self, query, params=(), fetch=False):
+        con = self.connect()
+        try:
+            cur = con.cursor()
+            cur.execute(query, params)
+            rows = cur.fetchall() if fetch else cur.rowcount
+            con.commit()
+            cur.close()
+            return rows
+        finally:
+            con.close()
+
+    def ensure_table(self):
+        self._execute(WORK_SHARDS_DDL)
+
+    def create_shards(self, run_id, stage, payloads):
+        """One PENDING shard per payload. Re-planning a stage that already has shards is a no-op."""
+        con = self.connect()
+        try:
+            cur = con.cursor()
+            cur.executemany(
+                "INSERT IGNORE INTO work_shards (run_id, stage, shard_no, payload_json) VALUES (%s, %s, %s, %s)",
+                [(run_id, stage, i, json.dumps(payload)) for i, payload in enumerate(payloads)]
+            )
+            con.commit()
+            cur.close()
+        finally:
+            con.close()
+
+    def lease(self, run_id, stage):
+        """Lease the next PENDING (or expired) shard of `stage`; None when nothing is leasable."""
+        owner = f"{self.owner_prefix}:{uuid.uuid4().hex[:8]}"
+        leased = self._execute("""
+            UPDATE work_shards
+            SET status='LEASED', lease_owner=%s, attempts = attempts + 1,
+                heartbeat_at = NOW(), lease_expires_at = NOW() + INTERVAL %s SECOND
+            WHERE run_id=%s AND stage=%s AND attempts < %s
+              AND (status='PENDING' OR (status='LEASED' AND lease_expires_at < NOW()))
+            ORDER BY shard_no
+            LIMIT 1
+        """, (owner, self.lease_seconds, run_id, stage, self.max_attempts))
+        if not leased:
+            return None
+
+        (shard_no, payload_json), = self._execute(
+            "SELECT shard_no, payload_json FROM work_shards WHERE run_id=%s AND stage=%s AND lease_owner=%s",
+            (run_id, stage, owner), fetch=True
+        )
+        return ShardLease(self, run_id, stage, shard_no, json.loads(payload_json), owner)
+
+    def complete(self, lease, result=None):
+        """Mark the shard DONE. False if the lease was lost to another worker meanwhile."""
+        lease.release()
+        return bool(self._execute("""
+            UPDATE work_shards
+            SET status='DONE', result_json=%s, finished_at=NOW(), lease_expires_at=NULL
+            WHERE run_id=%s AND stage=%s AND shard_no=%s AND status='LEASED' AND lease_owner=%s
+        """, (json.dumps(result), lease.run_id, lease.stage, lease.shard_no, lease.owner)))
+
+    def fail(self, lease, error):
+        """Hand the shard back for another attempt, or mark it FAILED once attempts run out."""
+        lease.release()
+        return bool(self._execute("""
+            UPDATE work_shards
+            SET status = IF(attempts >= %s, 'FAILED', 'PENDING'),
+                error=%s, lease_owner=NULL, lease_expires_at=NULL
+            WHERE run_id=%s AND stage=%s AND shard_no=%s AND status='LEASED' AND lease_owner=%s
+        """, (self.max_attempts, str(error)[:2000], lease.run_id, lease.stage, lease.shard_no, lease.owner)))
+
+    def expire_exhausted(self, run_id, stage):
+        """Expired leases with no attempts left can never be re-leased; mark them FAILED."""
+        self._execute("""
+            UPDATE work_shards
+            SET status='FAILED', error=COALESCE(error, 'lease expired'), lease_owner=NULL
+            WHERE run_id=%s AND stage=%s AND status='LEASED'
+              AND lease_expires_at < NOW() AND attempts >= %s
+        """, (run_id, stage, self.max_attempts))
+
+    def stage_status(self, run_id, stage):
+        """{status: count} for the shards of one stage."""
+        rows = self._execute(
+            "SELECT status, COUNT(*) FROM work_shards WHERE run_id=%s AND stage=%s GROUP BY status",
+            (run_id, stage), fetch=True
+        )
+        return {status: count for status, count in rows}
+
+    def results(self, run_id, stage):
+        """Decoded result_json of the DONE shards of one stage, in shard order."""
+        rows = self._execute(
+            "SELECT result_json FROM work_shards WHERE run_id=%s AND stage=%s AND status='DONE' ORDER BY shard_no",
+            (run_id, stage), fetch=True
+        )
+        return [json.loads(result_json) for result_json, in rows]
@@ -1,83 +1,290 @@
 import yaml
 import uuid
-import mysql.connector
 import pandas as pd
 import os
+import sys
 import warnings
 from datetime import datetime
 
 warnings.filterwarnings("ignore")
 
-from rules import apply_rules
-from scorer import decide
-from writer import batch_write_decisions, close_connection
+from rules import apply_rules, apply_rules_columnar, compile_rules, remap_reason_mask
+from scorer import decide, decide_columnar
+import writer
+from writer import (open_decision_writer, close_connection, ensure_decision_schema,
+                    register_reason_codes, new_decision_ids)
+from state import (config_hash, ensure_watermark_table, reset_watermarks,
+                   advance_watermarks, load_watermarks, rewind_watermarks)
 
-os.chdir(os.path.dirname(os.path.abspath(__file__)))
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(HERE, '..'))
+from db.background_writer import connection_factory
+from feature_store import query as feature_query
+from feature_store.query import get_features
+from feature_store.snapshot import latest_features
+from ingestion.revisions import ensure_revisions_table, pending_revisions, mark_revisions_applied
 
 # Load main DB config
-with open('../config/config.yml', 'r') as file:
+with open(os.path.join(HERE, '..', 'config', 'config.yml'), 'r') as file:
     cfg_db = yaml.safe_load(file)
 
+_connection_factory = connection_factory(cfg_db["mysql"])
+
+
+def use_connections(connect):
+    """Open every connection of the decision stage (writer, feature reads) through `connect`."""
+    global _connection_factory
+    _connection_factory = connect
+    writer.use_connections(connect)
+    feature_query.use_connections(connect)
+
+
+def _connect():
+    return _connection_factory()
+
+
+def _merge(base, overrides):
+    merged = dict(base)
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def load_strategies(cfg, names=None):
+    """
+    Resolve the `strategies` block of config.yml into [(strategy_id, cfg)].
+    Each strategy is the base config with its overrides merged in; without
+    a `strategies` block the base config runs as the "default" strategy.
+    """
+    base = {k: v for k, v in cfg.items() if k != "strategies"}
+    profiles = cfg.get("strategies") or {"default": {}}
+
+    strategies = []
+    for strategy_id, overrides in profiles.items():
+        if names is None or strategy_id in names:
+            strategies.append((strategy_id, _merge(base, overrides or {})))
+    return strategies
+
+
+def fetch_features(columns, watermarks=None, required=None):
+    """
+    Fetch feature rows carrying `columns` through the feature store query
+    API (newest row per pair); rows with a NULL in any `required` column
+    (default: all of them) are skipped. watermarks: {config_hash:
+    {stock_symbol: last_trade_date}}; a symbol every config has decided
+    only returns rows after the oldest of its watermarks.
+    """
+    required = columns if required is None else required
+
+    since = None
+    if watermarks:
+        common = set.intersection(*(set(marks) for marks in watermarks.values()))
+        since = {symbol: min(marks[symbol] for marks in watermarks.values()) for symbol in common}
+
+    df = get_features(columns=columns, since=since).dropna(subset=required)
+    return df.sort_values(["trade_date", "stock_symbol"], kind="stable").reset_index(drop=True)
+
+
+def pending_rows(df, plan, watermarks):
+    """Boolean mask of rows a strategy still has to decide."""
+    mask = df[plan.features].notna().all(axis=1)
+    if watermarks:
+        last = pd.to_datetime(df["stock_symbol"].map(watermarks))
+        mask &= ~(pd.to_datetime(df["trade_date"]) <= last)
+    return mask.to_numpy()
 
-def fetch_features():
-    con = mysql.connector.connect(
-        host=cfg_db["mysql"]["host"],
-        user=cfg_db["mysql"]["user"],
-        password=cfg_db["mysql"]["password"],
-        database=cfg_db["mysql"]["database"]
-    )
 
-    query = """
-    SELECT stock_symbol, trade_date, rsi_14, macd, macd_signal, sma_20, ema_50
-    FROM features
-    WHERE rsi_14 IS NOT NULL 
-      AND macd IS NOT NULL 
-      AND macd_signal IS NOT NULL
-      AND sma_20 IS NOT NULL
-      AND ema_50 IS NOT NULL
-    ORDER BY trade_date;
+def rowwise_records(df, cfg, run_id, reason_bits, strategy_id="default"):
+    for _, row in df.iterrows():
+        score, reasons = apply_rules(row, cfg)
+        action, confidence, reasons = decide(score, reasons, cfg)
+
+        yield (
+            new_decision_ids(1)[0],
+            run_id,
+            row["trade_date"],
+            row["stock_symbol"],
+            action,
+            confidence,
+            sum(1 << reason_bits[code] for code in set(reasons)),
+            datetime.now(),
+            strategy_id
+        )
+
+
+def evaluate_columnar(df, cfg):
     """
+    Score the whole features frame in one pass.
+    Returns (score, action, confidence, reason_mask) NumPy arrays.
+    """
+    score, reason_mask = apply_rules_columnar(df, cfg)
+    action, confidence = decide_columnar(score, cfg)
+    return score, action, confidence, reason_mask
+
 
-    df = pd.read_sql(query, con)
-    con.close()
-    return df
+def columnar_records(df, cfg, run_id, reason_bits, batch_size=5000, strategy_id="default"):
+    _, action, confidence, reason_mask = evaluate_columnar(df, cfg)
+    bit_map = [reason_bits[code] for code in compile_rules(cfg).reason_codes]
 
+    # .tolist() hands the DB driver plain Python ints / floats / strings
+    trade_dates = df["trade_date"].tolist()
+    symbols = df["stock_symbol"].tolist()
+    actions = action.tolist()
+    confidences = confidence.tolist()
+    masks = remap_reason_mask(reason_mask, bit_map).tolist()
 
-def run_engine(batch_size=5000):
+    for start in range(0, len(df), batch_size):
+        stop = min(start + batch_size, len(df))
+        created_at = datetime.now()
+        ids = new_decision_ids(stop - start)
+        for i in range(start, stop):
+            yield (
+                ids[i - start],
+                run_id,
+                trade_dates[i],
+                symbols[i],
+                actions[i],
+                confidences[i],
+                masks[i],
+                created_at,
+                strategy_id
+            )
+
+
+def decide_symbol(symbol, strategies=None):
+    """
+    Score one symbol on demand from the latest-feature snapshot, without
+    a database round trip. Nothing is written.
+    Returns [{strategy_id, trade_date, action, confidence, reasons}].
+    """
+    if strategies is None:
+        cfg_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.yml")
+        strategies = load_strategies(yaml.safe_load(open(cfg_path)))
+
+    row = latest_features(symbol)
+    if row is None:
+        raise KeyError(f"{symbol} is not in the feature snapshot")
+
+    results = []
+    for strategy_id, cfg in strategies:
+        missing = [c for c in compile_rules(cfg).features if pd.isna(row.get(c))]
+        if missing:
+            raise ValueError(f"{symbol} has no value for {missing} on {row['trade_date']}")
+        score, reasons = apply_rules(row, cfg)
+        action, confidence, reasons = decide(score, reasons, cfg)
+        results.append({
+            "strategy_id": strategy_id,
+            "trade_date": row["trade_date"],
+            "action": action,
+            "confidence": confidence,
+            "reasons": reasons,
+        })
+    return results
+
+
+def run_engine(batch_size=5000, columnar=True, incremental=True, strategies=None):
+    """
+    Decide every strategy over a single read of `features`.
+    strategies: list of (strategy_id, cfg); defaults to config.yml's block.
+    """
     cfg_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.yml")
-    cfg = yaml.safe_load(open(cfg_path))
-    df = fetch_features()
+    if strategies is None:
+        strategies = load_strategies(yaml.safe_load(open(cfg_path)))
+
+    plans = {sid: compile_rules(cfg) for sid, cfg in strategies}
+    hashes = {sid: config_hash(cfg) for sid, cfg in strategies}
+
+    con = _connect()
+    ensure_watermark_table(con)
+    ensure_decision_schema()
+    reason_bits = register_reason_codes(
+        [code for plan in plans.values() for code in plan.reason_codes]
+    )
     run_id = "run_" + uuid.uuid4().hex
+    if not incremental:
+        # Forced full re-decide: start these configs from an empty watermark
+        for cfg_hash in set(hashes.values()):
+            reset_watermarks(con, cfg_hash)
+
+    # Bars revised upstream (features already recomputed): re-decide from the first change.
+    # The revisions count as applied only once every strategy's new decisions are
+    # committed; a run that dies before that rewinds (idempotently) again next time.
+    ensure_revisions_table(con)
+    revised, revision_ids = pending_revisions(con, "decisions")
+    rewind_watermarks(con, revised)
+
+    # One scan serves every strategy: union of columns, NULL-filter on the shared ones
+    columns = []
+    for plan in plans.values():
+        columns += [c for c in plan.features if c not in columns]
+    shared = [c for c in columns if all(c in plan.features for plan in plans.values())]
+
+    watermarks = load_watermarks(con, sorted(set(hashes.values())))
+    df = fetch_features(columns, watermarks, required=shared)
+
+    if df.empty:
+        mark_revisions_applied(con, "decisions", run_id, revision_ids)
+        close_connection()
+        con.close()
+        print("Decision Engine: nothing new to decide.")
+        return
 
     decisions_batch = []
 
     try:
-        for _, row in df.iterrows():
-            score, reasons = apply_rules(row, cfg)
-            action, confidence, reasons = decide(score, reasons, cfg)
+        with open_decision_writer() as out:
+            for strategy_id, cfg in strategies:
+                subset = df[pending_rows(df, plans[strategy_id], watermarks[hashes[strategy_id]])]
 
-            decisions_batch.append((
-                str(uuid.uuid4()),
-                run_id,
-                row["trade_date"],
-                row["stock_symbol"],
-                action,
-                confidence,
-                ",".join(reasons),
-                datetime.now()
-            ))
+                if columnar:
+                    records = columnar_records(subset, cfg, run_id, reason_bits, batch_size, strategy_id)
+                else:
+                    records = rowwise_records(subset, cfg, run_id, reason_bits, strategy_id)
 
-            if len(decisions_batch) >= batch_size:
-                batch_write_decisions(decisions_batch)
-                decisions_batch.clear()
+                for record in records:
+                    decisions_batch.append(record)
 
-        if decisions_batch:
-            batch_write_decisions(decisions_batch)
+                    if len(decisions_batch) >= batch_size:
+                        out.submit(decisions_batch)
+                        decisions_batch = []
 
+                if decisions_batch:
+                    out.submit(decisions_batch)
+                    decisions_batch = []
+
+                # Only advance once every decision of this strategy is committed
+                out.flush()
+                advance_watermarks(con, hashes[strategy_id], subset)
+                print(f"[{strategy_id}] config {hashes[strategy_id]} | Rows decided: {len(subset)}")
+
+        mark_revisions_applied(con, "decisions", run_id, revision_ids)
         print(f"Decision Engine completed. Run ID: {run_id}")
     finally:
         close_connection()
+        con.close()
 
 
 if __name__ == "__main__":
-    run_engine()
+    # --rowwise keeps the original per-row evaluation for comparison
+    # --full re-decides the whole history for the selected strategies
+    # --strategy <id> (repeatable) limits the run to named strategies
+    # --symbol <name> prints the current signal for one symbol from the snapshot
+    names = [sys.argv[i + 1] for i, arg in enumerate(sys.argv[:-1]) if arg == "--strategy"]
+    cfg_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.yml")
+
+    if "--symbol" in sys.argv:
+        symbol = sys.argv[sys.argv.index("--symbol") + 1]
+        for result in decide_symbol(symbol, load_strategies(yaml.safe_load(open(cfg_path)), names or None)):
+            print(f"[{result['strategy_id']}] {symbol} {result['trade_date']}: {result['action']} "
+                  f"({result['confidence']}) {', '.join(result['reasons'])}")
+        sys.exit(0)
+
+    run_engine(
+        columnar="--rowwise" not in sys.argv,
+        incremental=cfg_db.get("decision_engine", {}).get("incremental", True)
+        and "--full" not in sys.argv,
+        strategies=load_strategies(yaml.safe_load(open(cfg_path)), names or None)
+    )
@@ -1,37 +1,162 @@
+import operator
+import re
+
+import numpy as np
+
+from state import config_hash
+
+# Comparison operators allowed in `when` clauses of config.yml rules
+OPERATORS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+# Compiled plans keyed by config hash; compiling is done once per config
+_PLAN_CACHE = {}
+
+
+class RulePlan:
+    """
+    Compiled form of the `rules` block in decision_engine/config.yml.
+
+    rules        : list of rules, each a list of branches
+                   (feature, op, operand, is_feature, weight, bit)
+                   operand/is_feature/op are None for an `else` branch
+    features     : feature columns the plan reads (declaration order)
+    reason_codes : bit i of a reason mask stands for reason_codes[i]
+    """
+
+    def __init__(self, rules, features, reason_codes):
+        self.rules = rules
+        self.features = features
+        self.reason_codes = reason_codes
+
+
+def _check_identifier(name):
+    if not isinstance(name, str) or not _IDENTIFIER.match(name):
+        raise ValueError(f"Invalid feature name in decision rules: {name!r}")
+    return name
+
+
+def compile_rules(cfg):
+    """
+    Compile (or fetch from cache) the vectorized plan for cfg["rules"].
+
+    Each rule is a list of branches tried in order; the first branch whose
+    `when` holds contributes its weight and reason. A branch without `when`
+    is the rule's else. Operands are a literal number, the name of a top-level
+    threshold (e.g. rsi_buy) or, with `other`, another feature column.
+    """
+    key = config_hash(cfg)
+    plan = _PLAN_CACHE.get(key)
+    if plan is not None:
+        return plan
+
+    rules = []
+    features = []
+    reason_codes = []
+
+    for rule in cfg["rules"]:
+        branches = []
+        for branch in rule["branches"]:
+            reason = branch["reason"]
+            if reason not in reason_codes:
+                reason_codes.append(reason)
+            bit = reason_codes.index(reason)
+            weight = float(branch["weight"])
+
+            when = branch.get("when")
+            if when is None:
+                branches.append((None, None, None, None, weight, bit))
+                continue
+
+            feature = _check_identifier(when["feature"])
+            if feature not in features:
+                features.append(feature)
+
+            op = OPERATORS[when["op"]]
+            if "other" in when:
+                operand = _check_identifier(when["other"])
+                if operand not in features:
+                    features.append(operand)
+                is_feature = True
+            else:
+                value = when["value"]
+                operand = float(cfg[value] if isinstance(value, str) else value)
+                is_feature = False
+
+            branches.append((feature, op, operand, is_feature, weight, bit))
+        rules.append(branches)
+
+    plan = RulePlan(rules, features, reason_codes)
+    _PLAN_CACHE[key] = plan
+    return plan
+
+
 def apply_rules(row, cfg):
+    plan = compile_rules(cfg)
     score = 0.0
     reasons = []
 
-    # =========================
-    # RSI: Mean Reversion Logic
-    # =========================
-    if row["rsi_14"] <= cfg["rsi_buy"]:
-        score += 2.0
-        reasons.append("RSI_OVERSOLD")
-
-    elif row["rsi_14"] >= cfg["rsi_sell"]:
-        score -= 2.0
-        reasons.append("RSI_OVERBOUGHT")
-
-    # =========================
-    # MACD: Momentum Confirmation
-    # =========================
-    if row["macd"] > row["macd_signal"]:
-        score += 1.5
-        reasons.append("MACD_BULLISH")
-    else:
-        # Weak trend ≠ bearish
-        score -= 0.5
-        reasons.append("MACD_WEAK")
-
-    # =========================
-    # Trend Regime Filter
-    # =========================
-    if row["sma_20"] > row["ema_50"]:
-        score += 0.5
-        reasons.append("UPTREND_REGIME")
-    else:
-        score -= 0.5
-        reasons.append("DOWNTREND_REGIME")
+    for branches in plan.rules:
+        for feature, op, operand, is_feature, weight, bit in branches:
+            if feature is not None:
+                rhs = row[operand] if is_feature else operand
+                if not op(row[feature], rhs):
+                    continue
+            score += weight
+            reasons.append(plan.reason_codes[bit])
+            break
 
     return round(score, 2), reasons
+
+
+def apply_rules_columnar(df, cfg):
+    """
+    Column-wise twin of apply_rules over a whole features frame.
+    Returns (score, reason_mask) as NumPy arrays, one entry per row.
+    """
+    plan = compile_rules(cfg)
+    # df may be a DataFrame or a plain {column: array} mapping
+    columns = {name: np.asarray(df[name], dtype=float) for name in plan.features}
+    n = len(columns[plan.features[0]]) if plan.features else len(df)
+
+    score = np.zeros(n)
+    reason_mask = np.zeros(n, dtype=np.int64)
+
+    for branches in plan.rules:
+        # Rows not yet claimed by an earlier branch of this rule
+        pending = np.ones(n, dtype=bool)
+        contribution = np.zeros(n)
+        for feature, op, operand, is_feature, weight, bit in branches:
+            if feature is None:
+                hit = pending
+            else:
+                rhs = columns[operand] if is_feature else operand
+                hit = pending & op(columns[feature], rhs)
+            contribution[hit] = weight
+            reason_mask[hit] |= 1 << bit
+            pending = pending & ~hit
+        # One addition per rule keeps float results identical to apply_rules
+        score += contribution
+
+    return np.round(score, 2), reason_mask
+
+
+def remap_reason_mask(reason_mask, bit_map):
+    """
+    Translate plan-local reason bits into global dim_reason_codes bits.
+    bit_map[i] is the global bit of plan.reason_codes[i].
+    """
+    masks, inverse = np.unique(reason_mask, return_inverse=True)
+    remapped = np.array([
+        sum(1 << int(bit_map[bit]) for bit in range(len(bit_map)) if int(mask) >> bit & 1)
+        for mask in masks
+    ], dtype=np.uint64)
+    return remapped[inverse.reshape(-1)]
@@ -1,3 +1,17 @@
+import numpy as np
+
+ACTIONS = ["BUY", "SELL", "HOLD", "WATCH"]
+
+
+def _confidence(action, score, cfg):
+    base_conf = cfg["actions"][action]["base_confidence"]
+
+    return min(
+        0.95,
+        round(base_conf + abs(score) * 0.05, 2)
+    )
+
+
 def decide(score, reasons, cfg):
     """
     Production-aligned decision logic
@@ -23,11 +37,44 @@ def decide(score, reasons, cfg):
     # =========================
     # Confidence Scaling
     # =========================
-    base_conf = cfg["actions"][action]["base_confidence"]
-
-    confidence = min(
-        0.95,
-        round(base_conf + abs(score) * 0.05, 2)
-    )
+    confidence = _confidence(action, score, cfg)
 
     return action, confidence, reasons
+
+
+def classify_columnar(score, cfg):
+    """
+    Vectorized action selection.
+    Returns int8 codes indexing ACTIONS, aligned with score.
+    """
+    buy_score = cfg["buy_score"]
+    sell_score = cfg["sell_score"]
+
+    # Assign from lowest to highest precedence so BUY > SELL > WATCH > HOLD
+    codes = np.full(len(score), ACTIONS.index("HOLD"), dtype=np.int8)
+    codes[((buy_score - 1.0) <= score) & (score < buy_score)] = ACTIONS.index("WATCH")
+    codes[score <= sell_score] = ACTIONS.index("SELL")
+    codes[score >= buy_score] = ACTIONS.index("BUY")
+    return codes
+
+
+def decide_columnar(score, cfg):
+    """
+    Column-wise twin of decide.
+    Returns (action, confidence) arrays aligned with score.
+    """
+    codes = classify_columnar(score, cfg)
+
+    # Scores take few distinct values: run the scalar formula once per
+    # (action, score) level so rounding matches decide() exactly
+    confidence = np.empty(len(score))
+    for code, name in enumerate(ACTIONS):
+        selected = codes == code
+        if not selected.any():
+            continue
+        levels, inverse = np.unique(score[selected], return_inverse=True)
+        level_conf = np.array([_confidence(name, float(s), cfg) for s in levels])
+        confidence[selected] = level_conf[inverse.reshape(-1)]
+
+    action = np.array(ACTIONS, dtype=object)[codes]
+    return action, confidence
@@ -0,0 +1,114 @@
+import hashlib
+import json
+from datetime import timedelta
+
+# =========================
+# Config Fingerprint
+# =========================
+def config_hash(cfg):
+    """
+    Stable short hash of a decision config.
+    Any threshold / profile change yields a new hash (and a fresh watermark).
+    """
+    canonical = json.dumps(cfg, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+# =========================
+# Per-symbol Watermarks
+# =========================
+WATERMARK_DDL = """
+CREATE TABLE IF NOT EXISTS decision_watermarks (
+    config_hash CHAR(16) NOT NULL,
+    stock_symbol VARCHAR(50) NOT NULL,
+    last_trade_date DATE NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (config_hash, stock_symbol)
+)
+"""
+
+ADVANCE_QUERY = """
+INSERT INTO decision_watermarks (config_hash, stock_symbol, last_trade_date)
+VALUES (%s, %s, %s)
+ON DUPLICATE KEY UPDATE
+    last_trade_date = GREATEST(last_trade_date, VALUES(last_trade_date))
+"""
+
+
+def ensure_watermark_table(con):
+    cur = con.cursor()
+    cur.execute(WATERMARK_DDL)
+    con.commit()
+    cur.close()
+
+
+def reset_watermarks(con, cfg_hash):
+    cur = con.cursor()
+    cur.execute("DELETE FROM decision_watermarks WHERE config_hash = %s", (cfg_hash,))
+    con.commit()
+    cur.close()
+
+
+def advance_watermarks(con, cfg_hash, df):
+    """Move each symbol's watermark to the latest trade_date just decided."""
+    if df.empty:
+        return
+
+    latest = df.groupby("stock_symbol")["trade_date"].max()
+    records = [(cfg_hash, symbol, trade_date) for symbol, trade_date in latest.items()]
+
+    cur = con.cursor()
+    cur.executemany(ADVANCE_QUERY, records)
+    con.commit()
+    cur.close()
+
+
+def load_watermarks(con, cfg_hashes):
+    """Return {config_hash: {stock_symbol: last_trade_date}} for the given configs."""
+    watermarks = {h: {} for h in cfg_hashes}
+    if not cfg_hashes:
+        return watermarks
+
+    placeholders = ", ".join(["%s"] * len(cfg_hashes))
+    cur = con.cursor()
+    cur.execute(
+        f"SELECT config_hash, stock_symbol, last_trade_date FROM decision_watermarks "
+        f"WHERE config_hash IN ({placeholders})",
+        tuple(cfg_hashes)
+    )
+    for cfg_hash, symbol, trade_date in cur.fetchall():
+        watermarks[cfg_hash][symbol] = trade_date
+    cur.close()
+    return watermarks
+
+
+REWIND_QUERY = """
+UPDATE decision_watermarks
+SET last_trade_date = %s
+WHERE stock_symbol = %s AND last_trade_date >= %s
+"""
+
+
+SUPERSEDE_QUERY = """
+DELETE FROM decisions
+WHERE stock_symbol = %s AND trade_date >= %s
+"""
+
+
+def rewind_watermarks(con, revised):
+    """
+    Move every config's watermark for a revised symbol back to the day
+    before its first changed bar, so those dates are decided again, and
+    delete the decisions made on the old bars in the same transaction
+    (decisions has no unique key, so they would sit next to the new ones).
+    revised: {stock_symbol: first_changed_date}
+    """
+    if not revised:
+        return
+
+    records = [(first - timedelta(days=1), symbol, first) for symbol, first in revised.items()]
+    cur = con.cursor()
+    cur.executemany(REWIND_QUERY, records)
+    cur.executemany(SUPERSEDE_QUERY, [(symbol, first) for symbol, first in revised.items()])
+    con.commit()
+    cur.close()
@@ -0,0 +1,147 @@
+import itertools
+import os
+import sys
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+import yaml
+
+warnings.filterwarnings("ignore")
+
+from decision_setup import _connect, fetch_features
+from rules import apply_rules_columnar, compile_rules
+from scorer import ACTIONS, classify_columnar
+
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+
+# =========================
+# Data Loading (parent only)
+# =========================
+def fetch_forward_returns(horizon):
+    con = _connect()
+    df_index = pd.read_sql(
+        "SELECT index_name AS stock_symbol, trade_date, close_price FROM index_prices", con
+    )
+    df_stocks = pd.read_sql(
+        "SELECT stock_symbol, trade_date, close_price FROM raw_prices", con
+    )
+    con.close()
+
+    df = pd.concat([df_index, df_stocks], ignore_index=True)
+    # Same datetime64 trade_date as the feature store frames it is merged with
+    df["trade_date"] = pd.to_datetime(df["trade_date"])
+    df["close_price"] = df["close_price"].astype(float)
+    df = df.sort_values(["stock_symbol", "trade_date"])
+    close = df.groupby("stock_symbol")["close_price"]
+    df["fwd_return"] = close.shift(-horizon) / df["close_price"] - 1
+    return df[["stock_symbol", "trade_date", "fwd_return"]]
+
+
+def load_matrix(cfg, horizon):
+    """Features joined to forward returns, as a float64 (rows x columns) matrix."""
+    columns = compile_rules(cfg).features
+    features = fetch_features(columns)
+    returns = fetch_forward_returns(horizon)
+
+    df = features.merge(returns, on=["stock_symbol", "trade_date"], how="inner")
+    df = df.dropna(subset=["fwd_return"])
+
+    names = columns + ["fwd_return"]
+    return np.ascontiguousarray(df[names].to_numpy(dtype=np.float64)), names
+
+
+# =========================
+# Shared-memory Workers
+# =========================
+_shared = {}
+
+
+def _attach(shm_name, shape, names, base_cfg):
+    # Workers map the parent's block instead of receiving a pickled copy
+    shm = shared_memory.SharedMemory(name=shm_name)
+    matrix = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+    _shared["shm"] = shm
+    _shared["columns"] = {name: matrix[:, i] for i, name in enumerate(names)}
+    _shared["base_cfg"] = base_cfg
+
+
+def evaluate_point(overrides):
+    cfg = dict(_shared["base_cfg"], **overrides)
+    columns = _shared["columns"]
+    fwd = columns["fwd_return"]
+
+    score, _ = apply_rules_columnar(columns, cfg)
+    codes = classify_columnar(score, cfg)
+
+    result = dict(overrides)
+    for code, name in enumerate(ACTIONS):
+        r = fwd[codes == code]
+        result[f"{name}_n"] = len(r)
+        result[f"{name}_avg_return"] = float(r.mean()) if len(r) else np.nan
+
+        # Same HIT definition as the feedback system; WATCH/HOLD carry no direction
+        if name == "BUY":
+            hit = r > 0
+        elif name == "SELL":
+            hit = r < 0
+        else:
+            hit = None
+        result[f"{name}_hit_rate"] = float(hit.mean()) if hit is not None and len(r) else np.nan
+    return result
+
+
+# =========================
+# Sweep Driver
+# =========================
+def grid_points(grid):
+    keys = list(grid)
+    for values in itertools.product(*(grid[k] for k in keys)):
+        yield dict(zip(keys, values))
+
+
+def run_sweep(sweep_cfg, base_cfg, out_path=None):
+    horizon = sweep_cfg.get("horizon_days", 5)
+    workers = sweep_cfg.get("workers", 0) or os.cpu_count()
+    points = list(grid_points(sweep_cfg["grid"]))
+
+    matrix, names = load_matrix(base_cfg, horizon)
+    print(f"Sweep: {len(points)} grid points x {matrix.shape[0]} feature rows on {workers} workers")
+
+    shape = matrix.shape
+    shm = shared_memory.SharedMemory(create=True, size=max(matrix.nbytes, 1))
+    try:
+        np.ndarray(shape, dtype=np.float64, buffer=shm.buf)[:] = matrix
+        del matrix
+
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_attach,
+            initargs=(shm.name, shape, names, base_cfg)
+        ) as pool:
+            chunksize = max(1, len(points) // (workers * 4))
+            results = list(pool.map(evaluate_point, points, chunksize=chunksize))
+    finally:
+        shm.close()
+        shm.unlink()
+
+    report = pd.DataFrame(results).sort_values("BUY_avg_return", ascending=False)
+    if out_path:
+        report.to_csv(out_path, index=False)
+        print(f"Sweep results written to {out_path}")
+    return report
+
+
+if __name__ == "__main__":
+    with open("config.yml", "r") as file:
+        # Sweep overrides the base thresholds, not the named strategies
+        base_cfg = {k: v for k, v in yaml.safe_load(file).items() if k != "strategies"}
+    with open("sweep.yml", "r") as file:
+        sweep_cfg = yaml.safe_load(file)
+
+    out_path = sys.argv[sys.argv.index("--out") + 1] if "--out" in sys.argv else None
+    report = run_sweep(sweep_cfg, base_cfg, out_path)
+    print(report.head(20).to_string(index=False))
@@ -1,6 +1,10 @@
-import mysql.connector
 import yaml
 import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from db.background_writer import BackgroundWriter, connection_factory
 
 # Load DB config using absolute path relative to this file
 cfg_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config', 'config.yml')
@@ -9,28 +13,157 @@ with open(cfg_path, 'r') as file:
 
 connection = None
 cursor = None
+_connect = connection_factory(db_cfg["mysql"])
+
+def use_connections(connect):
+    """Open this module's connections through `connect`, e.g. a shared pool."""
+    global _connect
+    _connect = connect
 
 def _ensure_connection():
     global connection, cursor
     if connection is None or not connection.is_connected():
-        connection = mysql.connector.connect(
-            host=db_cfg["mysql"]["host"],
-            user=db_cfg["mysql"]["user"],
-            password=db_cfg["mysql"]["password"],
-            database=db_cfg["mysql"]["database"]
-        )
+        connection = _connect()
         cursor = connection.cursor()
 
 INSERT_QUERY = """
 INSERT INTO decisions
-(decision_id, run_id, trade_date, stock_symbol, action, confidence_score, reason_code, created_at)
-VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+(decision_id, run_id, trade_date, stock_symbol, action, confidence_score, reason_mask, created_at, strategy_id)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+REASON_DIM_DDL = """
+CREATE TABLE IF NOT EXISTS dim_reason_codes (
+    bit_position TINYINT UNSIGNED NOT NULL PRIMARY KEY,
+    reason_code VARCHAR(50) NOT NULL UNIQUE
+)
+"""
+
+# Readable face of the compact decisions table (ids as UUID text, reasons as labels)
+LABELED_VIEW_DDL = """
+CREATE OR REPLACE VIEW decisions_labeled AS
+SELECT
+    BIN_TO_UUID(d.decision_id) AS decision_id,
+    d.run_id,
+    d.trade_date,
+    d.stock_symbol,
+    d.action,
+    d.confidence_score,
+    (SELECT GROUP_CONCAT(r.reason_code ORDER BY r.bit_position SEPARATOR ',')
+     FROM dim_reason_codes r
+     WHERE d.reason_mask & (1 << r.bit_position)) AS reason_code,
+    d.reason_mask,
+    d.created_at,
+    d.strategy_id
+FROM decisions d
 """
 
-def batch_write_decisions(records):
+def _schema_columns():
+    """{(table, column): data_type} of decisions, dim_reason_codes and the labeled view."""
+    cursor.execute("""
+    SELECT table_name, column_name, data_type FROM information_schema.columns
+    WHERE table_schema = DATABASE()
+      AND table_name IN ('decisions', 'dim_reason_codes', 'decisions_labeled')
+    """)
+    return {(table.lower(), column.lower()): data_type.lower()
+            for table, column, data_type in cursor.fetchall()}
+
+def ensure_decision_schema():
+    """
+    Bring decisions up to the current layout on older databases:
+    strategy_id, reason_mask bitmask + dim_reason_codes, BINARY(16) ids
+    (UUID_TO_BIN / BIN_TO_UUID need MySQL 8). An up-to-date schema costs
+    one information_schema query.
+    """
     _ensure_connection()
-    cursor.executemany(INSERT_QUERY, records)
+    columns = _schema_columns()
+
+    def column(name):
+        return columns.get(("decisions", name))
+
+    if ("dim_reason_codes", "bit_position") not in columns:
+        cursor.execute(REASON_DIM_DDL)
+
+    if column("strategy_id") is None:
+        cursor.execute("""
+        ALTER TABLE decisions
+        ADD COLUMN strategy_id VARCHAR(50) NOT NULL DEFAULT 'default',
+        ADD INDEX idx_decisions_strategy (strategy_id, trade_date)
+        """)
+
+    # Each step is guarded on the data, not just the column, so a migration
+    # interrupted part-way resumes where it stopped on the next run
+    if column("reason_mask") is None:
+        cursor.execute("ALTER TABLE decisions ADD COLUMN reason_mask BIGINT UNSIGNED NOT NULL DEFAULT 0")
+
+    if column("reason_code") is not None:
+        # Backfill masks from the legacy comma-joined strings, then drop the column.
+        # OR-ing bits is idempotent, so a run stopped before the DROP just repeats it.
+        cursor.execute("SELECT DISTINCT reason_code FROM decisions WHERE reason_code IS NOT NULL")
+        codes = []
+        for (joined,) in cursor.fetchall():
+            codes += [c for c in joined.split(",") if c and c not in codes]
+        if codes:
+            bits = register_reason_codes(codes)
+            for code, bit in bits.items():
+                cursor.execute(
+                    "UPDATE decisions SET reason_mask = reason_mask | %s WHERE FIND_IN_SET(%s, reason_code)",
+                    (1 << bit, code)
+                )
+            connection.commit()
+        cursor.execute("ALTER TABLE decisions DROP COLUMN reason_code")
+
+    decision_id_type = column("decision_id")
+    if decision_id_type != "binary":
+        # 36-char UUID text -> 16 raw bytes (VARBINARY hop keeps the bytes intact);
+        # only ids still 36 long are converted, so a rerun never converts twice
+        if decision_id_type != "varbinary":
+            cursor.execute("ALTER TABLE decisions MODIFY decision_id VARBINARY(36) NOT NULL")
+        cursor.execute("UPDATE decisions SET decision_id = UUID_TO_BIN(decision_id) WHERE LENGTH(decision_id) = 36")
+        connection.commit()
+        cursor.execute("ALTER TABLE decisions MODIFY decision_id BINARY(16) NOT NULL")
+
+    if ("decisions_labeled", "decision_id") not in columns:
+        cursor.execute(LABELED_VIEW_DDL)
+    connection.commit()
+
+def register_reason_codes(codes):
+    """
+    Return {reason_code: bit_position}, giving unseen codes the next free bit.
+    Bit positions are permanent so stored masks never change meaning.
+    """
+    _ensure_connection()
+    cursor.execute("SELECT reason_code, bit_position FROM dim_reason_codes")
+    bits = dict(cursor.fetchall())
+
+    for code in codes:
+        if code not in bits:
+            bit = max(bits.values(), default=-1) + 1
+            if bit > 63:
+                raise ValueError("dim_reason_codes is full: reason_mask holds 64 codes")
+            cursor.execute(
+                "INSERT INTO dim_reason_codes (bit_position, reason_code) VALUES (%s, %s)",
+                (bit, code)
+            )
+            bits[code] = bit
+
     connection.commit()
+    return {code: bits[code] for code in codes}
+
+def new_decision_ids(n):
+    """
+    n compact 16-byte ids: 48-bit millisecond timestamp + 80 random bits.
+    Time-ordered prefixes keep inserts near the right edge of the index.
+    """
+    prefix = int(time.time() * 1000).to_bytes(6, "big")
+    entropy = os.urandom(10 * n)
+    return [prefix + entropy[i:i + 10] for i in range(0, 10 * n, 10)]
+
+def open_decision_writer(queue_size=2):
+    """Background writer for decisions: the engine keeps scoring while batches flush."""
+    return BackgroundWriter(
+        INSERT_QUERY, _connect, queue_size, name="decision-writer"
+    )
 
 def close_connection():
     global connection, cursor
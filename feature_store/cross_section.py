@@ -0,0 +1,67 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# =========================
+# Cross-sectional Definitions
+# =========================
+# Per-date features computed across the whole universe; versioned in the
+# same feature_columns registry as the per-symbol indicators.
+CROSS_SECTIONAL_DEFINITIONS = {
+    "rsi_rank_pct": {"kernel": "cs_percentile_rank", "source": "rsi_14", "universe": "stocks", "version": 1},
+    "return_zscore": {"kernel": "cs_zscore", "input": "return_1d", "universe": "stocks", "version": 1},
+    "rs_nifty50": {"kernel": "relative_strength", "benchmark": "NIFTY 50", "window": 20, "version": 1},
+}
+
+CROSS_SECTIONAL_COLUMNS = list(CROSS_SECTIONAL_DEFINITIONS)
+
+# Bars of history needed before the first date being (re)computed
+LOOKBACK = max(1, CROSS_SECTIONAL_DEFINITIONS["rs_nifty50"]["window"])
+
+
+def compute_cross_section(close, rsi, is_stock, benchmark_col):
+    """
+    All cross-sectional features for a (dates x symbols) panel in one pass.
+
+    close         : close panel, NaN where a symbol has no bar
+    rsi           : rsi_14 panel aligned with close
+    is_stock      : bool per column; ranks / z-scores use stocks only
+    benchmark_col : column index of the benchmark index (None if absent)
+
+    Returns {column: dates x symbols array}; cells without a bar are NaN.
+    """
+    present = close == close
+    universe = present & is_stock[np.newaxis, :]
+
+    # --- RSI percentile rank across stocks on each date ---
+    rsi_universe = np.where(universe, rsi, np.nan)
+    rank_pct = pd.DataFrame(rsi_universe).rank(axis=1, pct=True).to_numpy()
+
+    # --- 1-day return z-score across stocks on each date ---
+    last_close = pd.DataFrame(close).ffill().shift(1).to_numpy()
+    ret = np.where(universe, close / last_close - 1, np.nan)
+    with warnings.catch_warnings(), np.errstate(invalid="ignore", divide="ignore"):
+        warnings.simplefilter("ignore", RuntimeWarning)  # dates with no stock bars
+        mean = np.nanmean(ret, axis=1, keepdims=True)
+        std = np.nanstd(ret, axis=1, keepdims=True)
+        zscore = np.where(std > 0, (ret - mean) / std, np.nan)
+
+    # --- Relative strength vs the benchmark over `window` trading days ---
+    window = CROSS_SECTIONAL_DEFINITIONS["rs_nifty50"]["window"]
+    if benchmark_col is None:
+        rs = np.full(close.shape, np.nan)
+    else:
+        filled = pd.DataFrame(close).ffill().to_numpy()
+        lagged = pd.DataFrame(filled).shift(window).to_numpy()
+        bench = filled[:, [benchmark_col]]
+        bench_lagged = lagged[:, [benchmark_col]]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rs = (close / lagged) / (bench / bench_lagged) - 1
+        rs = np.where(present, rs, np.nan)
+
+    return {
+        "rsi_rank_pct": np.where(present, rank_pct, np.nan),
+        "return_zscore": zscore,
+        "rs_nifty50": rs,
+    }
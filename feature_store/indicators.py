@@ -0,0 +1,237 @@
+import hashlib
+import json
+import math
+
+import numpy as np
+
+# =========================
+# Feature Definitions
+# =========================
+# One entry per stored column. Changing an entry (or bumping "version"
+# after a kernel code change) changes that column's definition hash, and
+# the feature store backfills just that column.
+FEATURE_DEFINITIONS = {
+    "rsi_14": {"kernel": "wilder_rsi", "window": 14, "version": 1},
+    "macd": {"kernel": "ema_spread", "fast": 12, "slow": 26, "version": 1},
+    "macd_signal": {"kernel": "ema", "span": 9, "source": "macd", "version": 1},
+    "momentum_10d": {"kernel": "roc", "window": 10, "version": 1},
+    "volatility_20d": {"kernel": "bollinger_hband_indicator", "window": 20, "dev": 2, "version": 1},
+    "sma_20": {"kernel": "sma", "window": 20, "version": 1},
+    "ema_50": {"kernel": "ema", "span": 50, "source": "close", "version": 1},
+}
+
+# Output columns, in the order they are stored in `features`
+FEATURE_COLUMNS = list(FEATURE_DEFINITIONS)
+
+_D = FEATURE_DEFINITIONS
+
+
+def definition_hash(column, definitions=FEATURE_DEFINITIONS):
+    """Short hash of a column's definition, including the columns it is built from."""
+    spec = dict(definitions[column])
+    source = spec.get("source")
+    if source in definitions:
+        spec["source_hash"] = definition_hash(source, definitions)
+    canonical = json.dumps(spec, sort_keys=True)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+# Closes kept in state: enough for the longest rolling window / ROC lookback
+TAIL = max(
+    _D["momentum_10d"]["window"] + 1,
+    _D["volatility_20d"]["window"],
+    _D["sma_20"]["window"],
+)
+
+
+def _alpha(span=None, alpha=None):
+    # Same center-of-mass round trip as pandas.ewm, so weights match bit for bit
+    com = (span - 1) / 2.0 if span is not None else (1.0 - alpha) / alpha
+    return 1.0 / (1.0 + com)
+
+
+# (alpha, min_periods) of every recursive average, matching the `ta` library
+EWM = {
+    "ema_fast": (_alpha(span=_D["macd"]["fast"]), _D["macd"]["fast"]),
+    "ema_slow": (_alpha(span=_D["macd"]["slow"]), _D["macd"]["slow"]),
+    "macd_signal": (_alpha(span=_D["macd_signal"]["span"]), _D["macd_signal"]["span"]),
+    "ema_50": (_alpha(span=_D["ema_50"]["span"]), _D["ema_50"]["span"]),
+    "rsi_up": (_alpha(alpha=1 / _D["rsi_14"]["window"]), _D["rsi_14"]["window"]),
+    "rsi_dn": (_alpha(alpha=1 / _D["rsi_14"]["window"]), _D["rsi_14"]["window"]),
+}
+
+
+# Recursive averages each column is built from; the rolling-window columns
+# only need the trailing closes every kernel shares
+COLUMN_AVERAGES = {
+    "rsi_14": ("rsi_up", "rsi_dn"),
+    "macd": ("ema_fast", "ema_slow"),
+    "macd_signal": ("ema_fast", "ema_slow", "macd_signal"),
+    "momentum_10d": (),
+    "volatility_20d": (),
+    "sma_20": (),
+    "ema_50": ("ema_50",),
+}
+
+
+def initial_state():
+    """Warm-start state of a symbol that has no bars yet."""
+    state = {"prev_close": math.nan, "closes": []}
+    for name in EWM:
+        # [weighted mean, valid observations, old weight] as in pandas adjust=False
+        state[name] = [math.nan, 0, 1.0]
+    return state
+
+
+def _ewm_step(ewm, x, present, alpha):
+    """
+    One pandas-style adjust=False EWM update across all symbols.
+    ewm is [weighted, nobs, old_wt] arrays; only `present` columns move.
+    """
+    weighted, nobs, old_wt = ewm
+    is_obs = present & (x == x)
+    had_mean = present & (weighted == weighted)
+
+    old_wt = np.where(had_mean, old_wt * (1.0 - alpha), old_wt)
+    blended = (old_wt * weighted + alpha * x) / (old_wt + alpha)
+    weighted = np.where(had_mean & is_obs & (weighted != x), blended, weighted)
+    old_wt = np.where(had_mean & is_obs, 1.0, old_wt)
+    weighted = np.where(~had_mean & is_obs, x, weighted)
+    return [weighted, nobs + is_obs, old_wt]
+
+
+def _ewm_value(ewm, min_periods):
+    return np.where(ewm[1] >= min_periods, ewm[0], np.nan)
+
+
+def _pack(states):
+    """Per-symbol state dicts -> one array per field (tail right-aligned)."""
+    n = len(states)
+    states = [initial_state() if s is None else s for s in states]
+    packed = {"prev_close": np.array([s["prev_close"] for s in states], dtype=float)}
+    packed["tail"] = np.full((n, TAIL), np.nan)
+    packed["count"] = np.zeros(n, dtype=np.int64)
+    for j, s in enumerate(states):
+        closes = s["closes"][-TAIL:]
+        if closes:
+            packed["tail"][j, TAIL - len(closes):] = closes
+        packed["count"][j] = len(closes)
+    for name in EWM:
+        packed[name] = [
+            np.array([s[name][0] for s in states], dtype=float),
+            np.array([s[name][1] for s in states], dtype=np.int64),
+            np.array([s[name][2] for s in states], dtype=float),
+        ]
+    return packed
+
+
+def _unpack(packed):
+    """Inverse of _pack: one JSON-friendly state dict per symbol."""
+    states = []
+    for j in range(len(packed["prev_close"])):
+        count = int(packed["count"][j])
+        state = {
+            "prev_close": float(packed["prev_close"][j]),
+            "closes": packed["tail"][j, TAIL - count:].tolist() if count else [],
+        }
+        for name in EWM:
+            w, nobs, old_wt = packed[name]
+            state[name] = [float(w[j]), int(nobs[j]), float(old_wt[j])]
+        states.append(state)
+    return states
+
+
+def advance_panel(panel, states=None, columns=None):
+    """
+    Run every indicator over a (dates x symbols) close panel at once.
+
+    panel   : float array, NaN where a symbol has no bar on that date
+              (ragged starts, halts and listings all just mean NaN)
+    states  : per-column warm-start state dicts (None = no history yet)
+    columns : compute only these columns' kernels (default: all); the
+              averages of the others are left as they were in `states`
+
+    Time is walked once; every step updates all symbols with array ops.
+    Returns ({column: dates x symbols array}, new per-column states).
+    """
+    n_dates, n_symbols = panel.shape
+    columns = FEATURE_COLUMNS if columns is None else list(columns)
+    averages = {name for column in columns for name in COLUMN_AVERAGES[column]}
+    st = _pack(states if states is not None else [None] * n_symbols)
+    out = {name: np.full(panel.shape, np.nan) for name in columns}
+    tail = st["tail"]
+    count = st["count"]
+
+    for t in range(n_dates):
+        close = panel[t]
+        present = close == close
+        if not present.any():
+            continue
+
+        row = {}
+
+        # --- RSI (Wilder smoothing of up / down moves) ---
+        if "rsi_up" in averages:
+            diff = close - st["prev_close"]
+            up = np.where(diff > 0, diff, 0.0)
+            down = -np.where(diff < 0, diff, 0.0)
+            st["rsi_up"] = _ewm_step(st["rsi_up"], up, present, EWM["rsi_up"][0])
+            st["rsi_dn"] = _ewm_step(st["rsi_dn"], down, present, EWM["rsi_dn"][0])
+            avg_up = _ewm_value(st["rsi_up"], EWM["rsi_up"][1])
+            avg_dn = _ewm_value(st["rsi_dn"], EWM["rsi_dn"][1])
+            with np.errstate(divide="ignore", invalid="ignore"):
+                row["rsi_14"] = np.where(avg_dn == 0, 100.0, 100 - (100 / (1 + avg_up / avg_dn)))
+
+        # --- MACD (12/26 EMA spread, 9 EMA signal) ---
+        if "ema_fast" in averages:
+            st["ema_fast"] = _ewm_step(st["ema_fast"], close, present, EWM["ema_fast"][0])
+            st["ema_slow"] = _ewm_step(st["ema_slow"], close, present, EWM["ema_slow"][0])
+            row["macd"] = (_ewm_value(st["ema_fast"], EWM["ema_fast"][1])
+                           - _ewm_value(st["ema_slow"], EWM["ema_slow"][1]))
+        if "macd_signal" in averages:
+            st["macd_signal"] = _ewm_step(st["macd_signal"], row["macd"], present, EWM["macd_signal"][0])
+            row["macd_signal"] = _ewm_value(st["macd_signal"], EWM["macd_signal"][1])
+
+        # --- EMA 50 ---
+        if "ema_50" in averages:
+            st["ema_50"] = _ewm_step(st["ema_50"], close, present, EWM["ema_50"][0])
+            row["ema_50"] = _ewm_value(st["ema_50"], EWM["ema_50"][1])
+
+        # --- Rolling windows over each symbol's trailing closes ---
+        tail[present, :-1] = tail[present, 1:]
+        tail[present, -1] = close[present]
+        count = np.where(present, np.minimum(count + 1, TAIL), count)
+
+        if "momentum_10d" in out:
+            roc_window = _D["momentum_10d"]["window"]
+            past = tail[:, -(roc_window + 1)]
+            row["momentum_10d"] = np.where(count > roc_window, (close - past) / past * 100, np.nan)
+
+        if "sma_20" in out:
+            sma_window = _D["sma_20"]["window"]
+            row["sma_20"] = np.where(count >= sma_window, tail[:, -sma_window:].mean(axis=1), np.nan)
+
+        if "volatility_20d" in out:
+            band_window = _D["volatility_20d"]["window"]
+            window = tail[:, -band_window:]
+            hband = window.mean(axis=1) + _D["volatility_20d"]["dev"] * window.std(axis=1)
+            # ta reports "not above the band" while the band is undefined
+            row["volatility_20d"] = np.where((count >= band_window) & (close > hband), 1.0, 0.0)
+
+        st["prev_close"] = np.where(present, close, st["prev_close"])
+
+        for name in columns:
+            out[name][t] = np.where(present, row[name], np.nan)
+
+    st["count"] = count
+    return out, _unpack(st)
+
+
+def advance(closes, state=None):
+    """
+    Single-symbol form of advance_panel: `closes` oldest first, resuming
+    from `state`. Feeding bars in several calls gives the same values as
+    one call over all of them.
+    """
+    values, states = advance_panel(np.asarray(closes, dtype=float).reshape(-1, 1), [state])
+    return {name: col[:, 0] for name, col in values.items()}, states[0]
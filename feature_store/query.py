@@ -0,0 +1,239 @@
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+
+import pandas as pd
+import yaml
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from db.background_writer import connection_factory
+from feature_store.indicators import FEATURE_COLUMNS
+from feature_store.cross_section import CROSS_SECTIONAL_COLUMNS
+from feature_store.state import ensure_runs_table, latest_run
+
+# Load DB config using absolute path relative to this file
+cfg_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config', 'config.yml')
+with open(cfg_path, 'r') as file:
+    config = yaml.safe_load(file)
+
+STORED_COLUMNS = FEATURE_COLUMNS + CROSS_SECTIONAL_COLUMNS
+
+
+def _year_bounds(year):
+    return date(year, 1, 1), date(year, 12, 31)
+
+
+class FeatureStore:
+    """
+    Point-in-time reads of `features` through an in-process LRU cache.
+
+    Cache entries are (symbol, year, as_of_run) blocks holding every stored
+    column, so overlapping date ranges and different column subsets are
+    served from the same blocks. Blocks are evicted least-recently-used
+    once their total size passes max_bytes. The whole cache is dropped
+    when a newer run appears in `feature_runs` (checked at most every
+    refresh_interval seconds).
+
+    as_of_run returns each row as written by the newest run at or before
+    that run id. Columns backfilled in place keep their original
+    feature_run_id, so those show their current values.
+    """
+
+    def __init__(self, connect, max_bytes=256 * 2**20, refresh_interval=5.0):
+        self._connect = connect
+        self.max_bytes = max_bytes
+        self.refresh_interval = refresh_interval
+        self._blocks = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        self._run = None
+        self._checked_at = None
+        self._bounds = None
+        self.hits = 0
+        self.misses = 0
+
+    # ---------- cache bookkeeping ----------
+    def clear(self):
+        with self._lock:
+            self._blocks.clear()
+            self._nbytes = 0
+            self._bounds = None
+
+    def _refresh(self, con):
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.refresh_interval:
+            return
+        if self._checked_at is None:
+            ensure_runs_table(con)
+        run = latest_run(con)
+        self._checked_at = now
+        if run != self._run:
+            self.clear()
+            self._run = run
+
+    def _put(self, key, block):
+        size = int(block.memory_usage(deep=True).sum())
+        with self._lock:
+            if key in self._blocks:
+                return
+            self._blocks[key] = (block, size)
+            self._nbytes += size
+            while self._nbytes > self.max_bytes and len(self._blocks) > 1:
+                _, (_, evicted) = self._blocks.popitem(last=False)
+                self._nbytes -= evicted
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._blocks.get(key)
+            if entry is None:
+                return None
+            self._blocks.move_to_end(key)
+            return entry[0]
+
+    # ---------- database reads ----------
+    def _symbols(self, con):
+        cur = con.cursor()
+        cur.execute("SELECT symbol FROM feature_state ORDER BY symbol")
+        symbols = [row[0] for row in cur.fetchall()]
+        cur.close()
+        return symbols
+
+    def _date_bounds(self, con):
+        if self._bounds is None:
+            cur = con.cursor()
+            cur.execute("SELECT MIN(trade_date), MAX(trade_date) FROM features")
+            self._bounds = cur.fetchone()
+            cur.close()
+        return self._bounds
+
+    def _load_blocks(self, con, symbols, years, as_of_run):
+        """One query for every missing (symbol, year); each block is cached, empty ones too."""
+        placeholders = ", ".join(["%s"] * len(symbols))
+        run_filter = ""
+        params = [*symbols, _year_bounds(min(years))[0], _year_bounds(max(years))[1]]
+        if as_of_run is not None:
+            run_filter = "AND (feature_run_id IS NULL OR feature_run_id <= %s)"
+            params.append(as_of_run)
+
+        query = f"""
+        SELECT stock_symbol, trade_date, {", ".join(STORED_COLUMNS)}, feature_run_id
+        FROM features
+        WHERE stock_symbol IN ({placeholders})
+          AND trade_date BETWEEN %s AND %s {run_filter}
+        """
+        df = pd.read_sql(query, con, params=tuple(params))
+        df['trade_date'] = pd.to_datetime(df['trade_date'])
+        df[STORED_COLUMNS] = df[STORED_COLUMNS].astype(float)
+
+        # Every feature run appends a full copy; keep the newest row per pair
+        df = (df.sort_values('feature_run_id', na_position='first')
+                .drop_duplicates(subset=['stock_symbol', 'trade_date'], keep='last')
+                .sort_values(['stock_symbol', 'trade_date'])
+                .reset_index(drop=True))
+
+        loaded = {
+            (symbol, year): group
+            for (symbol, year), group in df.groupby([df['stock_symbol'], df['trade_date'].dt.year], sort=False)
+        }
+        empty = df.iloc[0:0]
+        for symbol in symbols:
+            for year in years:
+                self._put((symbol, year, as_of_run), loaded.get((symbol, year), empty))
+        return loaded
+
+    # ---------- public API ----------
+    def get_features(self, symbols=None, start=None, end=None, columns=None, as_of_run=None, since=None):
+        """
+        Feature rows for `symbols` between `start` and `end` (inclusive),
+        sorted by symbol and date. None means every symbol / the full
+        history / every stored column. since: {symbol: date} watermarks;
+        those symbols only return rows after their date (blocks of earlier
+        years are not read). Returns a DataFrame with stock_symbol,
+        trade_date (datetime64), the requested float64 columns and
+        feature_run_id.
+        """
+        columns = STORED_COLUMNS if columns is None else list(columns)
+        unknown = [c for c in columns if c not in STORED_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown feature columns: {unknown}")
+
+        con = self._connect()
+        try:
+            self._refresh(con)
+            if symbols is None:
+                symbols = self._symbols(con)
+            elif isinstance(symbols, str):
+                symbols = [symbols]
+            if start is None or end is None:
+                first, last = self._date_bounds(con)
+                start = first if start is None else start
+                end = last if end is None else end
+
+            if not symbols or start is None or end is None:
+                return pd.DataFrame(columns=['stock_symbol', 'trade_date', *columns, 'feature_run_id'])
+
+            start, end = pd.Timestamp(start), pd.Timestamp(end)
+            years = list(range(start.year, end.year + 1))
+            since = {} if since is None else {s: pd.Timestamp(d) for s, d in since.items() if d is not None}
+            symbol_years = {s: [y for y in years if s not in since or y >= since[s].year] for s in symbols}
+
+            frames, missing_symbols, missing_years = {}, set(), set()
+            for symbol in symbols:
+                for year in symbol_years[symbol]:
+                    block = self._get((symbol, year, as_of_run))
+                    if block is None:
+                        missing_symbols.add(symbol)
+                        missing_years.add(year)
+                    else:
+                        frames[(symbol, year)] = block
+            self.hits += len(frames)
+
+            if missing_symbols:
+                missing = [(s, y) for s in symbols for y in symbol_years[s] if (s, y) not in frames]
+                self.misses += len(missing)
+                loaded = self._load_blocks(con, sorted(missing_symbols), sorted(missing_years), as_of_run)
+                for key in missing:
+                    if key in loaded:
+                        frames[key] = loaded[key]
+        finally:
+            con.close()
+
+        ordered = [frames[(s, y)] for s in symbols for y in symbol_years[s] if (s, y) in frames]
+        if not ordered:
+            return pd.DataFrame(columns=['stock_symbol', 'trade_date', *columns, 'feature_run_id'])
+
+        df = pd.concat(ordered, ignore_index=True)
+        df = df[(df['trade_date'] >= start) & (df['trade_date'] <= end)]
+        if since:
+            df = df[~(df['trade_date'] <= df['stock_symbol'].map(since))]
+        return df[['stock_symbol', 'trade_date', *columns, 'feature_run_id']].reset_index(drop=True)
+
+
+_default_store = None
+_store_connect = None
+
+
+def use_connections(connect):
+    """Open the default store's connections through `connect`, e.g. a shared pool."""
+    global _store_connect
+    _store_connect = connect
+    if _default_store is not None:
+        _default_store._connect = connect
+
+
+def default_store():
+    """Process-wide FeatureStore on the config.yml database."""
+    global _default_store
+    if _default_store is None:
+        cache_mb = config.get("feature_store", {}).get("cache_mb", 256)
+        connect = _store_connect or connection_factory(config["mysql"])
+        _default_store = FeatureStore(connect, max_bytes=cache_mb * 2**20)
+    return _default_store
+
+
+def get_features(symbols=None, start=None, end=None, columns=None, as_of_run=None, since=None):
+    """Shortcut for default_store().get_features(...)."""
+    return default_store().get_features(symbols, start, end, columns, as_of_run, since)
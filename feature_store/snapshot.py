@@ -0,0 +1,117 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import yaml
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from feature_store.indicators import FEATURE_COLUMNS
+from feature_store.cross_section import CROSS_SECTIONAL_COLUMNS
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+cfg_path = os.path.join(ROOT, 'config', 'config.yml')
+with open(cfg_path, 'r') as file:
+    config = yaml.safe_load(file)
+
+SNAPSHOT_COLUMNS = FEATURE_COLUMNS + CROSS_SECTIONAL_COLUMNS
+
+# One fixed-width record per symbol, sorted by symbol
+SNAPSHOT_DTYPE = np.dtype(
+    [("symbol", "U50"), ("trade_date", "datetime64[D]"), ("feature_run_id", "U50")]
+    + [(c, "f8") for c in SNAPSHOT_COLUMNS]
+)
+
+LATEST_QUERY = f"""
+SELECT f.stock_symbol, f.trade_date, {", ".join(f"f.{c}" for c in SNAPSHOT_COLUMNS)}, f.feature_run_id
+FROM features f
+JOIN (
+    SELECT stock_symbol, MAX(trade_date) AS trade_date
+    FROM features GROUP BY stock_symbol
+) latest ON latest.stock_symbol = f.stock_symbol AND latest.trade_date = f.trade_date
+"""
+
+
+def snapshot_path():
+    path = config.get("feature_store", {}).get("snapshot_path", "data/feature_snapshot.npy")
+    return path if os.path.isabs(path) else os.path.normpath(os.path.join(ROOT, path))
+
+
+def publish_snapshot(con, path=None):
+    """
+    Write the newest feature row of every symbol to the snapshot file.
+    The file is written next to the target and renamed over it, so
+    readers see either the previous snapshot or the new one, never a mix.
+    """
+    path = path or snapshot_path()
+    df = pd.read_sql(LATEST_QUERY, con)
+    df = (df.sort_values('feature_run_id', na_position='first')
+            .drop_duplicates(subset=['stock_symbol'], keep='last')
+            .sort_values('stock_symbol'))
+
+    records = np.zeros(len(df), dtype=SNAPSHOT_DTYPE)
+    records["symbol"] = df['stock_symbol'].to_numpy(dtype=str)
+    records["trade_date"] = pd.to_datetime(df['trade_date']).to_numpy(dtype="datetime64[D]")
+    records["feature_run_id"] = df['feature_run_id'].fillna("").to_numpy(dtype=str)
+    for column in SNAPSHOT_COLUMNS:
+        records[column] = df[column].to_numpy(dtype=float, na_value=np.nan)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, records)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(records)
+
+
+class FeatureSnapshot:
+    """
+    Read-only, memory-mapped view of the latest feature vector per symbol.
+    Lookups go through a symbol -> record index built when the file is
+    mapped; the file is re-mapped when the feature stage has replaced it
+    since the last lookup.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or snapshot_path()
+        self._records = None
+        self._index = {}
+        self._stamp = None
+
+    def _current(self):
+        st = os.stat(self.path)
+        stamp = (st.st_ino, st.st_mtime_ns)
+        if stamp != self._stamp:
+            self._records = np.load(self.path, mmap_mode="r")
+            self._index = {symbol: i for i, symbol in enumerate(self._records["symbol"].tolist())}
+            self._stamp = stamp
+        return self._records
+
+    def symbols(self):
+        self._current()
+        return list(self._index)
+
+    def get(self, symbol):
+        """{trade_date, feature_run_id, <feature columns>} for `symbol`, or None."""
+        records = self._current()
+        i = self._index.get(symbol)
+        if i is None:
+            return None
+        # One tolist() turns the whole record into plain Python values
+        _, trade_date, run_id, *values = records[i].tolist()
+        row = {"stock_symbol": symbol, "trade_date": trade_date, "feature_run_id": run_id or None}
+        row.update(zip(SNAPSHOT_COLUMNS, values))
+        return row
+
+
+_default_snapshot = None
+
+
+def latest_features(symbol):
+    """Latest feature vector of `symbol` from the default snapshot file."""
+    global _default_snapshot
+    if _default_snapshot is None:
+        _default_snapshot = FeatureSnapshot()
+    return _default_snapshot.get(symbol)
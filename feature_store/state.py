@@ -0,0 +1,183 @@
+import json
+
+# =========================
+# Per-symbol Indicator State
+# =========================
+STATE_DDL = """
+CREATE TABLE IF NOT EXISTS feature_state (
+    symbol VARCHAR(50) NOT NULL PRIMARY KEY,
+    last_trade_date DATE NOT NULL,
+    state_json TEXT NOT NULL,
+    feature_run_id VARCHAR(50),
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+)
+"""
+
+SAVE_QUERY = """
+INSERT INTO feature_state (symbol, last_trade_date, state_json, feature_run_id)
+VALUES (%s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE
+    last_trade_date = VALUES(last_trade_date),
+    state_json = VALUES(state_json),
+    feature_run_id = VALUES(feature_run_id)
+"""
+
+
+def ensure_state_table(con):
+    cur = con.cursor()
+    cur.execute(STATE_DDL)
+    con.commit()
+    cur.close()
+
+
+def reset_states(con, symbols=None):
+    """Forget saved state (all symbols, or just `symbols`) so they replay from their first bar."""
+    cur = con.cursor()
+    if symbols is None:
+        cur.execute("DELETE FROM feature_state")
+    elif symbols:
+        placeholders = ", ".join(["%s"] * len(symbols))
+        cur.execute(f"DELETE FROM feature_state WHERE symbol IN ({placeholders})", tuple(symbols))
+    con.commit()
+    cur.close()
+
+
+def load_states(con, symbols=None):
+    """Return {symbol: (last_trade_date, state)} — the feature watermark of each symbol."""
+    cur = con.cursor()
+    if symbols is None:
+        cur.execute("SELECT symbol, last_trade_date, state_json FROM feature_state")
+    elif not symbols:
+        cur.close()
+        return {}
+    else:
+        placeholders = ", ".join(["%s"] * len(symbols))
+        cur.execute(
+            f"SELECT symbol, last_trade_date, state_json FROM feature_state WHERE symbol IN ({placeholders})",
+            tuple(symbols)
+        )
+    states = {symbol: (trade_date, json.loads(blob)) for symbol, trade_date, blob in cur.fetchall()}
+    cur.close()
+    return states
+
+
+def save_states(con, states, run_id):
+    """states: {symbol: (last_trade_date, state)}; written after the features commit."""
+    if not states:
+        return
+
+    records = [
+        (symbol, trade_date, json.dumps(state), run_id)
+        for symbol, (trade_date, state) in states.items()
+    ]
+    cur = con.cursor()
+    cur.executemany(SAVE_QUERY, records)
+    con.commit()
+    cur.close()
+
+
+# =========================
+# Column Definition Registry
+# =========================
+REGISTRY_DDL = """
+CREATE TABLE IF NOT EXISTS feature_columns (
+    column_name VARCHAR(64) NOT NULL PRIMARY KEY,
+    definition_hash CHAR(16) NOT NULL,
+    feature_run_id VARCHAR(50),
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+)
+"""
+
+MARK_QUERY = """
+INSERT INTO feature_columns (column_name, definition_hash, feature_run_id)
+VALUES (%s, %s, %s)
+ON DUPLICATE KEY UPDATE
+    definition_hash = VALUES(definition_hash),
+    feature_run_id = VALUES(feature_run_id)
+"""
+
+
+def ensure_column_registry(con):
+    cur = con.cursor()
+    cur.execute(REGISTRY_DDL)
+    con.commit()
+    cur.close()
+
+
+def load_column_hashes(con):
+    """Return {column_name: definition_hash} as last written."""
+    cur = con.cursor()
+    cur.execute("SELECT column_name, definition_hash FROM feature_columns")
+    hashes = dict(cur.fetchall())
+    cur.close()
+    return hashes
+
+
+def mark_columns(con, hashes, run_id):
+    """Record that `features` now holds these columns under these definitions."""
+    if not hashes:
+        return
+    cur = con.cursor()
+    cur.executemany(MARK_QUERY, [(c, h, run_id) for c, h in hashes.items()])
+    con.commit()
+    cur.close()
+
+
+def feature_table_columns(con):
+    cur = con.cursor()
+    cur.execute("""
+    SELECT column_name FROM information_schema.columns
+    WHERE table_schema = DATABASE() AND table_name = 'features'
+    """)
+    columns = {row[0] for row in cur.fetchall()}
+    cur.close()
+    return columns
+
+
+def add_feature_columns(con, columns):
+    """Add brand-new indicator columns to `features` (NULL for existing rows)."""
+    cur = con.cursor()
+    for column in columns:
+        cur.execute(f"ALTER TABLE features ADD COLUMN {column} DOUBLE NULL")
+    con.commit()
+    cur.close()
+
+
+# =========================
+# Completed Feature Runs
+# =========================
+RUNS_DDL = """
+CREATE TABLE IF NOT EXISTS feature_runs (
+    feature_run_id VARCHAR(50) NOT NULL PRIMARY KEY,
+    rows_written INT NOT NULL,
+    completed_at TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP(6)
+)
+"""
+
+
+def ensure_runs_table(con):
+    cur = con.cursor()
+    cur.execute(RUNS_DDL)
+    con.commit()
+    cur.close()
+
+
+def record_run(con, run_id, rows_written):
+    """Mark a feature run as landed; readers invalidate their caches on it. Safe to repeat."""
+    cur = con.cursor()
+    cur.execute(
+        "INSERT INTO feature_runs (feature_run_id, rows_written) VALUES (%s, %s) "
+        "ON DUPLICATE KEY UPDATE rows_written = VALUES(rows_written)",
+        (run_id, rows_written)
+    )
+    con.commit()
+    cur.close()
+
+
+def latest_run(con):
+    """Most recently completed feature_run_id (None before the first run)."""
+    cur = con.cursor()
+    cur.execute("SELECT feature_run_id FROM feature_runs ORDER BY completed_at DESC LIMIT 1")
+    row = cur.fetchone()
+    cur.close()
+    return row[0] if row else None
@@ -1,40 +1,130 @@
+import numpy as np
 import pandas as pd
-import mysql.connector
 import yaml
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import os
+import sys
 import ta
 import warnings
 warnings.filterwarnings("ignore")
 
-os.chdir(os.path.dirname(os.path.abspath(__file__)))
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(HERE)
+sys.path.append(os.path.join(HERE, '..'))
+from db.background_writer import BackgroundWriter, connection_factory
+from ingestion.revisions import ensure_revisions_table, pending_revisions, mark_revisions_applied
+from ingestion.indices import sync_index_dimension, index_names as registered_index_names
+from indicators import FEATURE_COLUMNS, FEATURE_DEFINITIONS, COLUMN_AVERAGES, advance_panel, definition_hash
+from snapshot import publish_snapshot
+from cross_section import (CROSS_SECTIONAL_COLUMNS, CROSS_SECTIONAL_DEFINITIONS, LOOKBACK,
+                           compute_cross_section)
+from state import (ensure_state_table, reset_states, load_states, save_states,
+                   ensure_column_registry, load_column_hashes, mark_columns,
+                   feature_table_columns, add_feature_columns, ensure_runs_table, record_run)
 
 # Load config
-with open('../config/config.yml', 'r') as file:
+with open(os.path.join(HERE, '..', 'config', 'config.yml'), 'r') as file:
     config = yaml.safe_load(file)
 
-con = mysql.connector.connect(
-    host=config["mysql"]["host"],
-    user=config["mysql"]["user"],
-    password=config["mysql"]["password"],
-    database=config["mysql"]["database"]
-)
+# Per-symbol and cross-sectional columns share one definition registry
+ALL_DEFINITIONS = {**FEATURE_DEFINITIONS, **CROSS_SECTIONAL_DEFINITIONS}
+
+
+_connect = connection_factory(config["mysql"])
+
+
+def use_connections(connect):
+    """Open this module's connections (writers included) through `connect`, e.g. a shared pool."""
+    global _connect
+    _connect = connect
+
+
+def connect():
+    return _connect()
 
-cursor = con.cursor()
 
 # Fetch data
-query_index = "SELECT index_name AS symbol, trade_date, close_price FROM index_prices ORDER BY trade_date"
-query_stocks = "SELECT stock_symbol AS symbol, trade_date, close_price FROM raw_prices ORDER BY trade_date"
+def list_index_names(con):
+    # Every registered index, retired ones included, so none is ranked as a stock
+    return set(registered_index_names(con))
+
+
+def list_symbols(con):
+    cur = con.cursor()
+    cur.execute("SELECT DISTINCT stock_symbol FROM raw_prices")
+    symbols = sorted(list_index_names(con) | {row[0] for row in cur.fetchall()})
+    cur.close()
+    return symbols
+
+
+def load_prices(con, after_watermark=False, symbols=None, since=None):
+    """
+    Closes of every index and stock, sorted by symbol and date.
+    after_watermark=True returns only bars newer than each symbol's
+    feature_state watermark (all bars for symbols without state).
+    symbols limits the read to one slice of the universe.
+    since limits the read to bars on or after that date.
+    """
+    params = ()
+    index_filter = stock_filter = ""
+    if symbols is not None:
+        placeholders = ", ".join(["%s"] * len(symbols))
+        index_filter = f"AND p.index_name IN ({placeholders})"
+        stock_filter = f"AND p.stock_symbol IN ({placeholders})"
+        params = tuple(symbols)
+    if since is not None:
+        index_filter += " AND p.trade_date >= %s"
+        stock_filter += " AND p.trade_date >= %s"
+        params = params + (since,)
 
-df_index = pd.read_sql(query_index, con)
-df_stocks = pd.read_sql(query_stocks, con)
+    if after_watermark:
+        query_index = f"""
+        SELECT p.index_name AS symbol, p.trade_date, p.close_price
+        FROM index_prices p
+        LEFT JOIN feature_state s ON s.symbol = p.index_name
+        WHERE (s.last_trade_date IS NULL OR p.trade_date > s.last_trade_date) {index_filter}
+        ORDER BY p.trade_date
+        """
+        query_stocks = f"""
+        SELECT p.stock_symbol AS symbol, p.trade_date, p.close_price
+        FROM raw_prices p
+        LEFT JOIN feature_state s ON s.symbol = p.stock_symbol
+        WHERE (s.last_trade_date IS NULL OR p.trade_date > s.last_trade_date) {stock_filter}
+        ORDER BY p.trade_date
+        """
+    else:
+        query_index = f"""
+        SELECT p.index_name AS symbol, p.trade_date, p.close_price
+        FROM index_prices p WHERE 1 = 1 {index_filter} ORDER BY p.trade_date
+        """
+        query_stocks = f"""
+        SELECT p.stock_symbol AS symbol, p.trade_date, p.close_price
+        FROM raw_prices p WHERE 1 = 1 {stock_filter} ORDER BY p.trade_date
+        """
 
-# Combine & preprocess
-df_all = pd.concat([df_index, df_stocks], ignore_index=True)
-df_all['trade_date'] = pd.to_datetime(df_all['trade_date'])
-df_all = df_all.sort_values(by=['symbol', 'trade_date'])
+    df_index = pd.read_sql(query_index, con, params=params or None)
+    df_stocks = pd.read_sql(query_stocks, con, params=params or None)
 
-# Indicator calculation per symbol
+    # Combine & preprocess
+    df_all = pd.concat([df_index, df_stocks], ignore_index=True)
+    df_all['trade_date'] = pd.to_datetime(df_all['trade_date'])
+    df_all['close_price'] = df_all['close_price'].astype(float)
+    return df_all.sort_values(by=['symbol', 'trade_date'])
+
+
+def prices_after_watermark(prices, states, symbols):
+    """
+    load_prices(after_watermark=True) over closes already in memory:
+    `prices` rows (symbol, trade_date, close_price) of `symbols` newer
+    than each symbol's watermark in `states`.
+    """
+    df_all = prices[prices['symbol'].isin(symbols)]
+    watermark = pd.to_datetime(df_all['symbol'].map({s: st[0] for s, st in states.items()}))
+    return df_all[~(df_all['trade_date'] <= watermark)].sort_values(by=['symbol', 'trade_date'])
+
+
+# Indicator calculation per symbol (reference `ta` implementation)
 def calculate_technical_indicators(group):
     g = group.copy()
     g['rsi_14'] = ta.momentum.rsi(g['close_price'], window=14)
@@ -47,43 +137,447 @@ def calculate_technical_indicators(group):
     g['ema_50'] = ta.trend.ema_indicator(g['close_price'], window=50)
     return g
 
-df_indicators = (
-    df_all.groupby('symbol', group_keys=False)
-          .apply(calculate_technical_indicators)
-          .reset_index(drop=True)
-)
+
+def to_panel(df_all):
+    """Pivot long (symbol, trade_date, close_price) rows into a dates x symbols panel."""
+    df_all = df_all.drop_duplicates(subset=['symbol', 'trade_date'], keep='last')
+    wide = df_all.pivot(index='trade_date', columns='symbol', values='close_price').sort_index()
+    return wide.to_numpy(dtype=float), wide.index, list(wide.columns)
+
+
+def calculate_incremental(df_all, states, columns=None):
+    """
+    Resume every symbol from its saved state over the new bars only,
+    all symbols at once on a dates x symbols panel. columns limits the
+    kernels run (default: every feature column).
+    Returns (df_indicators, new_states).
+    """
+    columns = FEATURE_COLUMNS if columns is None else list(columns)
+    if df_all.empty:
+        return pd.DataFrame(columns=['symbol', 'trade_date'] + columns), {}
+
+    panel, dates, symbols = to_panel(df_all)
+    previous = [states[s][1] if s in states else None for s in symbols]
+    values, panel_states = advance_panel(panel, previous, columns)
+
+    # Back to long rows (symbol-major, date order) for present bars only
+    sym_idx, date_idx = (panel.T == panel.T).nonzero()
+    df_indicators = pd.DataFrame({
+        'symbol': [symbols[j] for j in sym_idx],
+        'trade_date': dates[date_idx],
+        'close_price': panel[date_idx, sym_idx],
+    })
+    for column in columns:
+        df_indicators[column] = values[column][date_idx, sym_idx]
+
+    last_bar = panel.shape[0] - 1 - np.argmax((panel == panel)[::-1], axis=0)
+    new_states = {
+        symbol: (dates[last_bar[j]].date(), panel_states[j])
+        for j, symbol in enumerate(symbols)
+    }
+    return df_indicators, new_states
+
 
 # Prepare batch insert
-insert_query = """
+insert_query = f"""
 INSERT INTO features
-(stock_symbol, trade_date, rsi_14, macd, macd_signal, momentum_10d,
- volatility_20d, sma_20, ema_50, feature_run_id)
-VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+(stock_symbol, trade_date, {", ".join(FEATURE_COLUMNS)}, feature_run_id)
+VALUES ({", ".join(["%s"] * (len(FEATURE_COLUMNS) + 3))})
 """
 
-run_id = f"techind_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-batch_data = []
-
-for _, row in df_indicators.iterrows():
-    batch_data.append((
-        row['symbol'],
-        row['trade_date'].date(),
-        float(row['rsi_14']) if pd.notna(row['rsi_14']) else None,
-        float(row['macd']) if pd.notna(row['macd']) else None,
-        float(row['macd_signal']) if pd.notna(row['macd_signal']) else None,
-        float(row['momentum_10d']) if pd.notna(row['momentum_10d']) else None,
-        float(row['volatility_20d']) if pd.notna(row['volatility_20d']) else None,
-        float(row['sma_20']) if pd.notna(row['sma_20']) else None,
-        float(row['ema_50']) if pd.notna(row['ema_50']) else None,
-        run_id
-    ))
-
-# Execute in batches
-cursor.executemany(insert_query, batch_data)
-con.commit()
-
-cursor.close()
-con.close()
-
-print("Indicators processed and inserted successfully.")
-print(f"Run ID: {run_id}")
+
+def _nullable(series):
+    # NaN -> None so the driver writes SQL NULL; values as plain Python floats
+    return [None if pd.isna(v) else float(v) for v in series.tolist()]
+
+
+def _submit_in_batches(writer, rows, batch_size):
+    batch_data = []
+    for row in rows:
+        batch_data.append(row)
+        if len(batch_data) >= batch_size:
+            writer.submit(batch_data)
+            batch_data = []
+    writer.submit(batch_data)
+
+
+def write_features(df_indicators, run_id, batch_size=5000):
+    symbols = df_indicators['symbol'].tolist()
+    dates = [d.date() for d in df_indicators['trade_date']]
+    values = [_nullable(df_indicators[c]) for c in FEATURE_COLUMNS]
+    rows = (
+        (symbols[i], dates[i], *(col[i] for col in values), run_id)
+        for i in range(len(symbols))
+    )
+
+    # Rows are flushed on a background thread while the next batch is built
+    with BackgroundWriter(insert_query, connect, name="features-writer") as writer:
+        _submit_in_batches(writer, rows, batch_size)
+
+    return writer.rows_written
+
+
+def update_feature_columns(df_indicators, columns, batch_size=5000):
+    """
+    Overwrite only `columns` on existing (stock_symbol, trade_date) rows:
+    the values are bulk-inserted into a temporary table on one connection
+    and applied with a single UPDATE ... JOIN.
+    """
+    symbols = df_indicators['symbol'].tolist()
+    dates = [d.date() for d in df_indicators['trade_date']]
+    values = [_nullable(df_indicators[c]) for c in columns]
+    rows = [(symbols[i], dates[i], *(col[i] for col in values)) for i in range(len(symbols))]
+
+    con = connect()
+    try:
+        cur = con.cursor()
+        cur.execute("DROP TEMPORARY TABLE IF EXISTS features_patch")
+        cur.execute(f"""
+        CREATE TEMPORARY TABLE features_patch (
+            stock_symbol VARCHAR(50) NOT NULL,
+            trade_date DATE NOT NULL,
+            {", ".join(f"{c} DOUBLE NULL" for c in columns)},
+            PRIMARY KEY (stock_symbol, trade_date)
+        )
+        """)
+        # executemany folds a plain INSERT into multi-row statements
+        insert = f"""
+        INSERT INTO features_patch (stock_symbol, trade_date, {", ".join(columns)})
+        VALUES ({", ".join(["%s"] * (len(columns) + 2))})
+        """
+        for start in range(0, len(rows), batch_size):
+            cur.executemany(insert, rows[start:start + batch_size])
+        cur.execute(f"""
+        UPDATE features f
+        JOIN features_patch p ON p.stock_symbol = f.stock_symbol AND p.trade_date = f.trade_date
+        SET {", ".join(f"f.{c} = p.{c}" for c in columns)}
+        """)
+        updated = cur.rowcount
+        con.commit()
+        cur.execute("DROP TEMPORARY TABLE features_patch")
+        cur.close()
+    finally:
+        con.close()
+    return updated
+
+
+def prepare_feature_columns(con):
+    """
+    Compare each column's definition hash with the registry.
+    Columns already in `features` but unknown to the registry are adopted
+    as-is; brand-new columns are added to the table. Returns the columns
+    that need a history backfill (new or redefined).
+    """
+    ensure_column_registry(con)
+    registered = load_column_hashes(con)
+    present = feature_table_columns(con)
+    current = {c: definition_hash(c, ALL_DEFINITIONS) for c in FEATURE_COLUMNS + CROSS_SECTIONAL_COLUMNS}
+
+    adopted = {c: h for c, h in current.items() if c not in registered and c in present}
+    mark_columns(con, adopted, None)
+
+    stale = [c for c, h in current.items() if c not in adopted and registered.get(c) != h]
+    add_feature_columns(con, [c for c in stale if c not in present])
+    return stale
+
+
+def backfill_feature_columns(con, columns, run_id, prices=None):
+    """
+    Recompute history for `columns` only and UPDATE them in place; every
+    other column keeps its stored values. Only those columns' kernels are
+    replayed, up to each symbol's watermark, and their averages are
+    merged into the saved state so later incremental runs continue the
+    new definition. prices: closes already in memory, else read here.
+    """
+    states = load_states(con)
+    df_all = load_prices(con) if prices is None else prices
+    # Bars up to each watermark (none for symbols without state: they replay
+    # in full, under the new definitions, on their next run anyway)
+    watermark = pd.to_datetime(df_all['symbol'].map({s: st[0] for s, st in states.items()}))
+    df_all = df_all[df_all['trade_date'] <= watermark].sort_values(by=['symbol', 'trade_date'])
+    df_indicators, replay_states = calculate_incremental(df_all, {}, columns)
+
+    rows = update_feature_columns(df_indicators, columns)
+    averages = {name for c in columns for name in COLUMN_AVERAGES[c]}
+    merged = {}
+    for symbol, (trade_date, state) in replay_states.items():
+        state = dict(states[symbol][1], **{name: state[name] for name in averages})
+        merged[symbol] = (states[symbol][0], state)
+    save_states(con, merged, run_id)
+    mark_columns(con, {c: definition_hash(c, ALL_DEFINITIONS) for c in columns}, run_id)
+    print(f"Backfilled columns {columns} on {rows} existing rows.")
+
+
+def _lookback_start(con, start):
+    # Trade date LOOKBACK bars before `start`, so returns and relative
+    # strength on the first recomputed date see their full window
+    cur = con.cursor()
+    cur.execute(
+        """
+        SELECT MIN(trade_date) FROM (
+            SELECT DISTINCT trade_date FROM index_prices
+            WHERE trade_date < %s ORDER BY trade_date DESC LIMIT %s
+        ) t
+        """,
+        (start, LOOKBACK)
+    )
+    row = cur.fetchone()
+    cur.close()
+    return row[0] if row and row[0] is not None else start
+
+
+def load_rsi(con, since=None):
+    """Latest stored rsi_14 per (symbol, trade_date), optionally from `since` on."""
+    query = """
+    SELECT stock_symbol AS symbol, trade_date, rsi_14, feature_run_id
+    FROM features WHERE 1 = 1
+    """ + (" AND trade_date >= %s" if since is not None else "")
+    df = pd.read_sql(query, con, params=(since,) if since is not None else None)
+    df['trade_date'] = pd.to_datetime(df['trade_date'])
+    df = (df.sort_values('feature_run_id', na_position='first')
+            .drop_duplicates(subset=['symbol', 'trade_date'], keep='last'))
+    return df.pivot(index='trade_date', columns='symbol', values='rsi_14')
+
+
+def update_cross_section(con, start, run_id):
+    """
+    Recompute the cross-sectional columns for every trade date from
+    `start` on (None = all history) across the whole universe, and
+    UPDATE them onto the stored feature rows.
+    """
+    since = _lookback_start(con, start) if start is not None else None
+    df_all = load_prices(con, since=since)
+    if df_all.empty:
+        return 0
+
+    panel, dates, symbols = to_panel(df_all)
+    rsi = load_rsi(con, since).reindex(index=dates, columns=symbols).to_numpy(dtype=float)
+    index_names = list_index_names(con)
+    is_stock = np.array([s not in index_names for s in symbols])
+    benchmark = CROSS_SECTIONAL_DEFINITIONS["rs_nifty50"]["benchmark"]
+    benchmark_col = symbols.index(benchmark) if benchmark in symbols else None
+
+    values = compute_cross_section(panel, rsi, is_stock, benchmark_col)
+
+    # Only dates in the recompute window are written back
+    first = 0 if start is None else int(np.searchsorted(dates, pd.Timestamp(start)))
+    present = panel[first:] == panel[first:]
+    date_idx, sym_idx = present.nonzero()
+    date_idx = date_idx + first
+    df_cross = pd.DataFrame({
+        'symbol': [symbols[j] for j in sym_idx],
+        'trade_date': dates[date_idx],
+    })
+    for column in CROSS_SECTIONAL_COLUMNS:
+        df_cross[column] = values[column][date_idx, sym_idx]
+
+    rows = update_feature_columns(df_cross, CROSS_SECTIONAL_COLUMNS)
+    mark_columns(con, {c: definition_hash(c, ALL_DEFINITIONS) for c in CROSS_SECTIONAL_COLUMNS}, run_id)
+    return rows
+
+
+def run_shard(shard_id, symbols, run_id, revised=None, prices=None):
+    """
+    Compute and store one slice of the universe on its own connection.
+    A symbol whose indicators fail is reported and skipped; the rest of
+    the shard is still written. Returns a report dict for the parent.
+    revised: {symbol: first_changed_date} for symbols replayed after a
+    price revision; only their rows from that date on are rewritten.
+    prices: closes already in memory (see prices_after_watermark), else
+    the shard reads its bars from the price tables.
+    """
+    report = {"shard": shard_id, "symbols": len(symbols), "rows": 0, "failed": [], "error": None,
+              "first_date": None}
+    con = connect()
+
+    try:
+        states = load_states(con, symbols)
+        if prices is None:
+            df_all = load_prices(con, after_watermark=True, symbols=symbols)
+        else:
+            df_all = prices_after_watermark(prices, states, symbols)
+
+        try:
+            df_indicators, new_states = calculate_incremental(df_all, states)
+        except Exception:
+            # Isolate the bad series: redo the slice one symbol at a time
+            frames, new_states = [], {}
+            for symbol, group in df_all.groupby('symbol', sort=False):
+                try:
+                    frame, symbol_state = calculate_incremental(group, states)
+                    frames.append(frame)
+                    new_states.update(symbol_state)
+                except Exception as e:
+                    report["failed"].append((symbol, repr(e)))
+            df_indicators = pd.concat(frames, ignore_index=True) if frames else df_all.iloc[0:0]
+
+        if revised:
+            first_changed = pd.to_datetime(df_indicators['symbol'].map(revised))
+            df_indicators = df_indicators[~(df_indicators['trade_date'] < first_changed)]
+
+        report["rows"] = write_features(df_indicators, run_id)
+        if not df_indicators.empty:
+            report["first_date"] = df_indicators['trade_date'].min().date()
+        # Watermarks move only after the rows they cover are committed
+        save_states(con, new_states, run_id)
+    except Exception as e:
+        report["error"] = repr(e)
+    finally:
+        con.close()
+
+    return report
+
+
+def prepare_features(con, incremental=True):
+    """
+    Ready the tables and kernel state for a run. Returns
+    (symbols, revised, revision_ids, stale_columns) for plan_shards() and
+    finish_features(); revised maps symbol -> first changed date.
+    """
+    ensure_state_table(con)
+    ensure_runs_table(con)
+    ensure_revisions_table(con)
+    sync_index_dimension(con, config)
+    stale_columns = prepare_feature_columns(con)
+    revised, revision_ids = pending_revisions(con, "features")
+    if not incremental:
+        reset_states(con)
+        revised = {}  # full replay rewrites every row anyway
+    elif revised:
+        # Revised history: replay those symbols from scratch (kernel state
+        # is only kept at the watermark) and rewrite from the first change
+        reset_states(con, list(revised))
+        print(f"Recomputing {len(revised)} revised symbols from their first changed bar.")
+    return list_symbols(con), revised, revision_ids, stale_columns
+
+
+def plan_shards(symbols, n_shards):
+    """
+    Round-robin over the sorted universe keeps shard sizes even;
+    a few shards per worker smooths out uneven history lengths.
+    """
+    n_shards = max(1, min(len(symbols), n_shards))
+    return [symbols[i::n_shards] for i in range(n_shards)]
+
+
+def finish_features(con, run_id, rows, new_dates, incremental, stale_columns, revision_ids, prices=None):
+    """
+    Everything after the shards have committed: column backfills, the
+    cross-sectional pass, revision bookkeeping, the snapshot and the run
+    record. new_dates are the shards' first written dates; prices the
+    closes already in memory, if any.
+    """
+    stale_cross = [c for c in stale_columns if c in CROSS_SECTIONAL_COLUMNS]
+    stale_columns = [c for c in stale_columns if c in FEATURE_COLUMNS]
+
+    if not incremental:
+        # Every row was just rewritten under the current definitions
+        mark_columns(con, {c: definition_hash(c) for c in FEATURE_COLUMNS}, run_id)
+    elif stale_columns:
+        backfill_feature_columns(con, stale_columns, run_id, prices)
+
+    # Cross-sectional features need every symbol of a date, so they run
+    # here over the whole universe once the shards have committed
+    if not incremental or stale_cross:
+        cross_rows = update_cross_section(con, None, run_id)
+    elif new_dates:
+        cross_rows = update_cross_section(con, min(new_dates), run_id)
+    else:
+        cross_rows = 0
+    print(f"Cross-sectional features updated on {cross_rows} rows.")
+
+    # Swap in the latest-vector snapshot, then land the run last so
+    # feature readers drop their caches
+    mark_revisions_applied(con, "features", run_id, revision_ids)
+    snapshot_rows = publish_snapshot(con)
+    print(f"Snapshot published for {snapshot_rows} symbols.")
+    record_run(con, run_id, rows)
+
+
+def run_features(incremental=True, use_ta=False, workers=1, prices=None, mp_context=None):
+    """
+    incremental : only bars after each symbol's feature watermark, resumed
+                  from the saved kernel state (False = replay all history)
+    use_ta      : legacy full recompute through the `ta` library, no state
+    workers     : >1 shards the symbol universe across a process pool
+    prices      : every symbol's closes (symbol, trade_date, close_price)
+                  already in memory, instead of reading the price tables
+    mp_context  : multiprocessing context for that pool (default: platform's)
+    """
+    run_id = f"techind_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    con = connect()
+
+    try:
+        if use_ta:
+            df_all = load_prices(con) if prices is None else prices.sort_values(by=['symbol', 'trade_date'])
+            df_indicators = (
+                df_all.groupby('symbol', group_keys=False)
+                      .apply(calculate_technical_indicators)
+                      .reset_index(drop=True)
+            )
+            rows = write_features(df_indicators, run_id)
+            publish_snapshot(con)
+            ensure_runs_table(con)
+            record_run(con, run_id, rows)
+            print("Indicators processed and inserted successfully.")
+            print(f"Run ID: {run_id} | Rows written: {rows}")
+            return run_id
+
+        symbols, revised, revision_ids, stale_columns = prepare_features(con, incremental)
+    finally:
+        con.close()
+
+    shards = plan_shards(symbols, workers * 4 if workers > 1 else 1)
+
+    if workers > 1:
+        reports = []
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as pool:
+            futures = [
+                pool.submit(run_shard, i, shard, run_id, {s: revised[s] for s in shard if s in revised},
+                            None if prices is None else prices[prices['symbol'].isin(shard)])
+                for i, shard in enumerate(shards)
+            ]
+            for future in as_completed(futures):
+                reports.append(future.result())
+    else:
+        reports = [run_shard(i, shard, run_id, revised, prices) for i, shard in enumerate(shards)]
+
+    rows = sum(r["rows"] for r in reports)
+    failed_shards = [r for r in sorted(reports, key=lambda r: r["shard"]) if r["error"]]
+
+    for r in sorted(reports, key=lambda r: r["shard"]):
+        print(f"[shard {r['shard']}] symbols={r['symbols']} rows={r['rows']} "
+              f"failed_symbols={len(r['failed'])}" + (f" ERROR={r['error']}" if r["error"] else ""))
+        for symbol, error in r["failed"]:
+            print(f"WARNING: {symbol} skipped: {error}", file=sys.stderr)
+
+    if failed_shards:
+        print(f"{len(failed_shards)} of {len(reports)} shards failed. Run ID: {run_id}", file=sys.stderr)
+        sys.exit(1)
+
+    con = connect()
+    try:
+        new_dates = [r["first_date"] for r in reports if r["first_date"] is not None]
+        finish_features(con, run_id, rows, new_dates, incremental, stale_columns, revision_ids, prices)
+    finally:
+        con.close()
+
+    print("Indicators processed and inserted successfully.")
+    print(f"Run ID: {run_id} | Rows written: {rows}")
+    return run_id
+
+
+if __name__ == "__main__":
+    # --full replays every symbol from its first bar and rebuilds state
+    # --ta uses the legacy `ta` groupby path (no warm-start state)
+    # --workers N shards symbols across N processes (default: config)
+    feature_cfg = config.get("feature_store", {})
+    workers = feature_cfg.get("workers", 1)
+    if "--workers" in sys.argv:
+        workers = int(sys.argv[sys.argv.index("--workers") + 1])
+
+    run_features(
+        incremental=feature_cfg.get("incremental", True) and "--full" not in sys.argv,
+        use_ta="--ta" in sys.argv,
+        workers=workers
+    )
@@ -1,23 +1,55 @@
 import os
-import subprocess
 import sys
 
-# move to the script's directory
-os.chdir(os.path.dirname(os.path.abspath(__file__)))
+import mysql.connector
+import yaml
 
-print("\nStarting Feedback Processing...\n")
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(HERE)
+sys.path.append(os.path.join(HERE, '..'))
+from db.background_writer import connection_factory
+from index_prices_feedback import index_feedback
+from raw_prices_feedback import raw_feedback
 
-def run_step(label, command):
+
+def run_step(label, step, *args):
     print(f"{label} ...")
-    try:
-        subprocess.run(command, check=True)
-        print(f" {label} completed.\n")
-    except subprocess.CalledProcessError:
-        print(f" {label} FAILED. Aborting ingestion.\n")
-        sys.exit(1)
+    result = step(*args)
+    print(f" {label} completed.\n")
+    return result
+
+
+def run_feedback(con, config, connect, index_df=None, raw_df=None, scope=None):
+    """
+    Index, then stock outcomes, in this process. index_df / raw_df: closes
+    already in memory (see index_feedback / raw_feedback), else read here.
+    scope: (symbols, start, end) refreshes only the outcomes a change to
+    those bars can move, e.g. after a backfill.
+    """
+    print("\nStarting Feedback Processing...\n")
+    run_step("Index Price Feedback Processing", index_feedback, con, config, connect, None, index_df, scope)
+    run_step("Stock Price Feedback Processing", raw_feedback, con, connect, raw_df, scope)
+    print("Feedback Processing completed successfully.\n")
 
-# execute ingestion scripts in order
-run_step("Index Price Feedback Processing", ["python", "index_prices_feedback.py"])
-run_step("Stock Price Feedback Processing", ["python", "raw_prices_feedback.py"])
 
-print("Feedback Processing completed successfully.\n")
\ No newline at end of file
+if __name__ == "__main__":
+    # --symbols A,B --from YYYY-MM-DD --to YYYY-MM-DD (exclusive) refreshes only that slice
+    with open(os.path.join(HERE, '..', 'config', 'config.yml'), 'r') as file:
+        config = yaml.safe_load(file)
+
+    scope = None
+    if "--symbols" in sys.argv:
+        scope = (sys.argv[sys.argv.index("--symbols") + 1].split(","),
+                 sys.argv[sys.argv.index("--from") + 1], sys.argv[sys.argv.index("--to") + 1])
+
+    con = mysql.connector.connect(
+        host=config["mysql"]["host"],
+        user=config["mysql"]["user"],
+        password=config["mysql"]["password"],
+        database=config["mysql"]["database"]
+    )
+    # A failed step raises: traceback on stderr, exit status 1
+    try:
+        run_feedback(con, config, connection_factory(config["mysql"]), scope=scope)
+    finally:
+        con.close()
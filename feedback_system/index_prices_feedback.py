@@ -1,121 +1,135 @@
 import mysql.connector
 import yaml
 import os
+import numpy as np
 import pandas as pd
+import sys
 import warnings
 warnings.filterwarnings("ignore")
 
-os.chdir(os.path.dirname(os.path.abspath(__file__)))
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(HERE, '..'))
+from db.background_writer import BackgroundWriter, connection_factory
+from ingestion.indices import sync_index_dimension, index_names
+from feedback_system.outcomes import in_scope, upsert_query
 
-# Load config
-with open('../config/config.yml', 'r') as file:
-    config = yaml.safe_load(file)
-
-con = mysql.connector.connect(
-    host=config["mysql"]["host"],
-    user=config["mysql"]["user"],
-    password=config["mysql"]["password"],
-    database=config["mysql"]["database"]
-)
-
-# ======================================
-# FETCH INDEX DATA
-# ======================================
-query = """
-SELECT index_name AS index_symbol, trade_date, close_price
-FROM index_prices
-WHERE REPLACE(index_name,' ','') = 'NIFTY50'
-ORDER BY trade_date;
-"""
-
-df = pd.read_sql(query, con)
-df['trade_date'] = pd.to_datetime(df['trade_date'])
-
-# ======================================
-# CALCULATIONS
-# ======================================
-df['return_5d'] = df['close_price'].pct_change(5)
-df['return_10d'] = df['close_price'].pct_change(10)
-df['max_drawdown'] = (
-    df['close_price'] - df['close_price'].rolling(10, min_periods=1).min()
-) / df['close_price'] * 100
-
-# Placeholder action (to replace with signal logic later)
-df['action'] = "BUY"
 
 # ======================================
 # OUTCOME LOGIC
 # ======================================
-def evaluate_outcome(action, r):
-    if pd.isna(r):
-        return None, None
-    
-    # HIT / MISS
-    outcome = "MISS"
-    if action == "BUY" and r > 0:
-        outcome = "HIT"
-    elif action == "SELL" and r < 0:
-        outcome = "HIT"
-    elif action in ["WATCH", "HOLD"]:
-        outcome = "HIT"
-    
-    # STRENGTH / GRADE
-    if r > 0.01:
-        magnitude = "STRONG_WIN"
-    elif 0 < r <= 0.01:
-        magnitude = "WEAK_WIN"
-    elif r < -0.01:
-        magnitude = "STRONG_LOSS"
-    elif -0.01 <= r < 0:
-        magnitude = "WEAK_LOSS"
-    else:
-        magnitude = None
+def evaluate_outcomes(action, r):
+    """Vectorized (outcome_label, magnitude_label); both None where the return is unknown."""
+    known = r.notna()
+    hit = ((action == "BUY") & (r > 0)) | ((action == "SELL") & (r < 0)) | action.isin(["WATCH", "HOLD"])
+    outcome = np.where(hit, "HIT", "MISS").astype(object)
+    outcome[~known.to_numpy()] = None
 
+    # STRENGTH / GRADE
+    magnitude = np.select(
+        [r > 0.01, (r > 0) & (r <= 0.01), r < -0.01, (r >= -0.01) & (r < 0)],
+        ["STRONG_WIN", "WEAK_WIN", "STRONG_LOSS", "WEAK_LOSS"],
+        default=None
+    )
     return outcome, magnitude
 
-df[['outcome_label', 'magnitude_label']] = df.apply(
-    lambda row: evaluate_outcome(row['action'], row['return_5d']),
-    axis=1,
-    result_type="expand"
-)
 
-# ======================================
-# FINAL FORMAT
-# ======================================
-final_df = df.rename(columns={"trade_date": "signal_date"})
+def _nullable(series):
+    return series.astype(object).where(series.notna(), None).tolist()
+
+
+def index_feedback(con, config, connect, keys=None, df=None, scope=None):
+    """
+    Store signal outcomes for every active index (or the index keys given).
+    df: closes already in memory (index_symbol, trade_date, close_price,
+    sorted by index and date), else read here. scope: (symbols, start,
+    end) writes only the outcomes a change to those bars can move (see
+    in_scope). Returns the rows written.
+    """
+    # ======================================
+    # FETCH INDEX DATA
+    # ======================================
+    # Selected through the index dimension: equality lookups on indexed keys
+    if df is None:
+        sync_index_dimension(con, config)
+        names = index_names(con, keys=keys, active_only=keys is None)
+        if scope is not None:
+            names = [n for n in names if n in scope[0]]
+        if not names:
+            print("No matching indices in index_dimension.")
+            return 0
+
+        query = f"""
+        SELECT index_name AS index_symbol, trade_date, close_price
+        FROM index_prices
+        WHERE index_name IN ({", ".join(["%s"] * len(names))})
+        ORDER BY index_name, trade_date;
+        """
+
+        df = pd.read_sql(query, con, params=tuple(names))
+    df['trade_date'] = pd.to_datetime(df['trade_date'])
+    df['close_price'] = df['close_price'].astype(float)
+
+    # ======================================
+    # CALCULATIONS (all indices at once, windows never cross indices)
+    # ======================================
+    close = df.groupby('index_symbol', sort=False)['close_price']
+    df['return_5d'] = close.pct_change(5)
+    df['return_10d'] = close.pct_change(10)
+    rolling_min = close.rolling(10, min_periods=1).min().reset_index(level=0, drop=True)
+    df['max_drawdown'] = (df['close_price'] - rolling_min) / df['close_price'] * 100
+
+    # Placeholder action (to replace with signal logic later)
+    df['action'] = "BUY"
+    df['outcome_label'], df['magnitude_label'] = evaluate_outcomes(df['action'], df['return_5d'])
+
+    # ======================================
+    # FINAL FORMAT
+    # ======================================
+    if scope is not None:
+        df = df[in_scope(df, 'index_symbol', scope)]
+    final_df = df.rename(columns={"trade_date": "signal_date"})
+
+    # ======================================
+    # UPSERT INTO index_prices_signal_outcomes (one row per index and date)
+    # ======================================
+    insert_query = upsert_query("index_prices_signal_outcomes", "index_symbol")
+
+    batch_size = 5000
+    rows = list(zip(
+        final_df['index_symbol'].tolist(),
+        [d.date() for d in final_df['signal_date']],
+        final_df['action'].tolist(),
+        _nullable(final_df['return_5d']),
+        _nullable(final_df['return_10d']),
+        _nullable(final_df['max_drawdown']),
+        final_df['outcome_label'].tolist()
+    ))
+
+    # Rows are flushed on a background thread while the next batch is built
+    with BackgroundWriter(insert_query, connect, name="index-feedback-writer") as writer:
+        for i in range(0, len(rows), batch_size):
+            writer.submit(rows[i:i + batch_size])
+
+    if writer.rows_written:
+        print(f"INSERTED ROWS: {writer.rows_written} rows recorded in index_prices_signal_outcomes.")
+    else:
+        print("No data to insert. Please check source table.")
 
-# ======================================
-# INSERT INTO index_prices_signal_outcomes
-# ======================================
-insert_query = """
-INSERT INTO index_prices_signal_outcomes
-(index_symbol, signal_date, action, return_5d, return_10d, max_drawdown, outcome_label)
-VALUES (%s, %s, %s, %s, %s, %s, %s)
-"""
-
-cur = con.cursor(buffered=True)
-
-batch_data = [
-    (
-        row['index_symbol'],
-        row['signal_date'].date(),
-        row['action'],
-        float(row['return_5d']) if pd.notna(row['return_5d']) else None,
-        float(row['return_10d']) if pd.notna(row['return_10d']) else None,
-        float(row['max_drawdown']) if pd.notna(row['max_drawdown']) else None,
-        row['outcome_label']
-    )
-    for _, row in final_df.iterrows()
-]
+    print("Mission Complete — Outcomes Stored Successfully.")
+    return writer.rows_written
 
-if batch_data:
-    cur.executemany(insert_query, batch_data)
-    con.commit()
-    print(f"INSERTED ROWS: {cur.rowcount} rows recorded in index_prices_signal_outcomes.")
-else:
-    print("No data to insert. Please check source table.")
 
-cur.close()
-con.close()
+if __name__ == "__main__":
+    # --index KEY (repeatable, e.g. --index NIFTYBANK) limits the run to those indices
+    with open(os.path.join(HERE, '..', 'config', 'config.yml'), 'r') as file:
+        config = yaml.safe_load(file)
 
-print("Mission Complete — Outcomes Stored Successfully.")
+    con = mysql.connector.connect(
+        host=config["mysql"]["host"],
+        user=config["mysql"]["user"],
+        password=config["mysql"]["password"],
+        database=config["mysql"]["database"]
+    )
+    keys = [sys.argv[i + 1] for i, a in enumerate(sys.argv[:-1]) if a == "--index"] or None
+    index_feedback(con, config, connection_factory(config["mysql"]), keys)
+    con.close()
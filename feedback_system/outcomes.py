@@ -0,0 +1,37 @@
+import pandas as pd
+
+
+# =========================
+# Keyed Outcome Writes
+# =========================
+# One outcome row per (symbol, signal_date). Writes upsert on that key, so
+# rerunning the feedback stage (or a backfill's downstream pass) refreshes
+# outcomes whose forward returns have since become known instead of
+# appending duplicates. The key itself is added to older databases by
+# db/setup_db.py.
+
+
+def in_scope(df, key_column, scope):
+    """
+    Mask of the outcome rows a price change in scope = (symbols, start,
+    end) can move: from start through the 10th bar at or after end, since
+    returns and drawdown look back up to 10 bars. df: the scoped symbols'
+    full history, sorted by symbol and date.
+    """
+    start, end = pd.Timestamp(scope[1]), pd.Timestamp(scope[2])
+    bars_after = (df['trade_date'] >= end).groupby(df[key_column]).cumsum()
+    return df[key_column].isin(scope[0]) & (df['trade_date'] >= start) & (bars_after <= 10)
+
+
+def upsert_query(table, key_column):
+    return f"""
+    INSERT INTO {table}
+    ({key_column}, signal_date, action, return_5d, return_10d, max_drawdown, outcome_label)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        action = VALUES(action),
+        return_5d = VALUES(return_5d),
+        return_10d = VALUES(return_10d),
+        max_drawdown = VALUES(max_drawdown),
+        outcome_label = VALUES(outcome_label)
+    """
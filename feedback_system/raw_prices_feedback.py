@@ -2,49 +2,15 @@ import mysql.connector
 import yaml
 import os
 import pandas as pd
+import sys
 import warnings
 warnings.filterwarnings("ignore")
 
-os.chdir(os.path.dirname(os.path.abspath(__file__)))
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(HERE, '..'))
+from db.background_writer import BackgroundWriter, connection_factory
+from feedback_system.outcomes import in_scope, upsert_query
 
-# Load configuration
-with open('../config/config.yml', 'r') as file:
-    config = yaml.safe_load(file)
-
-con = mysql.connector.connect(
-    host=config["mysql"]["host"],
-    user=config["mysql"]["user"],
-    password=config["mysql"]["password"],
-    database=config["mysql"]["database"]
-)
-
-# ======================================
-# FETCH from raw_prices
-# ======================================
-query = """
-SELECT stock_symbol, trade_date, close_price
-FROM raw_prices
-ORDER BY stock_symbol, trade_date;
-"""
-
-df = pd.read_sql(query, con)
-df['trade_date'] = pd.to_datetime(df['trade_date'])
-
-# ======================================
-# CALCULATE PERFORMANCE METRICS
-# ======================================
-df['return_5d'] = df.groupby('stock_symbol')['close_price'].pct_change(5)
-df['return_10d'] = df.groupby('stock_symbol')['close_price'].pct_change(10)
-df['max_drawdown'] = df.groupby('stock_symbol')['close_price'].transform(
-    lambda x: (x - x.rolling(10, min_periods=1).min()) / x * 100
-)
-
-
-# ======================================
-# ACTION COLUMN (initial default)
-# Replace this later with your SIGNAL ENGINE output
-# ======================================
-df['action'] = "BUY"
 
 # ======================================
 # OUTCOME LOGIC
@@ -77,46 +43,111 @@ def evaluate_outcome(action, r):
     return outcome, magnitude
 
 
-df[['outcome_label', 'magnitude_label']] = df.apply(
-    lambda row: evaluate_outcome(row['action'], row['return_5d']),
-    axis=1,
-    result_type="expand"
-)
+def raw_feedback(con, connect, df=None, scope=None):
+    """
+    Store signal outcomes for every stock. df: closes already in memory
+    (stock_symbol, trade_date, close_price, sorted by symbol and date),
+    else read here. scope: (symbols, start, end) writes only the outcomes
+    a change to those bars can move (see in_scope). Returns the rows written.
+    """
+    # ======================================
+    # FETCH from raw_prices
+    # ======================================
+    if df is None and scope is not None:
+        query = f"""
+        SELECT stock_symbol, trade_date, close_price
+        FROM raw_prices
+        WHERE stock_symbol IN ({", ".join(["%s"] * len(scope[0]))})
+        ORDER BY stock_symbol, trade_date;
+        """
+
+        df = pd.read_sql(query, con, params=tuple(scope[0]))
+    elif df is None:
+        query = """
+        SELECT stock_symbol, trade_date, close_price
+        FROM raw_prices
+        ORDER BY stock_symbol, trade_date;
+        """
+
+        df = pd.read_sql(query, con)
+    df['trade_date'] = pd.to_datetime(df['trade_date'])
+
+    # ======================================
+    # CALCULATE PERFORMANCE METRICS
+    # ======================================
+    df['return_5d'] = df.groupby('stock_symbol')['close_price'].pct_change(5)
+    df['return_10d'] = df.groupby('stock_symbol')['close_price'].pct_change(10)
+    df['max_drawdown'] = df.groupby('stock_symbol')['close_price'].transform(
+        lambda x: (x - x.rolling(10, min_periods=1).min()) / x * 100
+    )
 
-final_df = df.rename(columns={"trade_date": "signal_date"})
+    # ======================================
+    # ACTION COLUMN (initial default)
+    # Replace this later with your SIGNAL ENGINE output
+    # ======================================
+    df['action'] = "BUY"
 
-# ======================================
-# BATCH INSERT
-# ======================================
-insert_query = """
-INSERT INTO raw_prices_signal_outcomes
-(stock_symbol, signal_date, action, return_5d, return_10d, max_drawdown, outcome_label)
-VALUES (%s, %s, %s, %s, %s, %s, %s)
-"""
-
-cur = con.cursor(buffered=True)
-
-batch_records = [
-    (
-        row['stock_symbol'],
-        row['signal_date'].date(),
-        row['action'],
-        float(row['return_5d']) if pd.notna(row['return_5d']) else None,
-        float(row['return_10d']) if pd.notna(row['return_10d']) else None,
-        float(row['max_drawdown']) if pd.notna(row['max_drawdown']) else None,
-        row['outcome_label']
+    df[['outcome_label', 'magnitude_label']] = df.apply(
+        lambda row: evaluate_outcome(row['action'], row['return_5d']),
+        axis=1,
+        result_type="expand"
     )
-    for _, row in final_df.iterrows()
-]
 
-if batch_records:
-    cur.executemany(insert_query, batch_records)
-    con.commit()
-    print(f"INSERTED ROWS: {cur.rowcount}")
-else:
-    print("No data to insert, verify source table.")
+    if scope is not None:
+        df = df[in_scope(df, 'stock_symbol', scope)]
+    final_df = df.rename(columns={"trade_date": "signal_date"})
+
+    # ======================================
+    # BATCH UPSERT (one row per stock and date)
+    # ======================================
+    insert_query = upsert_query("raw_prices_signal_outcomes", "stock_symbol")
+
+    batch_size = 5000
+    batch_records = []
+
+    # Rows are flushed on a background thread while the next batch is built
+    with BackgroundWriter(insert_query, connect, name="raw-feedback-writer") as writer:
+        for _, row in final_df.iterrows():
+            batch_records.append((
+                row['stock_symbol'],
+                row['signal_date'].date(),
+                row['action'],
+                float(row['return_5d']) if pd.notna(row['return_5d']) else None,
+                float(row['return_10d']) if pd.notna(row['return_10d']) else None,
+                float(row['max_drawdown']) if pd.notna(row['max_drawdown']) else None,
+                row['outcome_label']
+            ))
+
+            if len(batch_records) >= batch_size:
+                writer.submit(batch_records)
+                batch_records = []
+
+        writer.submit(batch_records)
+
+    if writer.rows_written:
+        print(f"INSERTED ROWS: {writer.rows_written}")
+    else:
+        print("No data to insert, verify source table.")
+
+    print("Data inserted into raw_prices_signal_outcomes successfully.")
+    return writer.rows_written
 
-cur.close()
-con.close()
 
-print("Data inserted into raw_prices_signal_outcomes successfully.")
+if __name__ == "__main__":
+    # --symbols A,B --from YYYY-MM-DD --to YYYY-MM-DD (exclusive) limits the run to that slice
+    # Load configuration
+    with open(os.path.join(HERE, '..', 'config', 'config.yml'), 'r') as file:
+        config = yaml.safe_load(file)
+
+    con = mysql.connector.connect(
+        host=config["mysql"]["host"],
+        user=config["mysql"]["user"],
+        password=config["mysql"]["password"],
+        database=config["mysql"]["database"]
+    )
+    scope = None
+    if "--symbols" in sys.argv:
+        scope = (sys.argv[sys.argv.index("--symbols") + 1].split(","),
+                 sys.argv[sys.argv.index("--from") + 1], sys.argv[sys.argv.index("--to") + 1])
+    raw_feedback(con, connection_factory(config["mysql"]), scope=scope)
+    con.close()
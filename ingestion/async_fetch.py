@@ -0,0 +1,243 @@
+import asyncio
+import calendar
+import json
+import multiprocessing
+import random
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime
+
+import pandas as pd
+
+# =========================
+# Concurrent OHLCV Fetch Layer
+# =========================
+# Symbols are fetched in chunks, all chunks concurrently, through the
+# Yahoo chart HTTP API (or anything serving the same JSON, e.g. a local
+# stand-in for tests). Every request waits for a token-bucket slot and an
+# in-flight slot; a chunk retries its failed symbols with exponential
+# backoff, and what still fails is reported instead of aborting the run.
+
+DEFAULTS = {
+    "base_url": "https://query1.finance.yahoo.com",
+    "chunk_size": 25,
+    "max_in_flight": 8,
+    "rate_per_sec": 5.0,
+    "burst": 10,
+    "max_retries": 4,
+    "backoff_base": 1.0,
+    "timeout": 30,
+}
+
+USER_AGENT = "Mozilla/5.0 (N-AIRS ingestion)"
+
+# Bar length of the intraday intervals the chart API serves
+INTRADAY_MINUTES = {"1m": 1, "2m": 2, "5m": 5, "15m": 15, "30m": 30, "60m": 60, "90m": 90, "1h": 60}
+
+
+def intraday_minutes(interval):
+    """Bar length in minutes for an intraday interval, None for daily and longer."""
+    return INTRADAY_MINUTES.get(interval)
+
+
+class PermanentFetchError(Exception):
+    """Provider answered, but retrying will not help (unknown symbol, bad request)."""
+
+
+class TokenBucket:
+    """`rate` requests per second on average, bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class SharedTokenBucket:
+    """
+    TokenBucket whose state lives in shared memory: every fetch, in every
+    process holding it, draws from one budget. Build it in the parent and
+    hand it to pool workers through the pool initializer; `ctx` must be the
+    pool's multiprocessing context (default: the default context).
+    """
+
+    def __init__(self, rate, capacity, ctx=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        # [tokens, last refill]; CLOCK_MONOTONIC is system-wide, so processes agree on it
+        self._state = (ctx or multiprocessing).Array("d", [float(capacity), time.monotonic()])
+
+    def _take(self):
+        """Take a token, or return how long to wait for one."""
+        with self._state.get_lock():
+            now = time.monotonic()
+            tokens = min(self.capacity, self._state[0] + (now - self._state[1]) * self.rate)
+            self._state[1] = now
+            if tokens >= 1:
+                self._state[0] = tokens - 1
+                return 0.0
+            self._state[0] = tokens
+            return (1 - tokens) / self.rate
+
+    async def acquire(self):
+        while True:
+            wait = self._take()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+
+def shared_rate_limit(settings=None):
+    """SharedTokenBucket at the configured rate_per_sec / burst."""
+    s = {**DEFAULTS, **(settings or {})}
+    return SharedTokenBucket(s["rate_per_sec"], s["burst"])
+
+
+class FetchReport:
+    def __init__(self):
+        self.frames = {}      # symbol -> OHLCV DataFrame indexed by trade date
+        self.failed = {}      # symbol -> last error
+        self.requests = 0
+        self.retries = 0
+        self.elapsed = 0.0
+
+    def summary(self):
+        return (f"fetched={len(self.frames)} failed={len(self.failed)} "
+                f"requests={self.requests} retries={self.retries} elapsed={self.elapsed:.1f}s")
+
+
+def _epoch(day):
+    """UTC midnight of a 'YYYY-MM-DD' day, whatever the host's timezone."""
+    return calendar.timegm(datetime.strptime(day, '%Y-%m-%d').timetuple())
+
+
+def chart_url(base_url, ticker, start, end, interval):
+    # UTC midnight is still before the open of every exchange east of UTC (NSE: 03:45 UTC)
+    period1 = _epoch(start)
+    period2 = _epoch(end)
+    query = urllib.parse.urlencode({
+        "period1": period1, "period2": period2, "interval": interval, "events": "history",
+    })
+    return f"{base_url.rstrip('/')}/v8/finance/chart/{urllib.parse.quote(ticker)}?{query}"
+
+
+def parse_chart(payload, interval="1d"):
+    """
+    Yahoo chart JSON -> DataFrame(Open, High, Low, Close, Volume) indexed by
+    trade date, or by bar start time (exchange clock) for intraday intervals.
+    """
+    chart = payload.get("chart") or {}
+    if chart.get("error"):
+        raise PermanentFetchError(chart["error"].get("description") or str(chart["error"]))
+    result = (chart.get("result") or [None])[0]
+    if not result or not result.get("timestamp"):
+        return pd.DataFrame(columns=["Open", "High", "Low", "Close", "Volume"])
+
+    offset = result.get("meta", {}).get("gmtoffset", 0)
+    quote = result["indicators"]["quote"][0]
+    index = pd.to_datetime([t + offset for t in result["timestamp"]], unit="s")
+    if intraday_minutes(interval) is None:
+        index = index.normalize()
+    return pd.DataFrame({
+        "Open": quote.get("open"),
+        "High": quote.get("high"),
+        "Low": quote.get("low"),
+        "Close": quote.get("close"),
+        "Volume": quote.get("volume"),
+    }, index=index, dtype=float)
+
+
+def _get_json(url, timeout):
+    request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        # 429 and 5xx are worth another try; other 4xx are not
+        if e.code != 429 and 400 <= e.code < 500:
+            raise PermanentFetchError(f"HTTP {e.code}") from e
+        raise
+
+
+class AsyncFetcher:
+    def __init__(self, settings=None, bucket=None):
+        self.settings = {**DEFAULTS, **(settings or {})}
+        self.bucket = bucket
+
+    async def _fetch_one(self, ticker, start, end, interval, bucket, in_flight, report):
+        s = self.settings
+        await bucket.acquire()
+        async with in_flight:
+            report.requests += 1
+            url = chart_url(s["base_url"], ticker, start, end, interval)
+            payload = await asyncio.to_thread(_get_json, url, s["timeout"])
+        return parse_chart(payload, interval)
+
+    async def _fetch_chunk(self, chunk, start, end, interval, bucket, in_flight, report):
+        s = self.settings
+        pending = list(chunk)
+        errors = {}
+
+        for attempt in range(s["max_retries"] + 1):
+            if attempt:
+                report.retries += len(pending)
+                delay = s["backoff_base"] * 2 ** (attempt - 1)
+                await asyncio.sleep(delay * (0.5 + random.random()))
+
+            results = await asyncio.gather(
+                *(self._fetch_one(t, start, end, interval, bucket, in_flight, report) for t in pending),
+                return_exceptions=True
+            )
+            retry = []
+            for ticker, result in zip(pending, results):
+                if isinstance(result, Exception):
+                    errors[ticker] = repr(result)
+                    if not isinstance(result, PermanentFetchError):
+                        retry.append(ticker)
+                else:
+                    errors.pop(ticker, None)
+                    report.frames[ticker] = result
+            pending = retry
+            if not pending:
+                break
+
+        report.failed.update(errors)
+
+    async def fetch(self, tickers, start, end, interval="1d"):
+        s = self.settings
+        report = FetchReport()
+        bucket = self.bucket or TokenBucket(s["rate_per_sec"], s["burst"])
+        in_flight = asyncio.Semaphore(s["max_in_flight"])
+        chunks = [tickers[i:i + s["chunk_size"]] for i in range(0, len(tickers), s["chunk_size"])]
+
+        started = time.monotonic()
+        await asyncio.gather(*(
+            self._fetch_chunk(chunk, start, end, interval, bucket, in_flight, report)
+            for chunk in chunks
+        ))
+        report.elapsed = time.monotonic() - started
+        return report
+
+
+def fetch_prices(tickers, start, end, interval="1d", settings=None, bucket=None):
+    """
+    Blocking entry point for the ingestion scripts. Returns a FetchReport.
+    bucket: a SharedTokenBucket to rate-limit against (default: a fresh
+    TokenBucket for this call).
+    """
+    return asyncio.run(AsyncFetcher(settings, bucket).fetch(list(tickers), start, end, interval))
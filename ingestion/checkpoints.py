@@ -0,0 +1,75 @@
+import json
+
+# =========================
+# Per-chunk Ingestion Checkpoints
+# =========================
+# A run's symbol chunks are recorded up front; each chunk is marked DONE
+# in the same transaction as its rows, so `--resume <run_id>` replays the
+# recorded plan and skips everything already committed. A chunk with failed
+# symbols stays PENDING with only those symbols left, so resume retries them.
+CHECKPOINT_DDL = """
+CREATE TABLE IF NOT EXISTS ingestion_checkpoints (
+    run_id VARCHAR(50) NOT NULL,
+    chunk_no INT NOT NULL,
+    symbols_json TEXT NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    rows_loaded INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (run_id, chunk_no)
+)
+"""
+
+
+def ensure_checkpoint_table(con):
+    cursor = con.cursor()
+    cursor.execute(CHECKPOINT_DDL)
+    con.commit()
+    cursor.close()
+
+
+def plan_chunks(con, run_id, symbols, chunk_size):
+    """Record the chunk plan of a new run; returns [(chunk_no, symbols)]."""
+    chunks = [symbols[i:i + chunk_size] for i in range(0, len(symbols), chunk_size)]
+    cursor = con.cursor()
+    cursor.executemany(
+        "INSERT INTO ingestion_checkpoints (run_id, chunk_no, symbols_json, status) VALUES (%s, %s, %s, 'PENDING')",
+        [(run_id, i, json.dumps(chunk)) for i, chunk in enumerate(chunks)]
+    )
+    con.commit()
+    cursor.close()
+    return list(enumerate(chunks))
+
+
+def load_chunks(con, run_id):
+    """Recorded plan of an earlier run: ([(chunk_no, symbols)] still to do, rows already loaded)."""
+    cursor = con.cursor()
+    cursor.execute(
+        "SELECT chunk_no, symbols_json, status, rows_loaded FROM ingestion_checkpoints WHERE run_id = %s ORDER BY chunk_no",
+        (run_id,)
+    )
+    rows = cursor.fetchall()
+    cursor.close()
+    if not rows:
+        raise ValueError(f"No checkpoints recorded for run {run_id}")
+
+    pending = [(chunk_no, json.loads(blob)) for chunk_no, blob, status, _ in rows if status != "DONE"]
+    loaded = sum(n for _, _, _, n in rows)
+    return pending, loaded
+
+
+def mark_chunk_done(cursor, run_id, chunk_no, rows_loaded):
+    """Executed on the chunk's own cursor so it commits together with the rows."""
+    cursor.execute(
+        "UPDATE ingestion_checkpoints SET status = 'DONE', rows_loaded = rows_loaded + %s "
+        "WHERE run_id = %s AND chunk_no = %s",
+        (rows_loaded, run_id, chunk_no)
+    )
+
+
+def mark_chunk_partial(cursor, run_id, chunk_no, rows_loaded, failed):
+    """Like mark_chunk_done, but the chunk stays PENDING with only the failed symbols left."""
+    cursor.execute(
+        "UPDATE ingestion_checkpoints SET symbols_json = %s, rows_loaded = rows_loaded + %s "
+        "WHERE run_id = %s AND chunk_no = %s",
+        (json.dumps(sorted(failed)), rows_loaded, run_id, chunk_no)
+    )
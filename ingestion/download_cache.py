@@ -0,0 +1,156 @@
+import contextlib
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+from datetime import date
+
+from async_fetch import FetchReport, intraday_minutes
+
+# =========================
+# On-disk Download Cache
+# =========================
+# One pickle per (provider, symbol, start, end, interval). A range that
+# ends before today is closed and never expires; one that reaches today
+# expires after `today_ttl` seconds. Files are written to a temp name and
+# renamed into place, and the least recently used files are deleted once
+# the directory grows past `max_bytes`. Empty frames are never cached: a
+# symbol with no bars yet may have some on the next fetch.
+
+
+class DownloadCache:
+    def __init__(self, path, max_bytes=2 * 2**30, today_ttl=900, universe_ttl=86400):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.today_ttl = today_ttl
+        self.universe_ttl = universe_ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+        # file -> [size, last_used]; kept current in memory, re-read from disk
+        # before evicting since other processes share the directory
+        self._scan()
+
+    def _scan(self):
+        self._index = {}
+        for name in os.listdir(self.path):
+            if name.endswith(".pkl"):
+                try:
+                    st = os.stat(os.path.join(self.path, name))
+                except FileNotFoundError:
+                    continue
+                self._index[name] = [st.st_size, st.st_atime]
+        self._nbytes = sum(size for size, _ in self._index.values())
+
+    @staticmethod
+    def _name(key):
+        return hashlib.sha256(json.dumps(key).encode()).hexdigest()[:32] + ".pkl"
+
+    def get(self, key, ttl=None):
+        """Cached value for `key`, or None if absent or older than `ttl` seconds."""
+        name = self._name(key)
+        file_path = os.path.join(self.path, name)
+        try:
+            st = os.stat(file_path)
+            if ttl is not None and time.time() - st.st_mtime > ttl:
+                self.misses += 1
+                return None
+            with open(file_path, "rb") as f:
+                value = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return None
+
+        # Touch atime only: mtime stays the write time the TTL is measured from.
+        # Another process may have evicted the file since; the value is still good.
+        now = time.time()
+        with contextlib.suppress(FileNotFoundError):
+            os.utime(file_path, (now, st.st_mtime))
+        with self._lock:
+            self._index[name] = [st.st_size, now]
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        name = self._name(key)
+        file_path = os.path.join(self.path, name)
+        tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, file_path)
+
+        size = os.path.getsize(file_path)
+        with self._lock:
+            previous = self._index.get(name)
+            self._nbytes += size - (previous[0] if previous else 0)
+            self._index[name] = [size, time.time()]
+            if self._nbytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        self._scan()
+        for name, (size, _) in sorted(self._index.items(), key=lambda item: item[1][1]):
+            if self._nbytes <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.path, name))
+            except FileNotFoundError:
+                pass
+            self._nbytes -= size
+            del self._index[name]
+
+    def range_ttl(self, end):
+        """None (never expires) for a range ending before today, else today_ttl."""
+        return None if end <= date.today().strftime('%Y-%m-%d') else self.today_ttl
+
+
+class CachedProvider:
+    """
+    PriceProvider wrapper: fetch() and list_symbols() from a DownloadCache,
+    `provider` only for misses. refresh=True skips cached bars and
+    overwrites them with the fresh download (repairs after restatements).
+    """
+
+    def __init__(self, provider, cache, refresh=False):
+        self.provider = provider
+        self.cache = cache
+        self.refresh = refresh
+        self.name = provider.name
+
+    def list_symbols(self):
+        key = [self.name, "__universe__"]
+        symbols = self.cache.get(key, ttl=self.cache.universe_ttl)
+        if symbols is None:
+            symbols = self.provider.list_symbols()
+            self.cache.put(key, symbols)
+        return symbols
+
+    def fetch(self, symbols, start, end, interval="1d"):
+        if intraday_minutes(interval) is not None:
+            # Intraday windows reach the bar that just closed; a cached copy is always stale
+            return self.provider.fetch(symbols, start, end, interval)
+        ttl = self.cache.range_ttl(end)
+        report = FetchReport()
+        missing = []
+        for symbol in symbols:
+            frame = None if self.refresh else self.cache.get([self.name, symbol, start, end, interval], ttl=ttl)
+            if frame is None:
+                missing.append(symbol)
+            else:
+                report.frames[symbol] = frame
+
+        if missing:
+            fetched = self.provider.fetch(missing, start, end, interval)
+            for symbol, frame in fetched.frames.items():
+                if not frame.empty:
+                    self.cache.put([self.name, symbol, start, end, interval], frame)
+            report.frames.update(fetched.frames)
+            report.failed.update(fetched.failed)
+            report.requests = fetched.requests
+            report.retries = fetched.retries
+            report.elapsed = fetched.elapsed
+        return report
@@ -1,87 +1,92 @@
-import yfinance as yf
 import yaml
 import uuid
-import mysql.connector
 from datetime import datetime
 import os
+import sys
 import warnings
 warnings.filterwarnings("ignore")
 
-# move to the script's directory
-os.chdir(os.path.dirname(os.path.abspath(__file__)))
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(HERE)
+sys.path.append(os.path.join(HERE, '..'))
+from db.background_writer import connection_factory
+from providers import get_provider
+from revisions import ensure_revisions_table
+from indices import sync_index_dimension
+from loader import load_symbols
 
-# load the configuration file
-with open('../config/config.yml', 'r') as file:
-    config = yaml.safe_load(file)
 
-symbol = config["market_data"]["index_symbol"]
-index_name = config["market_data"]["index_name"]
-start_date = config["market_data"]["start_date"]
-end_date = config["market_data"]["end_date"]
-interval = config["market_data"]["interval"]
+def ingest_indices(config, connect, provider_name=None, full=False):
+    """
+    Fetch every configured index through the provider and upsert new or
+    changed bars. Returns {"run_id", "status", "rows", "revised", "failed"};
+    status is FAILED only if no index could be fetched.
+    """
+    start_date = config["market_data"]["start_date"]
+    end_date = config["market_data"]["end_date"]
+    interval = config["market_data"]["interval"]
 
-# convert end_date to datetime object
-if end_date.lower() == 'today':
-    end_date = datetime.today().strftime('%Y-%m-%d')
-else:
-    end_date = end_date
+    # convert end_date to datetime object
+    if end_date.lower() == 'today':
+        end_date = datetime.today().strftime('%Y-%m-%d')
 
-# generate run_id 
-run_id = f"{config['ingestion']['run_id_nifty_prefix']}_{uuid.uuid4().hex[:8]}"
+    # generate run_id
+    run_id = f"{config['ingestion']['run_id_nifty_prefix']}_{uuid.uuid4().hex[:8]}"
 
+    con = connect()
+    cursor = con.cursor()
+    ensure_revisions_table(con)
 
-# Fetch data from yfinance
-df = yf.download(symbol, start=start_date, end=end_date, interval=interval)
+    # Every configured index is registered in index_dimension and fetched in one concurrent batch
+    indices = sync_index_dimension(con, config)
+    index_names = [i["name"] for i in indices]
+    print(f"Fetching {len(index_names)} indices: {', '.join(index_names)}")
 
-# prepare mysql connection
-con = mysql.connector.connect(
-    host=config["mysql"]["host"],
-    user=config["mysql"]["user"],
-    password=config["mysql"]["password"],
-    database=config["mysql"]["database"]
-)
+    provider = get_provider(config, provider_name)
 
-cursor = con.cursor()
+    # log ingestion start time
+    start_time = datetime.now()
+    cursor.execute("""
+    INSERT INTO ingestion_logs (run_id, pipeline_type, start_time, status)
+    VALUES (%s, %s, %s, %s)
+    """, (run_id, "index", start_time, "RUNNING"))
+    con.commit()
 
-# log ingestion start time
-start_time = datetime.now()
-cursor.execute("""
-INSERT INTO ingestion_logs (run_id, pipeline_type, start_time, status)
-VALUES (%s, %s, %s, %s)
-""", (run_id, "index", start_time, "RUNNING"))
-con.commit()
+    # Only the missing range (plus overlap) unless full asks for everything;
+    # only new or changed bars are written, revisions recorded for downstream recompute
+    overlap_days = config["ingestion"].get("overlap_days", 5)
+    new_rows, changed_rows, revised, failed = load_symbols(
+        con, cursor, provider, index_names, "index_prices", "index_name",
+        start_date, end_date, interval, overlap_days, run_id, full
+    )
+    for symbol, (first_changed, count) in revised.items():
+        print(f"REVISED {symbol}: {count} bars from {first_changed}")
+    for symbol, error in failed.items():
+        print(f"{symbol}: fetch failed ({error})", file=sys.stderr)
 
-# insert query
-query = """
-INSERT IGNORE INTO index_prices
-(index_name, trade_date, open_price, high_price, low_price, close_price, volume, run_id)
-VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-"""
+    # log ingestion end time; the run fails only if no index could be fetched
+    end_time = datetime.now()
+    status = "FAILED" if len(failed) == len(index_names) else "SUCCESS"
+    rows = len(new_rows) + len(changed_rows)
+    cursor.execute("""
+        UPDATE ingestion_logs
+        SET end_time=%s, status=%s, records_loaded=%s
+        WHERE run_id=%s
+        """,
+        (end_time, status, rows, run_id))
 
+    con.commit()
+    cursor.close()
+    con.close()
+    return {"run_id": run_id, "status": status, "rows": rows, "revised": revised, "failed": failed}
 
-# iterate row and insert
-for trade_date, row in df.iterrows():
-    payload = (
-        index_name,
-        trade_date.date(),
-        round(float(row["Open"]), 2),
-        round(float(row["High"]), 2),
-        round(float(row["Low"]), 2),
-        round(float(row["Close"]), 2),
-        int(row["Volume"]) if not str(row["Volume"]) == 'nan' else None,
-        run_id
-    )
-    cursor.execute(query, payload)
 
-# log ingestion end time
-end_time = datetime.now()
-cursor.execute("""
-    UPDATE ingestion_logs
-    SET end_time=%s, status=%s, records_loaded=%s
-    WHERE run_id=%s
-    """, 
-    (end_time, "SUCCESS", len(df), run_id))
+if __name__ == "__main__":
+    # --provider <name> overrides the configured provider; --full refetches everything
+    with open(os.path.join(HERE, '..', 'config', 'config.yml'), 'r') as file:
+        config = yaml.safe_load(file)
 
-con.commit()
-cursor.close()
-con.close()
\ No newline at end of file
+    provider_name = sys.argv[sys.argv.index("--provider") + 1] if "--provider" in sys.argv else None
+    report = ingest_indices(config, connection_factory(config["mysql"]), provider_name, "--full" in sys.argv)
+    if report["status"] == "FAILED":
+        sys.exit(1)
@@ -0,0 +1,72 @@
+import re
+
+# =========================
+# Index Dimension
+# =========================
+# Indices are configured in `market_data.indices` and registered in
+# `index_dimension`, keyed by a normalized key ("NIFTY 50" -> "NIFTY50").
+# Stages select indices by key or active flag through this table and join
+# to index_prices on index_name, so every lookup is an equality match on
+# an indexed column instead of an expression over the whole price table.
+
+INDEX_DIMENSION_DDL = """
+CREATE TABLE IF NOT EXISTS index_dimension (
+    index_key VARCHAR(30) NOT NULL PRIMARY KEY,
+    index_name VARCHAR(50) NOT NULL,
+    ticker VARCHAR(30),
+    is_active TINYINT(1) NOT NULL DEFAULT 1,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_index_dimension_name (index_name)
+)
+"""
+
+
+def index_key(name):
+    """Normalized key: upper case, letters and digits only ("Nifty Bank" -> "NIFTYBANK")."""
+    return re.sub(r"[^A-Z0-9]", "", name.upper())
+
+
+def configured_indices(config):
+    """
+    [{name, ticker, key}] from `market_data.indices`; configs that still
+    carry the single index_name / index_symbol pair get that one index.
+    """
+    market = config["market_data"]
+    indices = market.get("indices") or [{"name": market["index_name"], "ticker": market["index_symbol"]}]
+    return [
+        {"name": i["name"], "ticker": i["ticker"], "key": i.get("key") or index_key(i["name"])}
+        for i in indices
+    ]
+
+
+def sync_index_dimension(con, config):
+    """Register the configured indices; indices dropped from the config stay, flagged inactive."""
+    indices = configured_indices(config)
+    cursor = con.cursor()
+    cursor.execute(INDEX_DIMENSION_DDL)
+    cursor.execute("UPDATE index_dimension SET is_active = 0")
+    cursor.executemany("""
+        INSERT INTO index_dimension (index_key, index_name, ticker, is_active)
+        VALUES (%s, %s, %s, 1)
+        ON DUPLICATE KEY UPDATE index_name = VALUES(index_name), ticker = VALUES(ticker), is_active = 1
+    """, [(i["key"], i["name"], i["ticker"]) for i in indices])
+    con.commit()
+    cursor.close()
+    return indices
+
+
+def index_names(con, keys=None, active_only=False):
+    """index_name of the registered indices, optionally limited to `keys` / active ones."""
+    if keys is not None and not keys:
+        return []
+    where, params = ["1 = 1"], ()
+    if keys is not None:
+        where.append(f"index_key IN ({', '.join(['%s'] * len(keys))})")
+        params = tuple(index_key(k) for k in keys)
+    if active_only:
+        where.append("is_active = 1")
+    cursor = con.cursor()
+    cursor.execute(f"SELECT index_name FROM index_dimension WHERE {' AND '.join(where)} ORDER BY index_key", params)
+    names = [row[0] for row in cursor.fetchall()]
+    cursor.close()
+    return names
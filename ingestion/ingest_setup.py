@@ -1,23 +1,45 @@
 import os
-import subprocess
 import sys
 
-# move to the script's directory
-os.chdir(os.path.dirname(os.path.abspath(__file__)))
+import yaml
 
-print("\nStarting Data Ingestion Process...\n")
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(HERE)
+sys.path.append(os.path.join(HERE, '..'))
+from db.background_writer import connection_factory
+from index_raw_data import ingest_indices
+from stock_raw_data import ingest_stocks
 
-def run_step(label, command):
+
+def run_step(label, step, *args):
     print(f"{label} ...")
-    try:
-        subprocess.run(command, check=True)
-        print(f" {label} completed.\n")
-    except subprocess.CalledProcessError:
-        print(f" {label} FAILED. Aborting ingestion.\n")
-        sys.exit(1)
-
-# execute ingestion scripts in order
-run_step("Index Price Ingestion", ["python", "index_raw_data.py"])
-run_step("Stock Price Ingestion", ["python", "stock_raw_data.py"])
-
-print("Data Ingestion completed successfully.\n")
+    result = step(*args)
+    print(f" {label} completed.\n")
+    return result
+
+
+def run_ingestion(config, connect, provider_name=None, full=False):
+    """
+    Indices, then stocks, in this process. Returns (index_report,
+    stock_report); raises if no index could be fetched or a stock chunk failed.
+    """
+    print("\nStarting Data Ingestion Process...\n")
+
+    # execute ingestion steps in order
+    index_report = run_step("Index Price Ingestion", ingest_indices, config, connect, provider_name, full)
+    if index_report["status"] == "FAILED":
+        raise RuntimeError(f"Index Price Ingestion FAILED: no index could be fetched ({index_report['run_id']})")
+    stock_report = run_step("Stock Price Ingestion", ingest_stocks, config, connect, provider_name, full)
+
+    print("Data Ingestion completed successfully.\n")
+    return index_report, stock_report
+
+
+if __name__ == "__main__":
+    # --provider <name> overrides the configured provider; --full refetches everything
+    with open(os.path.join(HERE, '..', 'config', 'config.yml'), 'r') as file:
+        config = yaml.safe_load(file)
+
+    provider_name = sys.argv[sys.argv.index("--provider") + 1] if "--provider" in sys.argv else None
+    # A failed step raises: traceback on stderr, exit status 1
+    run_ingestion(config, connection_factory(config["mysql"]), provider_name, "--full" in sys.argv)
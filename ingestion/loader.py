@@ -0,0 +1,53 @@
+from watermarks import load_price_watermarks, group_by_start
+from revisions import upsert_query, stored_hashes, split_changes, record_revisions
+
+
+def _value(v, cast):
+    """cast(v), or None for a NaN (stored as NULL, never as float nan)."""
+    return cast(v) if v == v else None
+
+
+def frame_rows(symbol, frame, run_id):
+    """Provider OHLCV frame -> price-table row tuples (bars without a close are dropped)."""
+    return [
+        (
+            symbol,
+            date.date(),
+            _value(row["Open"], float),
+            _value(row["High"], float),
+            _value(row["Low"], float),
+            float(row["Close"]),
+            _value(row["Volume"], int),
+            run_id
+        )
+        for date, row in frame.dropna(subset=["Close"]).iterrows()
+    ]
+
+
+def load_symbols(con, cursor, provider, symbols, table, key_column, start_date, end_date,
+                 interval, overlap_days, run_id, full=False):
+    """
+    Fetch `symbols` from their watermark (minus overlap, or start_date when
+    new / full) and queue upserts of the new and revised bars plus their
+    price_revisions rows on `cursor`. The caller commits, so it can add its
+    own checkpoint to the same transaction.
+    Returns (new_rows, changed_rows, revised, failed).
+    """
+    watermarks = {} if full else load_price_watermarks(con, table, key_column, symbols)
+    fetch_groups = group_by_start(symbols, watermarks, start_date, overlap_days)
+
+    rows, failed = [], {}
+    for fetch_from, group in fetch_groups.items():
+        report = provider.fetch(group, fetch_from, end_date, interval)
+        failed.update(report.failed)
+        for symbol in group:
+            if symbol in report.frames:
+                rows += frame_rows(symbol, report.frames[symbol], run_id)
+
+    # Compare against what is stored over the fetched window; unchanged bars are skipped
+    stored = stored_hashes(con, table, key_column, symbols, min(fetch_groups)) if fetch_groups else {}
+    new_rows, changed_rows, revised = split_changes(rows, stored)
+
+    cursor.executemany(upsert_query(table, key_column), new_rows + changed_rows)
+    record_revisions(cursor, run_id, revised)
+    return new_rows, changed_rows, revised, failed
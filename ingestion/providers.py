@@ -0,0 +1,251 @@
+import os
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from async_fetch import FetchReport, fetch_prices, intraday_minutes
+from download_cache import DownloadCache, CachedProvider
+from indices import configured_indices
+
+# =========================
+# Price Providers
+# =========================
+# Ingestion talks to one interface: list_symbols() for the equity universe
+# and fetch(symbols, start, end, interval) -> FetchReport keyed by the
+# symbol as stored (e.g. "RELIANCE", "NIFTY 50"). Frames carry Open, High,
+# Low, Close, Volume indexed by trade date (intraday intervals: by bar
+# start time on the exchange clock), `end` exclusive.
+
+OHLCV = ["Open", "High", "Low", "Close", "Volume"]
+
+# Relative paths in the provider config are relative to ingestion/
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+class PriceProvider:
+    name = "base"
+
+    def list_symbols(self):
+        raise NotImplementedError
+
+    def fetch(self, symbols, start, end, interval="1d"):
+        raise NotImplementedError
+
+
+class YahooProvider(PriceProvider):
+    """Yahoo chart API through the async fetch layer; universe from the NSE index CSV."""
+    name = "yahoo"
+
+    def __init__(self, company_list_url, index_tickers=None, fetch_settings=None, rate_limit=None):
+        self.company_list_url = company_list_url
+        self.index_tickers = index_tickers or {}
+        self.fetch_settings = fetch_settings or {}
+        self.rate_limit = rate_limit
+
+    def ticker(self, symbol):
+        return self.index_tickers.get(symbol, symbol + ".NS")
+
+    def list_symbols(self):
+        return pd.read_csv(self.company_list_url)['Symbol'].tolist()
+
+    def fetch(self, symbols, start, end, interval="1d"):
+        tickers = {self.ticker(s): s for s in symbols}
+        intraday = intraday_minutes(interval) is not None
+        lo, hi = pd.Timestamp(start), pd.Timestamp(end)
+        if intraday:
+            # Chart periods are requested by whole day, one request per ticker, so a
+            # micro-batch re-downloads the day so far; bars are trimmed to [start, end) below
+            start, end = lo.strftime('%Y-%m-%d'), (hi.normalize() + pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+        report = fetch_prices(list(tickers), start, end, interval, self.fetch_settings, self.rate_limit)
+        # Back from provider tickers to stored symbols
+        report.frames = {
+            tickers[t]: df[(df.index >= lo) & (df.index < hi)] if intraday else df
+            for t, df in report.frames.items()
+        }
+        report.failed = {tickers[t]: e for t, e in report.failed.items()}
+        return report
+
+
+class ReplayProvider(PriceProvider):
+    """
+    Recorded OHLCV from local files: one `<symbol>.csv` or `<symbol>.parquet`
+    per symbol in `path`, with a Date (or trade_date) column and Open, High,
+    Low, Close, Volume. Intraday recordings live in `path/<interval>/` with
+    a Datetime (or bar_time) column. Parquet needs pyarrow or fastparquet.
+    """
+    name = "replay"
+
+    def __init__(self, path, index_names=()):
+        self.path = path
+        self.index_names = set(index_names)
+
+    def _file(self, symbol, interval="1d"):
+        folder = self.path if intraday_minutes(interval) is None else os.path.join(self.path, interval)
+        for ext in (".parquet", ".csv"):
+            candidate = os.path.join(folder, symbol + ext)
+            if os.path.exists(candidate):
+                return candidate
+        return None
+
+    def list_symbols(self):
+        stems = {os.path.splitext(f)[0] for f in os.listdir(self.path)
+                 if f.endswith((".csv", ".parquet"))}
+        return sorted(stems - self.index_names)
+
+    def fetch(self, symbols, start, end, interval="1d"):
+        report = FetchReport()
+        lo, hi = pd.Timestamp(start), pd.Timestamp(end)
+        intraday = intraday_minutes(interval) is not None
+        for symbol in symbols:
+            path = self._file(symbol, interval)
+            if path is None:
+                report.failed[symbol] = "no recording"
+                continue
+            df = pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path)
+            date_col = next(c for c in ("Datetime", "bar_time", "Date", "trade_date") if c in df.columns)
+            stamps = pd.to_datetime(df.pop(date_col))
+            df.index = stamps if intraday else stamps.dt.normalize()
+            df = df.sort_index()
+            report.frames[symbol] = df.loc[(df.index >= lo) & (df.index < hi), OHLCV].astype(float)
+            report.requests += 1
+        return report
+
+
+class SyntheticProvider(PriceProvider):
+    """
+    Seeded bars for load tests: `n_symbols` equities named SYN0001..SYNnnnn,
+    business days only. Log prices follow a per-symbol trend plus a
+    mean-reverting (AR(1)) deviation, so levels stay plausible over decades.
+    Each symbol's series starts at ORIGIN from its own seed, so a bar is the
+    same whichever range asks for it; any name (indices included) gets one.
+    Intraday bars are a seeded walk per (symbol, day) around the clock, so
+    load tests need not wait for market hours.
+    """
+    name = "synthetic"
+    ORIGIN = "2000-01-03"
+    PERSISTENCE = 0.995
+
+    def __init__(self, n_symbols=50, seed=42):
+        self.n_symbols = n_symbols
+        self.seed = seed
+        self._calendars = {}
+
+    def list_symbols(self):
+        return [f"SYN{i:04d}" for i in range(1, self.n_symbols + 1)]
+
+    def _series(self, symbol, end):
+        if end not in self._calendars:
+            days = np.arange(np.datetime64(self.ORIGIN), np.datetime64(end), dtype="datetime64[D]")
+            self._calendars[end] = pd.DatetimeIndex(days[np.is_busday(days)])
+        dates = self._calendars[end]
+        n = len(dates)
+        # One stream per field, so a longer range only appends draws
+        key = zlib.crc32(symbol.encode())
+        params, returns, gaps, ranges, volumes = (
+            np.random.default_rng([self.seed, key, field]) for field in range(5)
+        )
+
+        # Trend + AR(1) deviation: x_t = p * x_(t-1) + e_t, via the ewm recursion
+        drift = params.normal(0.0002, 0.0001)
+        vol = params.uniform(0.01, 0.025)
+        shocks = returns.normal(0, vol, n)
+        smoothed = pd.Series(shocks).ewm(alpha=1 - self.PERSISTENCE, adjust=False).mean().to_numpy()
+        deviation = smoothed / (1 - self.PERSISTENCE)
+        close = params.uniform(50, 2000) * np.exp(drift * np.arange(n) + deviation)
+        open_ = close * np.exp(gaps.normal(0, vol / 3, n))
+        spread = np.abs(ranges.normal(0, vol / 2, n))
+        high = np.maximum(open_, close) * (1 + spread)
+        low = np.minimum(open_, close) * (1 - spread)
+        volume = np.round(volumes.lognormal(13, 0.6, n))
+
+        return pd.DataFrame({
+            "Open": np.round(open_, 2), "High": np.round(high, 2), "Low": np.round(low, 2),
+            "Close": np.round(close, 2), "Volume": volume,
+        }, index=dates)
+
+    def _intraday_day(self, symbol, day, minutes):
+        """Every `minutes` bar of one calendar day as OHLCV arrays, from the symbol's (symbol, day) stream."""
+        key = zlib.crc32(symbol.encode())
+        params = np.random.default_rng([self.seed, key, 0])
+        params.normal(0.0002, 0.0001)
+        vol = params.uniform(0.01, 0.025)
+        base = params.uniform(50, 2000)
+
+        n = 24 * 60 // minutes
+        rng = np.random.default_rng([self.seed, key, 5, day.toordinal()])
+        level = base * np.exp(rng.normal(0, vol * 5))
+        close = level * np.exp(np.cumsum(rng.normal(0, vol / np.sqrt(n), n)))
+        open_ = np.concatenate([[level], close[:-1]])
+        spread = np.abs(rng.normal(0, vol / (2 * np.sqrt(n)), n))
+        return {
+            "Open": np.round(open_, 2),
+            "High": np.round(np.maximum(open_, close) * (1 + spread), 2),
+            "Low": np.round(np.minimum(open_, close) * (1 - spread), 2),
+            "Close": np.round(close, 2),
+            "Volume": np.round(rng.lognormal(9, 0.6, n)),
+        }
+
+    def _intraday(self, symbol, lo, hi, minutes):
+        """Bars starting in [lo, hi); only that slice of each day's walk becomes a frame."""
+        step = pd.Timedelta(minutes=minutes)
+        parts, index = [], []
+        for day in pd.date_range(lo.normalize(), hi - pd.Timedelta(microseconds=1), freq="D"):
+            first = max(0, -(-(lo - day) // step))
+            last = min(24 * 60 // minutes, -(-(hi - day) // step))
+            if first < last:
+                arrays = self._intraday_day(symbol, day.date(), minutes)
+                parts.append({k: v[first:last] for k, v in arrays.items()})
+                index.append(day + np.arange(first, last) * step)
+        if not parts:
+            return pd.DataFrame(columns=OHLCV, dtype=float)
+        return pd.DataFrame(
+            {k: np.concatenate([p[k] for p in parts]) for k in OHLCV},
+            index=pd.DatetimeIndex(np.concatenate(index))
+        )
+
+    def fetch(self, symbols, start, end, interval="1d"):
+        report = FetchReport()
+        lo, hi = pd.Timestamp(start), pd.Timestamp(end)
+        minutes = intraday_minutes(interval)
+        if minutes is None and interval != "1d":
+            raise ValueError(f"SyntheticProvider does not generate {interval} bars")
+        for symbol in symbols:
+            if minutes is None:
+                df = self._series(symbol, end)
+                report.frames[symbol] = df[df.index >= lo]
+            else:
+                report.frames[symbol] = self._intraday(symbol, lo, hi, minutes)
+            report.requests += 1
+        return report
+
+
+def get_provider(config, name=None, refresh_cache=False, rate_limit=None):
+    """
+    Provider from the `ingestion.provider` block (name overrides its `name`).
+    refresh_cache=True re-downloads instead of serving cached bars.
+    rate_limit: a SharedTokenBucket that processes fetching together share.
+    """
+    settings = config["ingestion"].get("provider", {})
+    name = name or settings.get("name", "yahoo")
+    index_tickers = {i["name"]: i["ticker"] for i in configured_indices(config)}
+
+    if name == "yahoo":
+        provider = YahooProvider(config["url"]["company_list"], index_tickers,
+                                 config["ingestion"].get("fetch", {}), rate_limit)
+        # Network downloads go through the on-disk cache; local sources don't need it
+        cache_cfg = config["ingestion"].get("cache", {})
+        if not cache_cfg.get("enabled", True):
+            return provider
+        cache = DownloadCache(
+            os.path.join(HERE, cache_cfg.get("path", ".cache")),
+            max_bytes=cache_cfg.get("max_mb", 2048) * 2**20,
+            today_ttl=cache_cfg.get("today_ttl_minutes", 15) * 60,
+            universe_ttl=cache_cfg.get("universe_ttl_hours", 24) * 3600,
+        )
+        return CachedProvider(provider, cache, refresh=refresh_cache)
+    if name == "replay":
+        return ReplayProvider(os.path.join(HERE, settings.get("replay_path", "../data/replay")), index_tickers)
+    if name == "synthetic":
+        return SyntheticProvider(settings.get("synthetic_symbols", 50), settings.get("seed", 42))
+    raise ValueError(f"Unknown price provider: {name}")
@@ -0,0 +1,131 @@
+import hashlib
+
+# =========================
+# Bar Revision Detection
+# =========================
+# Incoming bars are hashed and compared with the stored bars of the same
+# (symbol, trade_date). Only new or changed bars are written (upsert), and
+# each symbol whose history changed is recorded with its first changed
+# date, so incremental stages recompute from that point for that symbol.
+REVISIONS_DDL = """
+CREATE TABLE IF NOT EXISTS price_revisions (
+    revision_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    run_id VARCHAR(50) NOT NULL,
+    symbol VARCHAR(50) NOT NULL,
+    first_changed_date DATE NOT NULL,
+    rows_changed INT NOT NULL,
+    features_run_id VARCHAR(50) NULL,
+    decisions_run_id VARCHAR(50) NULL,
+    detected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+# Stages consume revisions in pipeline order: decisions only see a
+# revision once features have been recomputed for it
+STAGE_FILTERS = {
+    "features": "features_run_id IS NULL",
+    "decisions": "features_run_id IS NOT NULL AND decisions_run_id IS NULL",
+}
+
+
+def upsert_query(table, key_column):
+    return f"""
+    INSERT INTO {table}
+    ({key_column}, trade_date, open_price, high_price, low_price, close_price, volume, run_id)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        open_price = VALUES(open_price),
+        high_price = VALUES(high_price),
+        low_price = VALUES(low_price),
+        close_price = VALUES(close_price),
+        volume = VALUES(volume),
+        run_id = VALUES(run_id)
+    """
+
+
+def row_hash(open_price, high_price, low_price, close_price, volume):
+    # Prices compared at paise precision (NSE ticks are 0.05), so a
+    # DECIMAL(…, 2) column and a provider float hash the same
+    canonical = "|".join(
+        "" if v is None else f"{float(v):.2f}" for v in (open_price, high_price, low_price, close_price)
+    ) + "|" + ("" if volume is None else str(int(volume)))
+    return hashlib.blake2b(canonical.encode(), digest_size=8).hexdigest()
+
+
+def ensure_revisions_table(con):
+    cursor = con.cursor()
+    cursor.execute(REVISIONS_DDL)
+    con.commit()
+    cursor.close()
+
+
+def stored_hashes(con, table, key_column, symbols, since):
+    """{(symbol, trade_date): row_hash} of stored bars from `since` on."""
+    if not symbols:
+        return {}
+    placeholders = ", ".join(["%s"] * len(symbols))
+    cursor = con.cursor()
+    cursor.execute(
+        f"""
+        SELECT {key_column}, trade_date, open_price, high_price, low_price, close_price, volume
+        FROM {table}
+        WHERE {key_column} IN ({placeholders}) AND trade_date >= %s
+        """,
+        (*symbols, since)
+    )
+    hashes = {(row[0], row[1]): row_hash(*row[2:]) for row in cursor.fetchall()}
+    cursor.close()
+    return hashes
+
+
+def split_changes(rows, stored):
+    """
+    rows: (symbol, trade_date, open, high, low, close, volume, run_id) tuples.
+    Returns (new_rows, changed_rows, {symbol: (first_changed_date, rows_changed)}).
+    """
+    new_rows, changed_rows, revised = [], [], {}
+    for row in rows:
+        previous = stored.get((row[0], row[1]))
+        if previous is None:
+            new_rows.append(row)
+        elif previous != row_hash(*row[2:7]):
+            changed_rows.append(row)
+            first, count = revised.get(row[0], (row[1], 0))
+            revised[row[0]] = (min(first, row[1]), count + 1)
+    return new_rows, changed_rows, revised
+
+
+def record_revisions(cursor, run_id, revised):
+    """Queued on the loader's cursor so revisions commit with the upserted bars."""
+    if revised:
+        cursor.executemany(
+            "INSERT INTO price_revisions (run_id, symbol, first_changed_date, rows_changed) VALUES (%s, %s, %s, %s)",
+            [(run_id, symbol, first, count) for symbol, (first, count) in revised.items()]
+        )
+
+
+def pending_revisions(con, stage):
+    """({symbol: earliest first_changed_date}, revision_ids) not yet applied by `stage`."""
+    cursor = con.cursor()
+    cursor.execute(
+        f"SELECT revision_id, symbol, first_changed_date FROM price_revisions WHERE {STAGE_FILTERS[stage]}"
+    )
+    revised, ids = {}, []
+    for revision_id, symbol, first in cursor.fetchall():
+        ids.append(revision_id)
+        revised[symbol] = min(first, revised.get(symbol, first))
+    cursor.close()
+    return revised, ids
+
+
+def mark_revisions_applied(con, stage, run_id, ids):
+    if not ids:
+        return
+    cursor = con.cursor()
+    placeholders = ", ".join(["%s"] * len(ids))
+    cursor.execute(
+        f"UPDATE price_revisions SET {stage}_run_id = %s WHERE revision_id IN ({placeholders})",
+        (run_id, *ids)
+    )
+    con.commit()
+    cursor.close()
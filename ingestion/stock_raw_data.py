@@ -1,117 +1,128 @@
-import pandas as pd
-import yfinance as yf
-import yaml, uuid, mysql.connector
+import yaml, uuid
 from datetime import datetime
 import os
+import sys
 import warnings
 warnings.filterwarnings("ignore")
 
-# move to the script's directory
-os.chdir(os.path.dirname(os.path.abspath(__file__)))
-
-# ============ Load configuration ============
-with open('../config/config.yml', 'r') as file:
-    config = yaml.safe_load(file)
-
-start_date = config["market_data"]["start_date"]
-end_date = datetime.today().strftime('%Y-%m-%d') if config["market_data"]["end_date"].lower() == 'today' else config["market_data"]["end_date"]
-interval = config["market_data"]["interval"]
-url = config["url"]["company_list"]
-
-run_id = f"{config['ingestion']['run_id_stock_prefix']}_{uuid.uuid4().hex[:8]}"
-
-df_list = pd.read_csv(url)
-symbols = df_list['Symbol'].tolist()
-tickers = [s + ".NS" for s in symbols]
-
-print("\nFetching ALL valid NSE symbols...")
-data = yf.download(
-    tickers,
-    start=start_date,
-    end=end_date,
-    interval=interval,
-    group_by="ticker",
-    auto_adjust=False,
-    threads=True,
-    progress=False
-)
-
-con = mysql.connector.connect(
-    host=config["mysql"]["host"],
-    user=config["mysql"]["user"],
-    password=config["mysql"]["password"],
-    database=config["mysql"]["database"]
-)
-cursor = con.cursor()
-
-# log ingestion start time
-start_time = datetime.now()
-cursor.execute("""
-INSERT INTO ingestion_logs (run_id, pipeline_type, start_time, status)
-VALUES (%s, %s, %s, %s)
-""", (run_id, "stock", start_time, "RUNNING"))
-con.commit()
-
-query = """
-INSERT IGNORE INTO raw_prices
-(stock_symbol, trade_date, open_price, high_price, low_price, close_price, volume, run_id)
-VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-"""
-
-rows_to_insert = []
-print("\nPreparing batch insert...")
-
-# If multi-index → use columns as (symbol, field)
-if isinstance(data.columns, pd.MultiIndex):
-    for symbol in symbols:
-        symbol_ns = symbol + ".NS"
-        try:
-            stock_df = data[symbol_ns].dropna()
-        except KeyError:
-            print(f"⚠️ {symbol_ns}: Not found on Yahoo. Skipping.")
-            continue
-
-        for date, row in stock_df.iterrows():
-            rows_to_insert.append((
-                symbol,
-                date.date(),
-                float(row["Open"]),
-                float(row["High"]),
-                float(row["Low"]),
-                float(row["Close"]),
-                int(row["Volume"]),
-                run_id
-            ))
-
-# If single index (fallback)
-else:
-    print("Fallback single-ticker structure encountered.")
-    for date, row in data.dropna().iterrows():
-        ticker = "UNKNOWN"
-        rows_to_insert.append((
-            ticker,
-            date.date(),
-            float(row["Open"]),
-            float(row["High"]),
-            float(row["Low"]),
-            float(row["Close"]),
-            int(row["Volume"]),
-            run_id
-        ))
-
-# log ingestion end time
-end_time = datetime.now()
-cursor.execute("""
-    UPDATE ingestion_logs
-    SET end_time=%s, status=%s, records_loaded=%s
-    WHERE run_id=%s
-    """, 
-    (end_time, "SUCCESS", len(rows_to_insert), run_id))
-
-cursor.executemany(query, rows_to_insert)
-con.commit()
-cursor.close()
-con.close()
-
-print(f"Mission Complete — {len(rows_to_insert)} rows ingested.")
-print(f"Run ID: {run_id}")
\ No newline at end of file
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(HERE)
+sys.path.append(os.path.join(HERE, '..'))
+from db.background_writer import connection_factory
+from providers import get_provider
+from checkpoints import ensure_checkpoint_table, plan_chunks, load_chunks, mark_chunk_done, mark_chunk_partial
+from revisions import ensure_revisions_table
+from loader import load_symbols
+
+
+def ingest_stocks(config, connect, provider_name=None, full=False, resume_id=None):
+    """
+    Fetch the provider's equity universe chunk by chunk, each chunk
+    committed with its checkpoint. resume_id continues an interrupted run.
+    Returns {"run_id", "rows", "revised", "failed"}; raises if a chunk fails
+    (the run is logged FAILED and can be resumed).
+    """
+    start_date = config["market_data"]["start_date"]
+    end_date = datetime.today().strftime('%Y-%m-%d') if config["market_data"]["end_date"].lower() == 'today' else config["market_data"]["end_date"]
+    interval = config["market_data"]["interval"]
+    chunk_size = config["ingestion"].get("chunk_size", 100)
+    overlap_days = config["ingestion"].get("overlap_days", 5)
+    run_id = resume_id or f"{config['ingestion']['run_id_stock_prefix']}_{uuid.uuid4().hex[:8]}"
+
+    # Universe and bars come from the configured provider (provider_name overrides it)
+    provider = get_provider(config, provider_name)
+
+    con = connect()
+    cursor = con.cursor()
+    ensure_checkpoint_table(con)
+    ensure_revisions_table(con)
+
+    # log ingestion start time
+    start_time = datetime.now()
+    if resume_id:
+        chunks, rows_loaded = load_chunks(con, run_id)
+        cursor.execute("UPDATE ingestion_logs SET status=%s, end_time=NULL WHERE run_id=%s", ("RUNNING", run_id))
+        print(f"\nResuming {run_id}: {len(chunks)} chunks left, {rows_loaded} rows already loaded.")
+    else:
+        chunks = plan_chunks(con, run_id, sorted(provider.list_symbols()), chunk_size)
+        rows_loaded = 0
+        cursor.execute("""
+        INSERT INTO ingestion_logs (run_id, pipeline_type, start_time, status)
+        VALUES (%s, %s, %s, %s)
+        """, (run_id, "stock", start_time, "RUNNING"))
+    con.commit()
+
+    failed_symbols = {}
+    revised_symbols = {}
+    print(f"\nFetching ALL valid NSE symbols via {provider.name} in {len(chunks)} chunks...")
+
+    try:
+        for chunk_no, chunk in chunks:
+            # Each symbol resumes from its newest stored bar (minus overlap);
+            # newly listed symbols, or full, fetch from start_date.
+            # Rows, revisions and the chunk's checkpoint commit together
+            new_rows, changed_rows, revised, failed = load_symbols(
+                con, cursor, provider, chunk, "raw_prices", "stock_symbol",
+                start_date, end_date, interval, overlap_days, run_id, full
+            )
+            failed_symbols.update(failed)
+            if failed:
+                mark_chunk_partial(cursor, run_id, chunk_no, len(new_rows) + len(changed_rows), failed)
+            else:
+                mark_chunk_done(cursor, run_id, chunk_no, len(new_rows) + len(changed_rows))
+            con.commit()
+            rows_loaded += len(new_rows) + len(changed_rows)
+            revised_symbols.update(revised)
+            print(f"  chunk {chunk_no}: {len(chunk)} symbols, {len(new_rows)} new / "
+                  f"{len(changed_rows)} revised rows committed")
+
+    except Exception:
+        con.rollback()
+        cursor.execute("UPDATE ingestion_logs SET end_time=%s, status=%s, records_loaded=%s WHERE run_id=%s",
+                       (datetime.now(), "FAILED", rows_loaded, run_id))
+        con.commit()
+        cursor.close()
+        con.close()
+        print(f"Ingestion failed. Resume with: python stock_raw_data.py --resume {run_id}", file=sys.stderr)
+        raise
+
+    for symbol, error in sorted(failed_symbols.items()):
+        print(f"⚠️ {symbol}: fetch failed ({error}). Skipping.")
+    if failed_symbols:
+        # stderr, so the orchestrator logs the stage as a WARNING
+        print(f"{len(failed_symbols)} symbols failed. Retry them with: "
+              f"python stock_raw_data.py --resume {run_id}", file=sys.stderr)
+
+    # Downstream stages recompute these symbols from the first changed date
+    for symbol, (first_changed, count) in sorted(revised_symbols.items()):
+        print(f"REVISED {symbol}: {count} bars from {first_changed}")
+
+    # log ingestion end time, only once every chunk is committed;
+    # PARTIAL while failed symbols are still pending in their checkpoints
+    end_time = datetime.now()
+    status = "SUCCESS" if not failed_symbols else "PARTIAL"
+    cursor.execute("""
+        UPDATE ingestion_logs
+        SET end_time=%s, status=%s, records_loaded=%s
+        WHERE run_id=%s
+        """,
+        (end_time, status, rows_loaded, run_id))
+
+    con.commit()
+    cursor.close()
+    con.close()
+
+    print(f"Mission Complete — {rows_loaded} rows ingested, {len(failed_symbols)} symbols failed.")
+    print(f"Run ID: {run_id}")
+    return {"run_id": run_id, "rows": rows_loaded, "revised": revised_symbols, "failed": failed_symbols}
+
+
+if __name__ == "__main__":
+    # --provider <name> overrides the configured provider; --full refetches everything
+    # --resume <run_id> continues an interrupted run from its checkpoints
+    with open(os.path.join(HERE, '..', 'config', 'config.yml'), 'r') as file:
+        config = yaml.safe_load(file)
+
+    provider_name = sys.argv[sys.argv.index("--provider") + 1] if "--provider" in sys.argv else None
+    resume_id = sys.argv[sys.argv.index("--resume") + 1] if "--resume" in sys.argv else None
+    ingest_stocks(config, connection_factory(config["mysql"]), provider_name, "--full" in sys.argv, resume_id)
@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+
+# =========================
+# Per-symbol Ingestion Watermarks
+# =========================
+# The newest stored bar of each symbol decides where its next download
+# starts; a few days of overlap re-fetch bars the provider may still have
+# been filling in at the last run.
+
+
+def load_price_watermarks(con, table, key_column, keys=None):
+    """Return {symbol: MAX(trade_date)} from a price table."""
+    params = ()
+    where = ""
+    if keys is not None:
+        if not keys:
+            return {}
+        where = f"WHERE {key_column} IN ({', '.join(['%s'] * len(keys))})"
+        params = tuple(keys)
+
+    cursor = con.cursor()
+    cursor.execute(
+        f"SELECT {key_column}, MAX(trade_date) FROM {table} {where} GROUP BY {key_column}",
+        params
+    )
+    watermarks = dict(cursor.fetchall())
+    cursor.close()
+    return watermarks
+
+
+def fetch_start(last_date, start_date, overlap_days):
+    """First date to request: full history without a watermark, else watermark minus overlap."""
+    if last_date is None:
+        return start_date
+    start = max(
+        datetime.strptime(start_date, '%Y-%m-%d').date(),
+        last_date - timedelta(days=overlap_days)
+    )
+    return start.strftime('%Y-%m-%d')
+
+
+def group_by_start(symbols, watermarks, start_date, overlap_days):
+    """
+    {start: [symbols]} so symbols sharing a watermark share one download.
+    Symbols absent from `watermarks` (newly listed) get the full history.
+    """
+    groups = {}
+    for symbol in symbols:
+        start = fetch_start(watermarks.get(symbol), start_date, overlap_days)
+        groups.setdefault(start, []).append(symbol)
+    return dict(sorted(groups.items()))
@@ -0,0 +1,322 @@
+import json
+import os
+import sys
+import time
+import uuid
+import warnings
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import yaml
+
+warnings.filterwarnings("ignore")
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "ingestion"))
+sys.path.append(os.path.join(ROOT, "decision_engine"))
+from db.background_writer import connection_factory
+from async_fetch import intraday_minutes
+from providers import get_provider
+from indices import configured_indices
+from feature_store.indicators import FEATURE_COLUMNS, advance_panel
+from intraday.schema import (ensure_intraday_tables, load_intraday_states, reset_intraday_states,
+                             UPSERT_BARS, UPSERT_FEATURES, INSERT_DECISIONS, SAVE_STATE, INSERT_BATCH)
+from rules import compile_rules, remap_reason_mask
+from writer import register_reason_codes, new_decision_ids, close_connection
+from decision_setup import load_strategies, evaluate_columnar
+
+with open(os.path.join(ROOT, 'config', 'config.yml'), 'r') as file:
+    config = yaml.safe_load(file)
+
+# =====================================================
+# INTRADAY MICRO-BATCHES
+# =====================================================
+# One long-running loop per bar interval. Each time a bar closes, only the
+# newly closed bars of every symbol go through fetch -> incremental
+# indicators -> decisions, and bars, features, decisions and kernel state
+# commit in one transaction. Kernel state stays in memory between batches
+# (intraday_state is only read at start-up), so a batch never re-reads
+# history. Every batch reports per-stage timings and the lag from bar
+# close to committed decision, and logs them to intraday_batches.
+
+
+def _ms(seconds):
+    return int(round(seconds * 1000))
+
+
+def _nullable(values):
+    return [None if v != v else v for v in values.tolist()]
+
+
+class IntradayPipeline:
+    def __init__(self, interval, provider, strategies, connect, symbols,
+                 timezone="Asia/Kolkata", warmup_days=5, latency_budget=10.0):
+        minutes = intraday_minutes(interval)
+        if minutes is None:
+            raise ValueError(f"{interval} is not an intraday interval")
+        self.interval = interval
+        self.bar = pd.Timedelta(minutes=minutes)
+        self.provider = provider
+        self.strategies = strategies
+        self.symbols = list(symbols)
+        self.timezone = timezone
+        self.warmup_days = warmup_days
+        self.latency_budget = latency_budget
+        self.run_id = f"intraday_{interval}_{uuid.uuid4().hex[:8]}"
+        self.batch_no = 0
+
+        self.plans = {sid: compile_rules(cfg) for sid, cfg in strategies}
+        for sid, plan in self.plans.items():
+            unsupported = [c for c in plan.features if c not in FEATURE_COLUMNS]
+            if unsupported:
+                raise ValueError(f"Strategy {sid} needs {unsupported}; intraday computes per-symbol features only")
+        self.reason_bits = register_reason_codes(
+            [code for plan in self.plans.values() for code in plan.reason_codes]
+        )
+        close_connection()
+
+        # One connection for the life of the loop
+        self.con = connect()
+        ensure_intraday_tables(self.con)
+        self.states = load_intraday_states(self.con, interval)
+        self.started = self.now()
+
+    def now(self):
+        """Wall clock on the exchange's time zone, naive like the stored bar times."""
+        return pd.Timestamp.now(tz=self.timezone).tz_localize(None)
+
+    def next_close(self, now):
+        return now.floor(self.bar) + self.bar
+
+    # ---------- stages ----------
+    def fetch_closed_bars(self, now):
+        """
+        Long (symbol, bar_time, open..volume) frame of bars closed since each
+        symbol's watermark. Bars still forming (bar_time + bar > now) are dropped.
+        Only as fast as the provider: Yahoo costs one request per symbol for
+        the whole day so far, so the latency budget needs a streaming source.
+        """
+        end = now.floor(self.bar)  # start of the bar still forming, exclusive
+        warmup_start = end.normalize() - pd.Timedelta(days=self.warmup_days)
+        # Symbols sharing a watermark (normally all of them) share one fetch
+        groups = {}
+        for symbol in self.symbols:
+            last = self.states[symbol][0] if symbol in self.states else None
+            start = pd.Timestamp(last) + self.bar if last is not None else warmup_start
+            if start < end:
+                groups.setdefault(start, []).append(symbol)
+
+        frames, failed = {}, {}
+        for start, group in groups.items():
+            report = self.provider.fetch(group, start.strftime('%Y-%m-%d %H:%M:%S'),
+                                         end.strftime('%Y-%m-%d %H:%M:%S'), self.interval)
+            failed.update(report.failed)
+            frames.update({symbol: df for symbol, df in report.frames.items() if len(df)})
+
+        if not frames:
+            return pd.DataFrame(columns=['symbol', 'bar_time', 'Open', 'High', 'Low', 'Close', 'Volume']), failed
+        bars = pd.concat(frames, names=['symbol', 'bar_time']).reset_index()
+        # Providers may return the edges of their window; keep closed bars past each watermark only
+        watermark = pd.to_datetime(bars['symbol'].map({s: v[0] for s, v in self.states.items()}))
+        keep = (bars['bar_time'] < end) & bars['Close'].notna() & ~(bars['bar_time'] <= watermark)
+        return bars[keep].reset_index(drop=True), failed
+
+    def compute_features(self, bars):
+        """Advance every symbol's kernels over its new bars at once; state stays in memory."""
+        wide = bars.pivot(index='bar_time', columns='symbol', values='Close').sort_index()
+        panel = wide.to_numpy(dtype=float)
+        symbols = list(wide.columns)
+        values, panel_states = advance_panel(panel, [self.states.get(s, (None, None))[1] for s in symbols])
+
+        sym_idx, time_idx = (panel.T == panel.T).nonzero()
+        features = pd.DataFrame({
+            'stock_symbol': [symbols[j] for j in sym_idx],
+            'bar_time': wide.index[time_idx],
+        })
+        for column in FEATURE_COLUMNS:
+            features[column] = values[column][time_idx, sym_idx]
+
+        last_bar = panel.shape[0] - 1 - np.argmax((panel == panel)[::-1], axis=0)
+        new_states = {
+            symbol: (wide.index[last_bar[j]].to_pydatetime(), panel_states[j])
+            for j, symbol in enumerate(symbols)
+        }
+        return features, new_states
+
+    def decide(self, features):
+        """Decision records for bars that closed after the loop started (warm-up bars are not decided)."""
+        live = features[features['bar_time'] + self.bar > self.started]
+        records, created_at = [], datetime.now()
+        for strategy_id, cfg in self.strategies:
+            plan = self.plans[strategy_id]
+            subset = live[live[plan.features].notna().all(axis=1).to_numpy()]
+            if subset.empty:
+                continue
+            _, action, confidence, reason_mask = evaluate_columnar(subset, cfg)
+            masks = remap_reason_mask(reason_mask, [self.reason_bits[c] for c in plan.reason_codes])
+            records += zip(
+                new_decision_ids(len(subset)),
+                [self.run_id] * len(subset),
+                [self.interval] * len(subset),
+                [t.to_pydatetime() for t in subset['bar_time']],
+                subset['stock_symbol'].tolist(),
+                action.tolist(),
+                confidence.tolist(),
+                masks.tolist(),
+                [created_at] * len(subset),
+                [strategy_id] * len(subset),
+            )
+        return records
+
+    def write(self, bars, features, decisions, new_states):
+        """Bars, features, decisions and kernel state of one batch in one transaction."""
+        bar_times = [t.to_pydatetime() for t in bars['bar_time']]
+        volume = bars['Volume']
+        bar_rows = list(zip(
+            bars['symbol'].tolist(), [self.interval] * len(bars), bar_times,
+            bars['Open'].astype(float).tolist(), bars['High'].astype(float).tolist(),
+            bars['Low'].astype(float).tolist(), bars['Close'].astype(float).tolist(),
+            [int(v) if v == v else None for v in volume.tolist()], [self.run_id] * len(bars),
+        ))
+        feature_rows = list(zip(
+            features['stock_symbol'].tolist(), [self.interval] * len(features),
+            [t.to_pydatetime() for t in features['bar_time']],
+            *[_nullable(features[c].to_numpy()) for c in FEATURE_COLUMNS],
+            [self.run_id] * len(features),
+        ))
+        state_rows = [
+            (symbol, self.interval, last_bar, json.dumps(state))
+            for symbol, (last_bar, state) in new_states.items()
+        ]
+
+        cur = self.con.cursor()
+        try:
+            cur.executemany(UPSERT_BARS, bar_rows)
+            cur.executemany(UPSERT_FEATURES, feature_rows)
+            if decisions:
+                cur.executemany(INSERT_DECISIONS, decisions)
+            cur.executemany(SAVE_STATE, state_rows)
+            self.con.commit()
+        except Exception:
+            self.con.rollback()
+            raise
+        finally:
+            cur.close()
+
+    # ---------- one batch ----------
+    def run_batch(self, now=None):
+        now = self.now() if now is None else now
+        self.batch_no += 1
+        started = time.monotonic()
+
+        bars, failed = self.fetch_closed_bars(now)
+        fetched = time.monotonic()
+        if bars.empty:
+            return {"batch": self.batch_no, "bars": 0, "failed": len(failed)}
+
+        features, new_states = self.compute_features(bars)
+        computed = time.monotonic()
+        decisions = self.decide(features)
+        decided = time.monotonic()
+        self.write(bars, features, decisions, new_states)
+        written = time.monotonic()
+        # Memory moves only once the batch is committed
+        self.states.update(new_states)
+
+        # Lag of the newest bar: its close on the exchange clock -> commit
+        last_bar = bars['bar_time'].max()
+        max_lag = (self.now() - (last_bar + self.bar)).total_seconds() if decisions else None
+        report = {
+            "batch": self.batch_no, "last_bar": last_bar, "symbols": int(bars['symbol'].nunique()),
+            "bars": len(bars), "decisions": len(decisions), "failed": len(failed),
+            "fetch_ms": _ms(fetched - started), "features_ms": _ms(computed - fetched),
+            "decide_ms": _ms(decided - computed), "write_ms": _ms(written - decided),
+            "total_ms": _ms(written - started),
+            "max_lag_ms": _ms(max_lag) if max_lag is not None else None,
+        }
+
+        cur = self.con.cursor()
+        cur.execute(INSERT_BATCH, (
+            self.run_id, self.batch_no, self.interval, last_bar.to_pydatetime(), report["symbols"],
+            report["bars"], report["decisions"], report["fetch_ms"], report["features_ms"],
+            report["decide_ms"], report["write_ms"], report["total_ms"], report["max_lag_ms"]
+        ))
+        self.con.commit()
+        cur.close()
+        return report
+
+    def run(self, once=False, poll_seconds=2, settle_seconds=3):
+        """Run a batch now, then one after every bar close (+ settle time for the provider)."""
+        while True:
+            report = self.run_batch()
+            print_report(report)
+            if report.get("max_lag_ms") is not None and report["max_lag_ms"] > self.latency_budget * 1000:
+                print(f"WARNING: batch {report['batch']} bar-close lag {report['max_lag_ms']} ms "
+                      f"exceeds the {self.latency_budget:.0f}s budget", file=sys.stderr)
+            if once:
+                return report
+            due = self.next_close(self.now()) + pd.Timedelta(seconds=settle_seconds)
+            while self.now() < due:
+                time.sleep(min(poll_seconds, max(0.0, (due - self.now()).total_seconds())))
+
+    def close(self):
+        self.con.close()
+
+
+def print_report(report):
+    if not report["bars"]:
+        print(f"[batch {report['batch']}] no newly closed bars (failed fetches: {report['failed']})")
+        return
+    lag = f"{report['max_lag_ms']} ms" if report["max_lag_ms"] is not None else "n/a (warm-up)"
+    print(f"[batch {report['batch']}] bar {report['last_bar']} | {report['symbols']} symbols, "
+          f"{report['bars']} bars, {report['decisions']} decisions, {report['failed']} failed | "
+          f"fetch {report['fetch_ms']} ms, features {report['features_ms']} ms, "
+          f"decide {report['decide_ms']} ms, write {report['write_ms']} ms, "
+          f"total {report['total_ms']} ms | bar close -> decision {lag}")
+
+
+if __name__ == "__main__":
+    # --interval 1m|5m|...  (default intraday.interval)  --provider <name>
+    # --symbols A,B  limit the universe      --once  run a single batch and exit
+    # --reset  forget saved intraday state for the interval (re-warm from warmup_days)
+    def arg(name, default=None):
+        return sys.argv[sys.argv.index(name) + 1] if name in sys.argv else default
+
+    intraday_cfg = config.get("intraday", {})
+    interval = arg("--interval", intraday_cfg.get("interval", "5m"))
+    provider = get_provider(config, arg("--provider"))
+    if "--symbols" in sys.argv:
+        symbols = [s.strip() for s in arg("--symbols").split(",") if s.strip()]
+    else:
+        symbols = [i["name"] for i in configured_indices(config)] + sorted(provider.list_symbols())
+
+    connect = connection_factory(config["mysql"])
+    if "--reset" in sys.argv:
+        con = connect()
+        ensure_intraday_tables(con)
+        reset_intraday_states(con, interval)
+        con.close()
+
+    strategies_path = os.path.join(ROOT, "decision_engine", "config.yml")
+    with open(strategies_path, 'r') as file:
+        strategies = load_strategies(yaml.safe_load(file))
+
+    pipeline = IntradayPipeline(
+        interval, provider, strategies, connect, symbols,
+        timezone=intraday_cfg.get("timezone", "Asia/Kolkata"),
+        warmup_days=intraday_cfg.get("warmup_days", 5),
+        latency_budget=intraday_cfg.get("latency_budget_seconds", 10),
+    )
+    print(f"Intraday {interval} loop {pipeline.run_id}: {len(symbols)} symbols via {provider.name}")
+    try:
+        pipeline.run(
+            once="--once" in sys.argv,
+            poll_seconds=intraday_cfg.get("poll_seconds", 2),
+            settle_seconds=intraday_cfg.get("settle_seconds", 3),
+        )
+    except KeyboardInterrupt:
+        print(f"Stopped after {pipeline.batch_no} batches.")
+    finally:
+        pipeline.close()
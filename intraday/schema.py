@@ -0,0 +1,151 @@
+import json
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from feature_store.indicators import FEATURE_COLUMNS
+
+# =========================
+# Intraday Tables
+# =========================
+# Bars, features and decisions keyed by (symbol, interval, bar_time), where
+# bar_time is the bar's start on the exchange clock. Kernel state is kept
+# per (symbol, interval) so a restarted loop resumes from its last bar.
+
+BARS_DDL = """
+CREATE TABLE IF NOT EXISTS intraday_prices (
+    symbol VARCHAR(50) NOT NULL,
+    bar_interval VARCHAR(5) NOT NULL,
+    bar_time DATETIME NOT NULL,
+    open_price DECIMAL(12, 2),
+    high_price DECIMAL(12, 2),
+    low_price DECIMAL(12, 2),
+    close_price DECIMAL(12, 2),
+    volume BIGINT,
+    run_id VARCHAR(50),
+    PRIMARY KEY (symbol, bar_interval, bar_time)
+)
+"""
+
+FEATURES_DDL = f"""
+CREATE TABLE IF NOT EXISTS intraday_features (
+    symbol VARCHAR(50) NOT NULL,
+    bar_interval VARCHAR(5) NOT NULL,
+    bar_time DATETIME NOT NULL,
+    {" ".join(f"{c} DOUBLE," for c in FEATURE_COLUMNS)}
+    run_id VARCHAR(50),
+    PRIMARY KEY (symbol, bar_interval, bar_time)
+)
+"""
+
+DECISIONS_DDL = """
+CREATE TABLE IF NOT EXISTS intraday_decisions (
+    decision_id BINARY(16) NOT NULL PRIMARY KEY,
+    run_id VARCHAR(50) NOT NULL,
+    bar_interval VARCHAR(5) NOT NULL,
+    bar_time DATETIME NOT NULL,
+    stock_symbol VARCHAR(50) NOT NULL,
+    action VARCHAR(10) NOT NULL,
+    confidence_score DECIMAL(4, 2),
+    reason_mask BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    created_at DATETIME(3) NOT NULL,
+    strategy_id VARCHAR(50) NOT NULL DEFAULT 'default',
+    INDEX idx_intraday_decisions_bar (bar_interval, bar_time, stock_symbol)
+)
+"""
+
+STATE_DDL = """
+CREATE TABLE IF NOT EXISTS intraday_state (
+    symbol VARCHAR(50) NOT NULL,
+    bar_interval VARCHAR(5) NOT NULL,
+    last_bar_time DATETIME NOT NULL,
+    state_json TEXT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (symbol, bar_interval)
+)
+"""
+
+# One row per micro-batch: stage timings and bar-close -> committed lag
+BATCHES_DDL = """
+CREATE TABLE IF NOT EXISTS intraday_batches (
+    run_id VARCHAR(50) NOT NULL,
+    batch_no INT NOT NULL,
+    bar_interval VARCHAR(5) NOT NULL,
+    last_bar_time DATETIME,
+    symbols INT NOT NULL,
+    bars INT NOT NULL,
+    decisions INT NOT NULL,
+    fetch_ms INT NOT NULL,
+    features_ms INT NOT NULL,
+    decide_ms INT NOT NULL,
+    write_ms INT NOT NULL,
+    total_ms INT NOT NULL,
+    max_lag_ms INT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (run_id, batch_no)
+)
+"""
+
+UPSERT_BARS = """
+INSERT INTO intraday_prices
+(symbol, bar_interval, bar_time, open_price, high_price, low_price, close_price, volume, run_id)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE
+    open_price = VALUES(open_price), high_price = VALUES(high_price), low_price = VALUES(low_price),
+    close_price = VALUES(close_price), volume = VALUES(volume), run_id = VALUES(run_id)
+"""
+
+UPSERT_FEATURES = f"""
+INSERT INTO intraday_features
+(symbol, bar_interval, bar_time, {", ".join(FEATURE_COLUMNS)}, run_id)
+VALUES ({", ".join(["%s"] * (len(FEATURE_COLUMNS) + 4))})
+ON DUPLICATE KEY UPDATE
+    {", ".join(f"{c} = VALUES({c})" for c in FEATURE_COLUMNS)}, run_id = VALUES(run_id)
+"""
+
+INSERT_DECISIONS = """
+INSERT INTO intraday_decisions
+(decision_id, run_id, bar_interval, bar_time, stock_symbol, action, confidence_score,
+ reason_mask, created_at, strategy_id)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+SAVE_STATE = """
+INSERT INTO intraday_state (symbol, bar_interval, last_bar_time, state_json)
+VALUES (%s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE last_bar_time = VALUES(last_bar_time), state_json = VALUES(state_json)
+"""
+
+INSERT_BATCH = """
+INSERT INTO intraday_batches
+(run_id, batch_no, bar_interval, last_bar_time, symbols, bars, decisions,
+ fetch_ms, features_ms, decide_ms, write_ms, total_ms, max_lag_ms)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+
+def ensure_intraday_tables(con):
+    cur = con.cursor()
+    for ddl in (BARS_DDL, FEATURES_DDL, DECISIONS_DDL, STATE_DDL, BATCHES_DDL):
+        cur.execute(ddl)
+    con.commit()
+    cur.close()
+
+
+def load_intraday_states(con, interval):
+    """{symbol: (last_bar_time, state)} for one bar interval."""
+    cur = con.cursor()
+    cur.execute(
+        "SELECT symbol, last_bar_time, state_json FROM intraday_state WHERE bar_interval = %s",
+        (interval,)
+    )
+    states = {symbol: (bar_time, json.loads(blob)) for symbol, bar_time, blob in cur.fetchall()}
+    cur.close()
+    return states
+
+
+def reset_intraday_states(con, interval):
+    cur = con.cursor()
+    cur.execute("DELETE FROM intraday_state WHERE bar_interval = %s", (interval,))
+    con.commit()
+    cur.close()
@@ -3,64 +3,97 @@ import mysql.connector
 import yaml
 from datetime import datetime
 import os
+import sys
 import warnings
 warnings.filterwarnings("ignore")
 
-os.chdir(os.path.dirname(os.path.abspath(__file__)))
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(HERE, '..'))
+from ingestion.indices import sync_index_dimension
 
-# Load config
-with open('../config/config.yml', 'r') as file:
-    config = yaml.safe_load(file)
 
-con = mysql.connector.connect(
-    host=config["mysql"]["host"],
-    user=config["mysql"]["user"],
-    password=config["mysql"]["password"],
-    database=config["mysql"]["database"]
-)
+# Fetch Data: every active index, selected through the index dimension
+# (active_only=False: every stored index, with its is_active flag)
+def load_index_prices(con, config, active_only=True):
+    sync_index_dimension(con, config)
+    return pd.read_sql(f"""
+    SELECT p.*, d.is_active
+    FROM index_dimension d
+    JOIN index_prices p ON p.index_name = d.index_name
+    {"WHERE d.is_active = 1" if active_only else ""}
+    """, con)
 
-# Fetch Data
-df = pd.read_sql("SELECT * FROM index_prices", con)
 
-# Anomaly Detection
+# Anomaly Detection: z-scores against each index's own history, all indices in one pass
 def detect_anomalies(df, threshold=3):
-    close_z = (df['close_price'] - df['close_price'].mean()) / df['close_price'].std()
-    volume_z = (df['volume'] - df['volume'].mean()) / df['volume'].std()
+    df[['close_price', 'volume']] = df[['close_price', 'volume']].astype(float)
+    by_index = df.groupby('index_name')
+    close_z = (df['close_price'] - by_index['close_price'].transform('mean')) / by_index['close_price'].transform('std')
+    volume_z = (df['volume'] - by_index['volume'].transform('mean')) / by_index['volume'].transform('std')
 
     df['price_zscore'] = close_z.round(4)
     df['volume_zscore'] = volume_z.round(4)
     df['is_anomalous'] = ((close_z.abs() > threshold) | (volume_z.abs() > threshold)).astype(int)
     return df
 
-df = detect_anomalies(df)
-
-# Prepare records for insertion
-records = []
-for _, row in df.iterrows():
-    records.append((
-        row['run_id'],
-        row['index_name'],
-        row['trade_date'],
-        0,
-        row['price_zscore'],
-        row['volume_zscore'],
-        row['is_anomalous'],
-        datetime.now()
+
+def detect_index_anomalies(con, config, df=None, scope=None):
+    """
+    Score and store every active index's bars. df: prices already in
+    memory (load_index_prices() rows; modified in place), else read here.
+    scope: (symbols, start, end) stores only those indices' bars in
+    [start, end), still scored against each index's full history.
+    Returns the number of rows scored.
+    """
+    if df is None:
+        df = load_index_prices(con, config)
+    if scope is not None:
+        df = df[df['index_name'].isin(scope[0])].copy()
+    df = detect_anomalies(df)
+    if scope is not None:
+        trade_date = pd.to_datetime(df['trade_date'])
+        df = df[(trade_date >= pd.Timestamp(scope[1])) & (trade_date < pd.Timestamp(scope[2]))]
+
+    # Prepare records for insertion
+    checked_at = datetime.now()
+    records = list(zip(
+        df['run_id'],
+        df['index_name'],
+        df['trade_date'],
+        [0] * len(df),
+        df['price_zscore'].astype(object).where(df['price_zscore'].notna(), None),
+        df['volume_zscore'].astype(object).where(df['volume_zscore'].notna(), None),
+        df['is_anomalous'].tolist(),
+        [checked_at] * len(df)
     ))
 
-cursor = con.cursor()
+    cursor = con.cursor()
+
+    query = """
+    INSERT INTO data_quality_index_metrics (
+        run_id, index_name, trade_date, missing_pct,
+        price_zscore, volume_zscore, is_anomalous, checked_at
+    ) VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
+    """
+
+    cursor.executemany(query, records)
+    con.commit()
+    cursor.close()
 
-query = """
-INSERT INTO data_quality_index_metrics (
-    run_id, index_name, trade_date, missing_pct,
-    price_zscore, volume_zscore, is_anomalous, checked_at
-) VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
-"""
+    print("Data Quality Metrics updated successfully.")
+    return len(records)
 
-cursor.executemany(query, records)
-con.commit()
 
-cursor.close()
-con.close()
+if __name__ == "__main__":
+    # Load config
+    with open(os.path.join(HERE, '..', 'config', 'config.yml'), 'r') as file:
+        config = yaml.safe_load(file)
 
-print("Data Quality Metrics updated successfully.")
+    con = mysql.connector.connect(
+        host=config["mysql"]["host"],
+        user=config["mysql"]["user"],
+        password=config["mysql"]["password"],
+        database=config["mysql"]["database"]
+    )
+    detect_index_anomalies(con, config)
+    con.close()
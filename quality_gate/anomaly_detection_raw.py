@@ -6,61 +6,103 @@ import os
 import warnings
 warnings.filterwarnings("ignore")
 
-os.chdir(os.path.dirname(os.path.abspath(__file__)))
+HERE = os.path.dirname(os.path.abspath(__file__))
 
-# Load config
-with open('../config/config.yml', 'r') as file:
-    config = yaml.safe_load(file)
 
-con = mysql.connector.connect(
-    host=config["mysql"]["host"],
-    user=config["mysql"]["user"],
-    password=config["mysql"]["password"],
-    database=config["mysql"]["database"]
-)
+# Fetch Data (scope: (symbols, start, end) limits the read, end exclusive)
+def load_raw_prices(con, scope=None):
+    if scope is None:
+        return pd.read_sql("SELECT * FROM raw_prices", con)
+    symbols, start, end = scope
+    return pd.read_sql(f"""
+    SELECT * FROM raw_prices
+    WHERE stock_symbol IN ({", ".join(["%s"] * len(symbols))})
+      AND trade_date >= %s AND trade_date < %s
+    """, con, params=(*symbols, start, end))
 
-# Fetch Data
-df = pd.read_sql("SELECT * FROM raw_prices", con)
 
-# Anomaly Detection
-def detect_anomalies(df, threshold=3):
-    close_z = (df['close_price'] - df['close_price'].mean()) / df['close_price'].std()
-    volume_z = (df['volume'] - df['volume'].mean()) / df['volume'].std()
+def load_raw_stats(con):
+    """(close mean, close std, volume mean, volume std) over the whole table, as pandas computes them."""
+    cursor = con.cursor()
+    cursor.execute("""
+    SELECT AVG(close_price), STDDEV_SAMP(close_price), AVG(volume), STDDEV_SAMP(volume)
+    FROM raw_prices
+    """)
+    stats = tuple(float(v) if v is not None else float("nan") for v in cursor.fetchone())
+    cursor.close()
+    return stats
+
+
+# Anomaly Detection: z-scores against the whole table (stats: its precomputed moments)
+def detect_anomalies(df, threshold=3, stats=None):
+    close, volume = df['close_price'].astype(float), df['volume'].astype(float)
+    if stats is None:
+        stats = (close.mean(), close.std(), volume.mean(), volume.std())
+    close_mean, close_std, volume_mean, volume_std = stats
+    close_z = (close - close_mean) / close_std
+    volume_z = (volume - volume_mean) / volume_std
 
     df['price_zscore'] = close_z.round(4)
     df['volume_zscore'] = volume_z.round(4)
     df['is_anomalous'] = ((close_z.abs() > threshold) | (volume_z.abs() > threshold)).astype(int)
     return df
 
-df = detect_anomalies(df)
-
-# Prepare records for insertion
-records = []
-for _, row in df.iterrows():
-    records.append((
-        row['run_id'],
-        row['stock_symbol'],
-        row['trade_date'],
-        0,
-        row['price_zscore'],
-        row['volume_zscore'],
-        row['is_anomalous'],
-        datetime.now()
-    ))
-
-cursor = con.cursor()
-
-query = """
-INSERT INTO data_quality_raw_metrics (
-    run_id, stock_symbol, trade_date, missing_pct,
-    price_zscore, volume_zscore, is_anomalous, checked_at
-) VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
-"""
-
-cursor.executemany(query, records)
-con.commit()
-
-cursor.close()
-con.close()
-
-print("Data Quality Metrics updated successfully.")
+
+def detect_raw_anomalies(con, df=None, scope=None):
+    """
+    Score and store every stock bar. df: raw_prices rows already in
+    memory (modified in place), else read here. scope: (symbols, start,
+    end) scores only those bars, against the whole table's moments.
+    Returns the rows scored.
+    """
+    if scope is not None:
+        df = detect_anomalies(load_raw_prices(con, scope), stats=load_raw_stats(con))
+    else:
+        if df is None:
+            df = load_raw_prices(con)
+        df = detect_anomalies(df)
+
+    # Prepare records for insertion
+    records = []
+    for _, row in df.iterrows():
+        records.append((
+            row['run_id'],
+            row['stock_symbol'],
+            row['trade_date'],
+            0,
+            row['price_zscore'],
+            row['volume_zscore'],
+            row['is_anomalous'],
+            datetime.now()
+        ))
+
+    cursor = con.cursor()
+
+    query = """
+    INSERT INTO data_quality_raw_metrics (
+        run_id, stock_symbol, trade_date, missing_pct,
+        price_zscore, volume_zscore, is_anomalous, checked_at
+    ) VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
+    """
+
+    cursor.executemany(query, records)
+    con.commit()
+    cursor.close()
+
+    print("Data Quality Metrics updated successfully.")
+    return len(records)
+
+
+if __name__ == "__main__":
+    # Load config
+    with open(os.path.join(HERE, '..', 'config', 'config.yml'), 'r') as file:
+        config = yaml.safe_load(file)
+
+    con = mysql.connector.connect(
+        host=config["mysql"]["host"],
+        user=config["mysql"]["user"],
+        password=config["mysql"]["password"],
+        database=config["mysql"]["database"]
+    )
+    detect_raw_anomalies(con)
+    con.close()
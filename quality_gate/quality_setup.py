@@ -1,20 +1,53 @@
-import subprocess
 import os
 import sys
 
-# Always move to project root (IMPORTANT)
-os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import mysql.connector
+import yaml
 
-def run_step(label, command):
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(HERE)
+from anomaly_detection_index import detect_index_anomalies
+from anomaly_detection_raw import detect_raw_anomalies
+
+
+def run_step(label, step, *args):
     print(f"\n{label}...")
-    result = subprocess.run(command)
-    if result.returncode != 0:
-        print(f"{label} FAILED. Aborting.\n")
-        sys.exit(1)
+    result = step(*args)
     print(f"{label} completed.\n")
+    return result
+
+
+def run_quality(con, config, index_df=None, raw_df=None, scope=None):
+    """
+    Both anomaly checks in this process. index_df / raw_df: price rows
+    already in memory (see load_index_prices / load_raw_prices in the
+    anomaly modules), else each check reads its table. The frames are
+    modified in place. scope: (symbols, start, end) checks only those
+    symbols' bars in [start, end), e.g. after a backfill.
+    """
+    run_step("Index Anomaly Detection", detect_index_anomalies, con, config, index_df, scope)
+    run_step("Raw Stocks Anomaly Detection", detect_raw_anomalies, con, raw_df, scope)
+    print("\nQuality checks completed successfully.\n")
+
+
+if __name__ == "__main__":
+    # --symbols A,B --from YYYY-MM-DD --to YYYY-MM-DD (exclusive) checks only that slice
+    with open(os.path.join(HERE, '..', 'config', 'config.yml'), 'r') as file:
+        config = yaml.safe_load(file)
 
-# Paths INSIDE the folder (relative from project root)
-run_step("Index Anomaly Detection", ["python", "quality_gate/anomaly_detection_index.py"])
-run_step("Raw Stocks Anomaly Detection", ["python", "quality_gate/anomaly_detection_raw.py"])
+    scope = None
+    if "--symbols" in sys.argv:
+        scope = (sys.argv[sys.argv.index("--symbols") + 1].split(","),
+                 sys.argv[sys.argv.index("--from") + 1], sys.argv[sys.argv.index("--to") + 1])
 
-print("\nQuality checks completed successfully.\n")
+    con = mysql.connector.connect(
+        host=config["mysql"]["host"],
+        user=config["mysql"]["user"],
+        password=config["mysql"]["password"],
+        database=config["mysql"]["database"]
+    )
+    # A failed step raises: traceback on stderr, exit status 1
+    try:
+        run_quality(con, config, scope=scope)
+    finally:
+        con.close()
@@ -6,21 +6,7 @@ import os
 import warnings
 warnings.filterwarnings("ignore")
 
-# move to the script's directory
-os.chdir(os.path.dirname(os.path.abspath(__file__)))
-
-# ============ Load Configuration ============
-with open('../config/config.yml', 'r') as file:
-    config = yaml.safe_load(file)
-
-con = mysql.connector.connect(
-    host=config["mysql"]["host"],
-    user=config["mysql"]["user"],
-    password=config["mysql"]["password"],
-    database=config["mysql"]["database"]
-)
-
-cursor = con.cursor()
+HERE = os.path.dirname(os.path.abspath(__file__))
 
 # Tables to check
 table_names = ['index_prices', 'raw_prices']
@@ -35,48 +21,70 @@ must_have_columns = {
     "volume": "bigint"
 }
 
-print("\n============== SCHEMA VALIDATION REPORT ==============\n")
 
-for table in table_names:
-    cursor.execute(f"DESCRIBE {table}")
-    columns = cursor.fetchall()
-    
-    db_columns = {col[0]: col[1].lower() for col in columns}  # dict → {column_name: datatype}
+def validate_schema(con):
+    """Print the report; False on the first table with missing or mistyped columns."""
+    cursor = con.cursor()
+    print("\n============== SCHEMA VALIDATION REPORT ==============\n")
 
-    missing_columns = []
-    type_mismatches = []
+    for table in table_names:
+        cursor.execute(f"DESCRIBE {table}")
+        columns = cursor.fetchall()
 
-    for col, expected_type in must_have_columns.items():
+        db_columns = {col[0]: col[1].lower() for col in columns}  # dict → {column_name: datatype}
 
-        if col not in db_columns:
-            missing_columns.append(col)
-        else:
-            actual_type = db_columns[col]
+        missing_columns = []
+        type_mismatches = []
 
-            # check only the base type (example: "decimal(10,2)" → decimal)
-            if not actual_type.startswith(expected_type.lower()):
-                type_mismatches.append((col, expected_type, actual_type))
-    
-    print(f"Table: {table}")
+        for col, expected_type in must_have_columns.items():
 
-    if missing_columns:
-        print(f"Schema Validation Failed for table: {table}")
-        print(f"   Missing Columns: {missing_columns}")
-        print("   Aborting pipeline due to critical schema mismatch.\n")
-        exit(1)
+            if col not in db_columns:
+                missing_columns.append(col)
+            else:
+                actual_type = db_columns[col]
 
-    if type_mismatches:
-        print(f"Schema Validation Failed for table: {table}")
-        print("Type Mismatches:")
-        for col, exp, found in type_mismatches:
-            print(f"      - {col}: expected {exp}, found {found}")
-        print("Aborting pipeline due to incorrect column types.\n")
-        exit(1)
+                # check only the base type (example: "decimal(10,2)" → decimal)
+                if not actual_type.startswith(expected_type.lower()):
+                    type_mismatches.append((col, expected_type, actual_type))
+
+        print(f"Table: {table}")
 
-    print("Schema validation passed for this table.")
-    print("------------------------------------------------------")
+        if missing_columns:
+            print(f"Schema Validation Failed for table: {table}")
+            print(f"   Missing Columns: {missing_columns}")
+            print("   Aborting pipeline due to critical schema mismatch.\n")
+            cursor.close()
+            return False
 
-print("\nAll checks completed.\n")
+        if type_mismatches:
+            print(f"Schema Validation Failed for table: {table}")
+            print("Type Mismatches:")
+            for col, exp, found in type_mismatches:
+                print(f"      - {col}: expected {exp}, found {found}")
+            print("Aborting pipeline due to incorrect column types.\n")
+            cursor.close()
+            return False
 
-cursor.close()
-con.close()
+        print("Schema validation passed for this table.")
+        print("------------------------------------------------------")
+
+    print("\nAll checks completed.\n")
+    cursor.close()
+    return True
+
+
+if __name__ == "__main__":
+    # ============ Load Configuration ============
+    with open(os.path.join(HERE, '..', 'config', 'config.yml'), 'r') as file:
+        config = yaml.safe_load(file)
+
+    con = mysql.connector.connect(
+        host=config["mysql"]["host"],
+        user=config["mysql"]["user"],
+        password=config["mysql"]["password"],
+        database=config["mysql"]["database"]
+    )
+    passed = validate_schema(con)
+    con.close()
+    if not passed:
+        exit(1)
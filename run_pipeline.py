@@ -1,17 +1,35 @@
+import contextlib
+import importlib
+import io
+import multiprocessing
 import os
 import subprocess
 import sys
 import mysql.connector
+import pandas as pd
 import yaml
 from datetime import datetime
 import time
+import traceback
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+os.chdir(ROOT)
+sys.path.append(ROOT)
+from db.background_writer import connection_factory, connection_pool
 
-os.chdir(os.path.dirname(os.path.abspath(__file__)))
 python_exe = sys.executable
 
+# --subprocess     run every stage as its own script (isolation), as before
+# --provider NAME  price provider for ingestion (default: config)
+# --full           re-download full history instead of only the missing range
+SUBPROCESS = "--subprocess" in sys.argv
+provider_name = sys.argv[sys.argv.index("--provider") + 1] if "--provider" in sys.argv else None
+full = "--full" in sys.argv
+
 print("\nPIPELINE STARTED")
 run_id = f"run_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
 print(f"RUN ID: {run_id}")
+print(f"MODE: {'subprocess' if SUBPROCESS else 'in-process'}")
 print("--------------------------------------------------")
 
 # =====================================================
@@ -32,15 +50,13 @@ with open('config/config.yml', 'r') as file:
     config = yaml.safe_load(file)
 
 db = config["mysql"]
+pool_size = config.get("pipeline", {}).get("pool_size", 8)
 
+# In-process stages share one pool; subprocess stages open their own connections
 for attempt in range(3):
     try:
-        con = mysql.connector.connect(
-            host=db["host"],
-            user=db["user"],
-            password=db["password"],
-            database=db["database"]
-        )
+        connect = connection_factory(db) if SUBPROCESS else connection_pool(db, pool_size)
+        con = connect()
         break
     except mysql.connector.Error:
         print("[SYSTEM] Database not reachable. Retrying...")
@@ -62,37 +78,173 @@ def log_health(stage, status, message):
     cur.execute(query, (run_id, stage, status, message))
     con.commit()
 
-# =====================================================
-# STEP EXECUTION HANDLER
-# =====================================================
-def run_step(file, label, stage_key):
-    print(f"[{stage_key}] Executing {file} ...")
-    result = subprocess.run([python_exe, file], capture_output=True, text=True)
 
-    if result.returncode != 0:
-        log_health(stage_key, "FAILED", result.stderr.strip() or "No stderr message")
-        print(f"[{stage_key}] FAILED")
+def finish_stage(stage_key, failed, warning_msg, started):
+    elapsed = f"({time.monotonic() - started:.1f}s)"
+    if failed:
+        log_health(stage_key, "FAILED", warning_msg or "No stderr message")
+        print(f"[{stage_key}] FAILED {elapsed}")
         cur.close()
         con.close()
         sys.exit(1)
 
-    warning_msg = result.stderr.strip()
     if warning_msg:
         log_health(stage_key, "WARNING", warning_msg)
-        print(f"[{stage_key}] COMPLETED WITH WARNINGS")
+        print(f"[{stage_key}] COMPLETED WITH WARNINGS {elapsed}")
     else:
         log_health(stage_key, "OK", "Completed successfully")
-        print(f"[{stage_key}] OK")
+        print(f"[{stage_key}] OK {elapsed}")
+
+# =====================================================
+# STEP EXECUTION HANDLERS
+# =====================================================
+def run_step(file, label, stage_key, *args):
+    """Subprocess mode: one script per stage; its stderr becomes the WARNING/FAILED message."""
+    print(f"[{stage_key}] Executing {file} ...")
+    started = time.monotonic()
+    result = subprocess.run([python_exe, file, *args], capture_output=True, text=True)
+    finish_stage(stage_key, result.returncode != 0, result.stderr.strip(), started)
+
+
+def run_stage(stage, label, stage_key, *args):
+    """
+    In-process mode: stage(stage_con, *args) on a connection of its own
+    from the pool. What the stage prints to stderr is logged as a WARNING,
+    as run_step does for a script; an exception (or sys.exit) fails the
+    pipeline after rolling the stage's connection back.
+    """
+    print(f"[{stage_key}] Running {label} ...")
+    started = time.monotonic()
+    captured = io.StringIO()
+    stage_con = connect()
+    try:
+        with contextlib.redirect_stderr(captured):
+            result = stage(stage_con, *args)
+    except (Exception, SystemExit):
+        with contextlib.suppress(Exception):
+            stage_con.rollback()
+            stage_con.close()
+        finish_stage(stage_key, True, (captured.getvalue() + traceback.format_exc()).strip(), started)
+    stage_con.close()
+    finish_stage(stage_key, False, captured.getvalue().strip(), started)
+    return result
+
+
+def import_stage(folder, name):
+    """
+    Import a stage script as a module. Its bare sibling imports are dropped
+    from sys.modules afterwards, so same-named helpers of two stages
+    (feature_store/state.py, decision_engine/state.py) never collide.
+    The folder stays on sys.path (behind the others) so a worker process
+    can still import the stage by name to unpickle e.g. run_shard.
+    """
+    path = os.path.join(ROOT, folder)
+    sys.path.insert(0, path)
+    try:
+        module = importlib.import_module(name)
+    finally:
+        sys.path.remove(path)
+        if path not in sys.path:
+            sys.path.append(path)
+    for key, loaded in list(sys.modules.items()):
+        if key != name and os.path.dirname(getattr(loaded, "__file__", None) or "") == path:
+            del sys.modules[key]
+    return module
+
+# =====================================================
+# IN-PROCESS STAGES (stage_con, *handoffs) -> handoffs
+# =====================================================
+# Every stage shares `config` and the pool. Price rows are read once,
+# right after ingestion, and handed on to the quality checks, the
+# feature kernels and the feedback outcomes.
+def schema_stage(stage_con):
+    if not import_stage("quality_gate", "schema_validation").validate_schema(stage_con):
+        raise RuntimeError("Schema validation failed: see the report above")
+
+
+def ingestion_stage(stage_con):
+    index_report, stock_report = import_stage("ingestion", "ingest_setup").run_ingestion(
+        config, connect, provider_name, full
+    )
+    print(f"Ingested {index_report['rows']} index rows, {stock_report['rows']} stock rows.")
+
+
+def price_closes(df, key):
+    closes = df[[key, 'trade_date', 'close_price']].copy()
+    closes['trade_date'] = pd.to_datetime(closes['trade_date'])
+    closes['close_price'] = closes['close_price'].astype(float)
+    return closes.sort_values(by=[key, 'trade_date'], ignore_index=True)
+
+
+def quality_stage(stage_con):
+    load_index_prices = import_stage("quality_gate", "anomaly_detection_index").load_index_prices
+    load_raw_prices = import_stage("quality_gate", "anomaly_detection_raw").load_raw_prices
+    index_df = load_index_prices(stage_con, config, active_only=False)
+    raw_df = load_raw_prices(stage_con)
+
+    # Closes for the later stages, taken before the checks add their columns;
+    # features cover every stored index, quality and feedback the active ones
+    index_closes = price_closes(index_df, 'index_name')
+    raw_closes = price_closes(raw_df, 'stock_symbol')
+    closes = pd.concat([index_closes.rename(columns={'index_name': 'symbol'}),
+                        raw_closes.rename(columns={'stock_symbol': 'symbol'})], ignore_index=True)
+    active_df = index_df[index_df['is_active'] == 1].copy()
+    feedback = {
+        "index": index_closes[index_closes['index_name'].isin(active_df['index_name'])]
+        .rename(columns={'index_name': 'index_symbol'}).reset_index(drop=True),
+        "raw": raw_closes,
+    }
+
+    import_stage("quality_gate", "quality_setup").run_quality(stage_con, config, active_df, raw_df)
+    return closes, feedback
+
+
+def feature_stage(stage_con, closes):
+    technical_indicator = import_stage("feature_store", "technical_indicator")
+    technical_indicator.use_connections(connect)
+    feature_cfg = config.get("feature_store", {})
+    # Shard workers are forked: spawn/forkserver would re-run this script
+    # (it has no __main__ guard) in every worker. Forked workers inherit
+    # the imported stage and reconnect through the pool's pid check.
+    technical_indicator.run_features(
+        incremental=feature_cfg.get("incremental", True),
+        workers=feature_cfg.get("workers", 1),
+        prices=closes,
+        mp_context=multiprocessing.get_context("fork")
+    )
+
+
+def decision_stage(stage_con):
+    decision_setup = import_stage("decision_engine", "decision_setup")
+    decision_setup.use_connections(connect)
+    decision_setup.run_engine(incremental=config.get("decision_engine", {}).get("incremental", True))
+
+
+def feedback_stage(stage_con, feedback):
+    import_stage("feedback_system", "feedback_setup").run_feedback(
+        stage_con, config, connect, feedback["index"], feedback["raw"]
+    )
 
 # =====================================================
 # PIPELINE STEPS
 # =====================================================
-run_step("quality_gate/schema_validation.py",  "Schema Validation", "SCHEMA_VALIDATION")
-run_step("ingestion/ingest_setup.py",          "Data Ingestion",    "INGESTION")
-run_step("quality_gate/quality_setup.py",      "Quality Checks",    "QUALITY")
-run_step("feature_store/technical_indicator.py","Technical Indicators","FEATURE_ENGINEERING")
-run_step("decision_engine/decision_setup.py",  "Decision Engine",   "DECISION_ENGINE")
-run_step("feedback_system/feedback_setup.py",  "Feedback Processing","FEEDBACK")
+if SUBPROCESS:
+    ingest_args = (["--provider", provider_name] if provider_name else []) + (["--full"] if full else [])
+    run_step("quality_gate/schema_validation.py",  "Schema Validation", "SCHEMA_VALIDATION")
+    run_step("ingestion/ingest_setup.py",          "Data Ingestion",    "INGESTION", *ingest_args)
+    run_step("quality_gate/quality_setup.py",      "Quality Checks",    "QUALITY")
+    run_step("feature_store/technical_indicator.py","Technical Indicators","FEATURE_ENGINEERING")
+    run_step("decision_engine/decision_setup.py",  "Decision Engine",   "DECISION_ENGINE")
+    run_step("feedback_system/feedback_setup.py",  "Feedback Processing","FEEDBACK")
+else:
+    run_stage(schema_stage,    "Schema Validation",    "SCHEMA_VALIDATION")
+    run_stage(ingestion_stage, "Data Ingestion",       "INGESTION")
+    closes, feedback = run_stage(quality_stage, "Quality Checks", "QUALITY")
+    run_stage(feature_stage,   "Technical Indicators", "FEATURE_ENGINEERING", closes)
+    del closes
+    run_stage(decision_stage,  "Decision Engine",      "DECISION_ENGINE")
+    run_stage(feedback_stage,  "Feedback Processing",  "FEEDBACK", feedback)
+    del feedback
 
 # =====================================================
 # STEP: GOLD LAYER SCHEMA CREATION
@@ -101,13 +253,13 @@ print("[GOLD_LAYER] Executing db/gold-layer-schema.sql ...")
 try:
     with open('db/gold-layer-schema.sql', 'r') as f:
         sql_content = f.read()
-    
+
     # Execute each statement separately
     for statement in sql_content.split(';'):
         statement = statement.strip()
         if statement:
             cur.execute(statement)
-    
+
     con.commit()
     log_health("GOLD_LAYER", "OK", "Completed successfully")
     print("[GOLD_LAYER] OK")
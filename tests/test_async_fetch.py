@@ -0,0 +1,143 @@
+import json
+import os
+import sys
+import threading
+import time
+import urllib.parse
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ingestion"))
+from async_fetch import PermanentFetchError, chart_url, fetch_prices, parse_chart  # noqa: E402
+
+# 2024-01-02 09:15 IST, the open of the first bar
+OPEN_TS = 1704167100
+
+
+def chart(symbol):
+    return {"chart": {"error": None, "result": [{
+        "meta": {"symbol": symbol, "gmtoffset": 19800},
+        "timestamp": [OPEN_TS],
+        "indicators": {"quote": [{"open": [10.0], "high": [11.0], "low": [9.5],
+                                  "close": [10.5], "volume": [1000]}]},
+    }]}}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    Local stand-in for the chart API. The ticker picks the behaviour:
+    FLAKY_n answers 503 n times, SLOW_n answers 429 n times, MISSING 404s,
+    UNKNOWN returns a chart error; anything else is served at once.
+    """
+
+    def do_GET(self):
+        ticker = urllib.parse.unquote(self.path.split("?")[0].rsplit("/", 1)[-1])
+        hits = self.server.hits
+        hits[ticker] += 1
+        self.server.times.append(time.monotonic())
+
+        kind, _, n = ticker.partition("_")
+        if kind in ("FLAKY", "SLOW") and hits[ticker] <= int(n):
+            self.send_error(503 if kind == "FLAKY" else 429)
+            return
+        if kind == "MISSING":
+            self.send_error(404)
+            return
+        if kind == "UNKNOWN":
+            body = {"chart": {"result": None, "error": {"code": "Not Found",
+                                                        "description": "No data found, symbol may be delisted"}}}
+        else:
+            body = chart(ticker)
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.hits = Counter()
+    httpd.times = []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def settings(server, **overrides):
+    return {"base_url": f"http://127.0.0.1:{server.server_address[1]}", "rate_per_sec": 1000.0,
+            "burst": 1000, "max_retries": 3, "backoff_base": 0.01, "timeout": 5, **overrides}
+
+
+def test_retries_transient_errors_with_backoff(server):
+    report = fetch_prices(["FLAKY_2", "SLOW_1", "OK"], "2024-01-02", "2024-01-03",
+                          settings=settings(server, backoff_base=0.05))
+
+    assert sorted(report.frames) == ["FLAKY_2", "OK", "SLOW_1"]
+    assert report.failed == {}
+    assert server.hits == {"FLAKY_2": 3, "SLOW_1": 2, "OK": 1}
+    assert report.requests == 6
+    assert report.retries == 3
+    # Two backoff rounds: at least 0.05 * 0.5 + 0.1 * 0.5 seconds
+    assert report.elapsed >= 0.075
+    assert report.frames["OK"]["Close"].tolist() == [10.5]
+
+
+def test_gives_up_after_max_retries(server):
+    report = fetch_prices(["FLAKY_9"], "2024-01-02", "2024-01-03", settings=settings(server, max_retries=2))
+
+    assert report.frames == {}
+    assert "HTTPError" in report.failed["FLAKY_9"]
+    assert server.hits["FLAKY_9"] == 3
+
+
+def test_permanent_errors_are_not_retried(server):
+    report = fetch_prices(["MISSING", "UNKNOWN", "OK"], "2024-01-02", "2024-01-03", settings=settings(server))
+
+    assert list(report.frames) == ["OK"]
+    assert "PermanentFetchError" in report.failed["MISSING"]
+    assert "delisted" in report.failed["UNKNOWN"]
+    assert server.hits["MISSING"] == 1
+    assert server.hits["UNKNOWN"] == 1
+    assert report.retries == 0
+
+
+def test_rate_limit_spaces_requests(server):
+    tickers = [f"T{i}" for i in range(8)]
+    report = fetch_prices(tickers, "2024-01-02", "2024-01-03",
+                          settings=settings(server, rate_per_sec=20.0, burst=2, chunk_size=3))
+
+    assert sorted(report.frames) == tickers
+    # 2 from the burst, the other 6 at 20/s
+    assert server.times[-1] - server.times[0] >= 6 / 20.0 * 0.9
+
+
+def test_chart_url_is_host_timezone_independent(monkeypatch):
+    if not hasattr(time, "tzset"):
+        pytest.skip("time.tzset is not available")
+    urls = {}
+    for tz in ("UTC", "America/New_York", "Asia/Kolkata"):
+        monkeypatch.setenv("TZ", tz)
+        time.tzset()
+        urls[tz] = chart_url("http://x", "RELIANCE.NS", "2024-01-02", "2024-01-03", "1d")
+    monkeypatch.delenv("TZ")
+    time.tzset()
+
+    assert len(set(urls.values())) == 1
+    query = urllib.parse.parse_qs(urls["UTC"].split("?")[1])
+    # period1 is 2024-01-02 00:00 UTC, before that day's 09:15 IST open
+    assert int(query["period1"][0]) == 1704153600 < OPEN_TS
+
+
+def test_chart_error_raises_permanent():
+    with pytest.raises(PermanentFetchError):
+        parse_chart({"chart": {"result": None, "error": {"description": "Invalid interval"}}})
@@ -0,0 +1,113 @@
+import os
+import sys
+import threading
+
+import pytest
+
+pytest.importorskip("mysql.connector")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from db.background_writer import BackgroundWriter  # noqa: E402
+
+
+class _Cursor:
+    def __init__(self, con):
+        self.con = con
+
+    def executemany(self, query, rows):
+        for row in rows:
+            if isinstance(row, threading.Event):
+                row.wait(5)
+        if any(row == "bad" for row in rows):
+            self.con.failed.set()
+            raise RuntimeError("write failed")
+        self.con.pending += rows
+
+    def close(self):
+        pass
+
+
+class _Con:
+    """Records committed rows; a batch containing "bad" fails."""
+
+    def __init__(self):
+        self.pending, self.committed = [], []
+        self.failed = threading.Event()
+        self.open = True
+
+    def cursor(self):
+        return _Cursor(self)
+
+    def commit(self):
+        self.committed += self.pending
+        self.pending = []
+
+    def is_connected(self):
+        return self.open
+
+    def close(self):
+        self.open = False
+
+
+@pytest.fixture
+def con():
+    return _Con()
+
+
+def writer(con):
+    return BackgroundWriter("INSERT", lambda: con, name="test-writer")
+
+
+def test_batches_are_committed_in_order(con):
+    w = writer(con)
+    for i in range(5):
+        w.submit([i, i + 100])
+    w.submit([])
+
+    assert w.close() == 10
+    assert con.committed == [0, 100, 1, 101, 2, 102, 3, 103, 4, 104]
+    assert not con.open
+
+
+def test_error_is_raised_on_the_next_submit(con):
+    w = writer(con)
+    w.submit(["bad"])
+    assert con.failed.wait(5)
+    w._queue.join()
+
+    with pytest.raises(RuntimeError, match="write failed"):
+        w.submit([1])
+    with pytest.raises(RuntimeError):
+        w.close()
+
+
+def test_error_is_raised_on_flush_and_later_batches_are_discarded(con):
+    w = BackgroundWriter("INSERT", lambda: con, queue_size=4, name="test-writer")
+    gate = threading.Event()
+    w.submit([gate])  # holds the thread until the rest are queued
+    w.submit(["bad"])
+    w.submit([3, 4])
+    gate.set()
+    with pytest.raises(RuntimeError, match="write failed"):
+        w.flush()
+
+    assert con.committed == [gate]
+    assert w.rows_written == 1
+
+
+def test_error_is_raised_on_close(con):
+    w = writer(con)
+    w.submit(["bad"])
+    with pytest.raises(RuntimeError, match="write failed"):
+        w.close()
+    assert not con.open
+
+
+def test_context_manager_keeps_the_producers_exception(con):
+    with pytest.raises(KeyError):
+        with writer(con) as w:
+            w.submit(["bad"])
+            raise KeyError("producer failed")
+
+    with pytest.raises(RuntimeError, match="write failed"):
+        with writer(_Con()) as w:
+            w.submit(["bad"])
@@ -0,0 +1,61 @@
+import os
+import sys
+from datetime import date
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("mysql.connector")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from feature_store import query  # noqa: E402
+from feature_store.query import STORED_COLUMNS, FeatureStore  # noqa: E402
+
+
+class _Con:
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def store(monkeypatch):
+    """FeatureStore over an in-memory features table; returns (store, year ranges read)."""
+    days = pd.bdate_range("2022-12-26", "2024-01-05")
+    table = pd.concat([
+        pd.DataFrame({"stock_symbol": symbol, "trade_date": [d.date() for d in days],
+                      **{c: 1.0 for c in STORED_COLUMNS}, "feature_run_id": "techind_a"})
+        for symbol in ("AAA", "BBB")
+    ], ignore_index=True)
+    reads = []
+
+    def read_sql(sql, con, params=()):
+        *symbols, lo, hi = params
+        reads.append((tuple(symbols), lo.year, hi.year))
+        dates = pd.to_datetime(table["trade_date"])
+        return table[table["stock_symbol"].isin(symbols) & (dates >= pd.Timestamp(lo)) & (dates <= pd.Timestamp(hi))]
+
+    monkeypatch.setattr(query.pd, "read_sql", read_sql)
+    store = FeatureStore(_Con)
+    monkeypatch.setattr(store, "_refresh", lambda con: None)
+    monkeypatch.setattr(store, "_date_bounds", lambda con: (date(2022, 12, 26), date(2024, 1, 5)))
+    return store, reads
+
+
+def test_since_returns_only_rows_after_each_watermark(store):
+    store, _ = store
+    df = store.get_features(["AAA", "BBB"], columns=["rsi_14"], since={"AAA": date(2024, 1, 3)})
+
+    aaa = df[df["stock_symbol"] == "AAA"]["trade_date"]
+    bbb = df[df["stock_symbol"] == "BBB"]["trade_date"]
+    assert aaa.tolist() == list(pd.to_datetime(["2024-01-04", "2024-01-05"]))
+    assert bbb.min() == pd.Timestamp("2022-12-26") and bbb.max() == pd.Timestamp("2024-01-05")
+
+
+def test_since_skips_blocks_before_the_watermark_year(store):
+    store, reads = store
+    store.get_features(["AAA"], columns=["rsi_14"], since={"AAA": date(2024, 1, 3)})
+
+    assert reads == [(("AAA",), 2024, 2024)]
+    # The cached 2024 block also serves a read without a watermark; only 2022-2023 are fetched
+    df = store.get_features(["AAA"], columns=["rsi_14"])
+    assert reads[-1] == (("AAA",), 2022, 2023)
+    assert len(df) == len(pd.bdate_range("2022-12-26", "2024-01-05"))
@@ -0,0 +1,90 @@
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("mysql.connector")
+STORE = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "feature_store"))
+sys.path.insert(0, STORE)
+from indicators import FEATURE_COLUMNS, advance, advance_panel  # noqa: E402
+from technical_indicator import calculate_technical_indicators  # noqa: E402
+
+# feature_store/state.py would shadow decision_engine/state.py for later test modules
+sys.path[:] = [p for p in sys.path if os.path.abspath(p) != STORE]
+for _name, _module in list(sys.modules.items()):
+    if os.path.dirname(os.path.abspath(getattr(_module, "__file__", None) or "")) == STORE:
+        del sys.modules[_name]
+
+
+def closes(n, seed):
+    rng = np.random.default_rng(seed)
+    return 100 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+
+
+def panel(n=260):
+    """Four symbols: full history, a late listing, a halt and one with no bars until the end."""
+    p = np.column_stack([closes(n, seed) for seed in range(4)])
+    p[:40, 1] = np.nan
+    p[100:130, 2] = np.nan
+    p[:-5, 3] = np.nan
+    return p
+
+
+def saved(states):
+    # As stored in feature_state.state_json
+    return json.loads(json.dumps(states))
+
+
+def assert_same(a, b):
+    for column in FEATURE_COLUMNS:
+        np.testing.assert_allclose(a[column], b[column], rtol=1e-12, equal_nan=True, err_msg=column)
+
+
+@pytest.mark.parametrize("splits", [[1], [30], [120], [50, 51, 200], [259]])
+def test_resumed_panel_equals_one_shot(splits):
+    p = panel()
+    full, full_states = advance_panel(p)
+
+    parts, states = [], None
+    for lo, hi in zip([0] + splits, splits + [len(p)]):
+        values, states = advance_panel(p[lo:hi], saved(states) if states else None)
+        parts.append(values)
+    resumed = {c: np.vstack([part[c] for part in parts]) for c in FEATURE_COLUMNS}
+
+    assert_same(resumed, full)
+    assert saved(states) == saved(full_states)
+
+
+def test_single_symbol_advance_resumes_across_calls():
+    x = closes(120, seed=9)
+    full, _ = advance(x)
+
+    first, state = advance(x[:35])
+    second, state = advance(x[35:36], saved(state))
+    third, _ = advance(x[36:], saved(state))
+
+    assert_same({c: np.concatenate([first[c], second[c], third[c]]) for c in FEATURE_COLUMNS}, full)
+
+
+def test_column_subset_matches_the_full_run():
+    p = panel()
+    full, _ = advance_panel(p)
+    head, states = advance_panel(p[:100])
+    for columns in (["rsi_14"], ["macd_signal"], ["sma_20", "volatility_20d"]):
+        values, _ = advance_panel(p[100:], saved(states), columns)
+        assert sorted(values) == sorted(columns)
+        for column in columns:
+            np.testing.assert_allclose(values[column], full[column][100:], rtol=1e-12, equal_nan=True)
+
+
+def test_kernels_match_ta():
+    x = closes(300, seed=5)
+    expected = calculate_technical_indicators(pd.DataFrame({"close_price": x}))
+    values, _ = advance(x)
+
+    for column in FEATURE_COLUMNS:
+        np.testing.assert_allclose(values[column], expected[column].to_numpy(dtype=float),
+                                   rtol=1e-9, atol=1e-9, equal_nan=True, err_msg=column)
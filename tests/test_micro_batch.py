@@ -0,0 +1,83 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("mysql.connector")
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+from intraday.micro_batch import IntradayPipeline  # noqa: E402
+from providers import SyntheticProvider  # noqa: E402
+
+# micro_batch puts decision_engine on sys.path; its state.py would shadow feature_store/state.py
+ENGINE = os.path.abspath(os.path.join(ROOT, "decision_engine"))
+sys.path[:] = [p for p in sys.path if os.path.abspath(p) != ENGINE]
+for _name, _module in list(sys.modules.items()):
+    if os.path.dirname(os.path.abspath(getattr(_module, "__file__", None) or "")) == ENGINE:
+        del sys.modules[_name]
+
+
+class _Cursor:
+    def execute(self, query, params=None):
+        pass
+
+    def executemany(self, query, rows):
+        pass
+
+    def close(self):
+        pass
+
+
+class _Con:
+    def cursor(self):
+        return _Cursor()
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+def pipeline(symbols, started):
+    """IntradayPipeline on the synthetic provider with no strategies, writing nowhere."""
+    p = IntradayPipeline.__new__(IntradayPipeline)
+    p.interval, p.bar = "5m", pd.Timedelta(minutes=5)
+    p.provider = SyntheticProvider(seed=3)
+    p.strategies, p.plans, p.reason_bits = [], {}, {}
+    p.symbols = list(symbols)
+    p.timezone, p.warmup_days, p.latency_budget = "Asia/Kolkata", 1, 10.0
+    p.run_id, p.batch_no = "intraday_test", 0
+    p.con, p.states, p.started = _Con(), {}, started
+
+    written = []
+    p.write = lambda bars, features, decisions, new_states: written.append(features)
+    return p, written
+
+
+def test_micro_batches_equal_a_one_shot_computation():
+    symbols = ["SYN0001", "SYN0002", "NIFTY 50"]
+    start = pd.Timestamp("2024-01-03 10:02")
+    # Bar closes one at a time, a gap of several bars, and a poll with nothing new
+    polls = [start, start + pd.Timedelta(minutes=5), start + pd.Timedelta(minutes=6),
+             start + pd.Timedelta(minutes=40), start + pd.Timedelta(minutes=45)]
+
+    incremental, written = pipeline(symbols, start)
+    reports = [incremental.run_batch(now) for now in polls]
+    one_shot, expected = pipeline(symbols, start)
+    one_shot.run_batch(polls[-1])
+
+    assert reports[2]["bars"] == 0
+    assert sum(r["bars"] for r in reports) == len(expected[0])
+    got = pd.concat(written, ignore_index=True).sort_values(["stock_symbol", "bar_time"]).reset_index(drop=True)
+    want = expected[0].sort_values(["stock_symbol", "bar_time"]).reset_index(drop=True)
+    pd.testing.assert_frame_equal(got, want, check_exact=False, rtol=1e-9)
+
+    assert incremental.states.keys() == one_shot.states.keys()
+    for symbol, (last_bar, state) in one_shot.states.items():
+        assert incremental.states[symbol][0] == last_bar == pd.Timestamp("2024-01-03 10:40")
+        for name, value in state.items():
+            assert np.allclose(np.asarray(incremental.states[symbol][1][name], dtype=float),
+                               np.asarray(value, dtype=float), rtol=1e-9, equal_nan=True)
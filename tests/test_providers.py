@@ -0,0 +1,151 @@
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "ingestion"))
+from async_fetch import parse_chart  # noqa: E402
+from providers import OHLCV, ReplayProvider, SyntheticProvider  # noqa: E402
+
+
+def fixture(name):
+    with open(os.path.join(HERE, "fixtures", name + ".json")) as file:
+        return json.load(file)
+
+
+# ---------- parse_chart ----------
+def test_parse_chart_daily_is_indexed_by_trade_date():
+    df = parse_chart(fixture("chart_daily"), "1d")
+
+    assert list(df.columns) == OHLCV
+    assert list(df.index) == list(pd.to_datetime(["2024-01-02", "2024-01-03", "2024-01-04", "2024-01-05"]))
+    assert df.loc["2024-01-02", "Close"] == 2580.45
+    assert df.loc["2024-01-05", "Volume"] == 6001200
+    assert (df.dtypes == float).all()
+
+
+def test_parse_chart_null_quotes_become_nan():
+    df = parse_chart(fixture("chart_daily"), "1d")
+
+    assert df.loc["2024-01-04"].isna().all()
+    assert df.drop(pd.Timestamp("2024-01-04")).notna().all().all()
+
+
+def test_parse_chart_applies_gmtoffset_before_taking_the_date():
+    # Bars stamped 18:30 UTC belong to the next day on the exchange clock
+    df = parse_chart(fixture("chart_index_daily"), "1d")
+
+    assert list(df.index) == list(pd.to_datetime(["2024-01-02", "2024-01-03"]))
+    assert df["Close"].tolist() == [21665.8, 21517.35]
+
+
+def test_parse_chart_intraday_keeps_bar_start_on_exchange_clock():
+    df = parse_chart(fixture("chart_intraday_5m"), "5m")
+
+    assert list(df.index) == list(pd.to_datetime(["2024-01-02 09:15", "2024-01-02 09:20", "2024-01-02 09:25"]))
+    assert df.loc["2024-01-02 09:20", "Close"] == 2597.7
+    assert df.loc["2024-01-02 09:25", ["Open", "High", "Low", "Close"]].isna().all()
+    assert df.loc["2024-01-02 09:25", "Volume"] == 0
+
+
+def test_parse_chart_without_timestamps_is_empty():
+    df = parse_chart(fixture("chart_empty"), "1d")
+
+    assert df.empty
+    assert list(df.columns) == OHLCV
+
+
+# ---------- ReplayProvider ----------
+@pytest.fixture
+def recordings(tmp_path):
+    pd.DataFrame({
+        "Date": ["2024-01-03", "2024-01-02", "2024-01-04"],
+        "Open": [11, 10, 12], "High": [11.5, 10.5, 12.5], "Low": [10.5, 9.5, 11.5],
+        "Close": [11.2, 10.2, 12.2], "Volume": [200, 100, 300], "Adj Close": [0, 0, 0],
+    }).to_csv(tmp_path / "AAA.csv", index=False)
+    pd.DataFrame({
+        "trade_date": ["2024-01-02"], "Open": [1.0], "High": [1.0], "Low": [1.0], "Close": [1.0], "Volume": [0],
+    }).to_csv(tmp_path / "NIFTY 50.csv", index=False)
+    (tmp_path / "5m").mkdir()
+    pd.DataFrame({
+        "Datetime": ["2024-01-02 09:15", "2024-01-02 09:20", "2024-01-02 09:25"],
+        "Open": [10, 11, 12], "High": [10, 11, 12], "Low": [10, 11, 12], "Close": [10, 11, 12], "Volume": [1, 2, 3],
+    }).to_csv(tmp_path / "5m" / "AAA.csv", index=False)
+    return ReplayProvider(str(tmp_path), index_names=["NIFTY 50"])
+
+
+def test_replay_lists_equities_only(recordings):
+    assert recordings.list_symbols() == ["AAA"]
+
+
+def test_replay_daily_range_is_sorted_and_end_exclusive(recordings):
+    report = recordings.fetch(["AAA", "NIFTY 50"], "2024-01-02", "2024-01-04")
+
+    df = report.frames["AAA"]
+    assert list(df.columns) == OHLCV
+    assert list(df.index) == list(pd.to_datetime(["2024-01-02", "2024-01-03"]))
+    assert df["Close"].tolist() == [10.2, 11.2]
+    assert report.frames["NIFTY 50"]["Close"].tolist() == [1.0]
+    assert report.failed == {}
+    assert report.requests == 2
+
+
+def test_replay_intraday_reads_the_interval_folder(recordings):
+    report = recordings.fetch(["AAA"], "2024-01-02 09:20", "2024-01-02 09:30", "5m")
+
+    df = report.frames["AAA"]
+    assert list(df.index) == list(pd.to_datetime(["2024-01-02 09:20", "2024-01-02 09:25"]))
+    assert df["Close"].tolist() == [11.0, 12.0]
+
+
+def test_replay_reports_symbols_without_a_recording(recordings):
+    report = recordings.fetch(["AAA", "ZZZ"], "2024-01-02", "2024-01-05")
+
+    assert list(report.frames) == ["AAA"]
+    assert report.failed == {"ZZZ": "no recording"}
+
+
+# ---------- SyntheticProvider ----------
+def test_synthetic_universe():
+    assert SyntheticProvider(n_symbols=3).list_symbols() == ["SYN0001", "SYN0002", "SYN0003"]
+
+
+def test_synthetic_bars_do_not_depend_on_the_requested_range():
+    provider = SyntheticProvider(seed=7)
+    long = provider.fetch(["SYN0001"], "2020-01-01", "2024-01-01").frames["SYN0001"]
+    short = SyntheticProvider(seed=7).fetch(["SYN0001"], "2023-06-01", "2023-07-01").frames["SYN0001"]
+
+    pd.testing.assert_frame_equal(short, long.loc["2023-06-01":"2023-06-30"])
+    other = SyntheticProvider(seed=8).fetch(["SYN0001"], "2023-06-01", "2023-07-01").frames["SYN0001"]
+    assert not other.equals(short)
+
+
+def test_synthetic_daily_bars_are_consistent():
+    df = SyntheticProvider().fetch(["SYN0002", "NIFTY 50"], "2023-01-01", "2024-01-01").frames["SYN0002"]
+
+    assert list(df.columns) == OHLCV
+    assert (df.index.dayofweek < 5).all()
+    assert df.index.min() >= pd.Timestamp("2023-01-01") and df.index.max() < pd.Timestamp("2024-01-01")
+    assert (df["High"] >= df[["Open", "Close"]].max(axis=1)).all()
+    assert (df["Low"] <= df[["Open", "Close"]].min(axis=1)).all()
+    assert (df["Low"] > 0).all()
+
+
+def test_synthetic_intraday_slices_one_walk_per_day():
+    provider = SyntheticProvider()
+    day = provider.fetch(["SYN0001"], "2024-01-02", "2024-01-03", "5m").frames["SYN0001"]
+    part = provider.fetch(["SYN0001"], "2024-01-02 09:15", "2024-01-02 09:30", "5m").frames["SYN0001"]
+
+    assert len(day) == 24 * 12
+    assert list(part.index) == list(pd.date_range("2024-01-02 09:15", periods=3, freq="5min"))
+    pd.testing.assert_frame_equal(part, day.loc["2024-01-02 09:15":"2024-01-02 09:25"], check_freq=False)
+    assert np.allclose(day["Open"].to_numpy()[1:], day["Close"].to_numpy()[:-1])
+
+
+def test_synthetic_rejects_unsupported_intervals():
+    with pytest.raises(ValueError):
+        SyntheticProvider().fetch(["SYN0001"], "2024-01-01", "2024-02-01", "1wk")
@@ -0,0 +1,73 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+import yaml
+
+pytest.importorskip("mysql.connector")
+ENGINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "decision_engine")
+sys.path.insert(0, ENGINE)
+import sweep  # noqa: E402
+
+# decision_engine/state.py would shadow feature_store/state.py for later test modules
+sys.path.remove(ENGINE)
+for _name, _module in list(sys.modules.items()):
+    if _name != "sweep" and os.path.dirname(os.path.abspath(getattr(_module, "__file__", None) or "")) == os.path.abspath(ENGINE):
+        del sys.modules[_name]
+
+
+class _Con:
+    def close(self):
+        pass
+
+
+def test_load_matrix_merges_features_with_forward_returns(monkeypatch):
+    """Feature store frames (datetime64) join raw read_sql prices (datetime.date)."""
+    with open(os.path.join(ENGINE, "config.yml")) as file:
+        cfg = {k: v for k, v in yaml.safe_load(file).items() if k != "strategies"}
+    columns = sweep.compile_rules(cfg).features
+    days = pd.bdate_range("2024-01-01", periods=10)
+
+    features = pd.DataFrame({"stock_symbol": "AAA", "trade_date": days})
+    for i, column in enumerate(columns):
+        features[column] = float(i)
+    features["feature_run_id"] = "techind_test"
+
+    def read_sql(query, con, *args, **kwargs):
+        if "index_prices" in query:
+            return pd.DataFrame(columns=["stock_symbol", "trade_date", "close_price"])
+        return pd.DataFrame({"stock_symbol": "AAA", "trade_date": [d.date() for d in days],
+                             "close_price": [100.0 + i for i in range(len(days))]})
+
+    monkeypatch.setattr(sweep, "fetch_features", lambda cols: features)
+    monkeypatch.setattr(sweep, "_connect", _Con)
+    monkeypatch.setattr(sweep.pd, "read_sql", read_sql)
+
+    matrix, names = sweep.load_matrix(cfg, horizon=2)
+
+    assert names == columns + ["fwd_return"]
+    assert matrix.shape == (len(days) - 2, len(columns) + 1)
+    assert matrix[0, -1] == pytest.approx(102.0 / 100.0 - 1)
+
+
+def test_fetch_features_resumes_from_the_oldest_watermark(monkeypatch):
+    """A symbol resumes from its oldest watermark only when every config holds one."""
+    calls = []
+
+    def get_features(columns=None, since=None):
+        calls.append(since)
+        return pd.DataFrame({"stock_symbol": ["BBB", "AAA", "AAA"],
+                             "trade_date": pd.to_datetime(["2024-01-03", "2024-01-03", "2024-01-02"]),
+                             "rsi_14": [1.0, None, 2.0], "feature_run_id": "techind_a"})
+
+    monkeypatch.setitem(sweep.fetch_features.__globals__, "get_features", get_features)
+    watermarks = {"h1": {"AAA": "2024-01-05", "BBB": "2024-01-01"},
+                  "h2": {"AAA": "2024-01-02", "CCC": "2024-01-01"}}
+
+    df = sweep.fetch_features(["rsi_14"], watermarks)
+
+    assert calls == [{"AAA": "2024-01-02"}]
+    assert df["stock_symbol"].tolist() == ["AAA", "BBB"]
+    assert sweep.fetch_features(["rsi_14"], required=[])["stock_symbol"].tolist() == ["AAA", "AAA", "BBB"]
+    assert calls[-1] is None
@@ -0,0 +1,290 @@
+import multiprocessing
+import os
+import sys
+import time
+import uuid
+
+import pytest
+import yaml
+
+pytest.importorskip("mysql.connector")
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+import worker  # noqa: E402
+from db.background_writer import connection_factory  # noqa: E402
+from db.work_queue import WorkQueue  # noqa: E402
+
+# Several local worker processes through run_local. The coordination tests
+# run on FakeQueue, which keeps the work_shards rules (lease = first
+# PENDING-or-expired shard with attempts left, complete/fail only by the
+# lease owner) in a multiprocessing manager. The WorkQueue SQL tests need
+# a throwaway MySQL database: set NAIRS_TEST_DATABASE to its name (the
+# credentials come from config.yml); they are skipped otherwise.
+
+
+class FakeLease:
+    def __init__(self, run_id, stage, shard_no, payload, owner):
+        self.run_id = run_id
+        self.stage = stage
+        self.shard_no = shard_no
+        self.payload = payload
+        self.owner = owner
+
+    def release(self):
+        pass
+
+
+class FakeQueue:
+    """WorkQueue stand-in shared by forked workers. Leases are not renewed: a slow handler loses its lease."""
+
+    def __init__(self, manager, lease_seconds=30, max_attempts=3):
+        self.shards = manager.dict()
+        self.lock = manager.Lock()
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+    def ensure_table(self):
+        pass
+
+    def create_shards(self, run_id, stage, payloads):
+        with self.lock:
+            for i, payload in enumerate(payloads):
+                self.shards.setdefault((run_id, stage, i), {
+                    "status": "PENDING", "owner": None, "expires": 0.0, "attempts": 0,
+                    "payload": payload, "result": None, "error": None,
+                })
+
+    def _shards(self, run_id, stage):
+        return sorted((k, v) for k, v in self.shards.items() if k[:2] == (run_id, stage))
+
+    def lease(self, run_id, stage):
+        owner = f"{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        with self.lock:
+            now = time.time()
+            for key, shard in self._shards(run_id, stage):
+                expired = shard["status"] == "LEASED" and shard["expires"] < now
+                if shard["attempts"] < self.max_attempts and (shard["status"] == "PENDING" or expired):
+                    shard.update(status="LEASED", owner=owner, expires=now + self.lease_seconds,
+                                 attempts=shard["attempts"] + 1)
+                    self.shards[key] = shard
+                    return FakeLease(run_id, stage, key[2], shard["payload"], owner)
+        return None
+
+    def _finish(self, lease, **changes):
+        key = (lease.run_id, lease.stage, lease.shard_no)
+        with self.lock:
+            shard = self.shards[key]
+            if shard["status"] != "LEASED" or shard["owner"] != lease.owner:
+                return False
+            shard.update(changes)
+            self.shards[key] = shard
+            return True
+
+    def complete(self, lease, result=None):
+        return self._finish(lease, status="DONE", result=result)
+
+    def fail(self, lease, error):
+        key = (lease.run_id, lease.stage, lease.shard_no)
+        status = "FAILED" if self.shards[key]["attempts"] >= self.max_attempts else "PENDING"
+        return self._finish(lease, status=status, error=str(error), owner=None)
+
+    def expire_exhausted(self, run_id, stage):
+        with self.lock:
+            now = time.time()
+            for key, shard in self._shards(run_id, stage):
+                if shard["status"] == "LEASED" and shard["expires"] < now and shard["attempts"] >= self.max_attempts:
+                    shard.update(status="FAILED", error=shard["error"] or "lease expired", owner=None)
+                    self.shards[key] = shard
+
+    def stage_status(self, run_id, stage):
+        status = {}
+        for _, shard in self._shards(run_id, stage):
+            status[shard["status"]] = status.get(shard["status"], 0) + 1
+        return status
+
+    def results(self, run_id, stage):
+        return [s["result"] for _, s in self._shards(run_id, stage) if s["status"] == "DONE"]
+
+
+@pytest.fixture
+def manager():
+    with multiprocessing.Manager() as manager:
+        yield manager
+
+
+@pytest.fixture
+def harness(monkeypatch, manager):
+    """Two-stage run (ingest -> features) on a FakeQueue; returns (queue, log, rows, watermarks, failed_runs)."""
+    queue = FakeQueue(manager)
+    log, rows, crashed, failed_runs = manager.list(), manager.list(), manager.list(), manager.list()
+    watermarks = manager.dict()
+
+    def ingest(queue, run_id, payload):
+        log.append(("ingest", payload["shard_no"]))
+        return {"rows": len(payload["symbols"])}
+
+    def features(queue, run_id, payload):
+        # Like run_shard: symbols resume from their watermark, which commits with their rows
+        log.append(("features", payload["shard_no"]))
+        for symbol in payload["symbols"]:
+            if symbol in watermarks:
+                continue
+            if payload.get("crash_after") == symbol and symbol not in crashed:
+                crashed.append(symbol)
+                raise RuntimeError(f"crashed after writing up to {symbol}")
+            rows.extend([(symbol, day) for day in range(3)])
+            watermarks[symbol] = 2
+        return {"rows": len(payload["symbols"])}
+
+    monkeypatch.setattr(worker, "STAGES", ["ingest", "features"])
+    monkeypatch.setattr(worker, "HANDLERS", {"ingest": ingest, "features": features})
+    monkeypatch.setattr(worker, "make_queue", lambda: queue)
+    monkeypatch.setattr(worker, "worker_cfg", {"poll_seconds": 0.02})
+    monkeypatch.setattr(worker, "mark_failed", failed_runs.append)
+    return queue, log, rows, watermarks, failed_runs
+
+
+def plan(queue, run_id, n_shards, **features_payload):
+    queue.create_shards(run_id, "ingest", [{"symbols": [f"S{i}"]} for i in range(n_shards)])
+    queue.create_shards(run_id, "features", [
+        {"symbols": [f"S{i}a", f"S{i}b"], **features_payload} for i in range(n_shards)
+    ])
+
+
+def test_every_shard_completes_exactly_once(harness):
+    queue, log, rows, _, _ = harness
+    plan(queue, "run_a", 12)
+
+    assert worker.run_local("run_a", 4)
+
+    assert sorted(log) == sorted([(stage, i) for stage in ("ingest", "features") for i in range(12)])
+    assert queue.stage_status("run_a", "ingest") == {"DONE": 12}
+    assert queue.stage_status("run_a", "features") == {"DONE": 12}
+    assert len(rows) == len(set(rows)) == 12 * 2 * 3
+
+
+def test_features_shard_reruns_after_a_partial_write(harness):
+    queue, log, rows, watermarks, failed_runs = harness
+    plan(queue, "run_b", 4, crash_after="S2b")
+
+    assert worker.run_local("run_b", 3)
+
+    # Shard 2 failed once after committing S2a; the retry only writes S2b
+    assert log.count(("features", 2)) == 2
+    assert list(failed_runs) == []
+    assert queue.stage_status("run_b", "features") == {"DONE": 4}
+    assert len(rows) == len(set(rows)) == 4 * 2 * 3
+    assert sorted(watermarks.keys()) == sorted(f"S{i}{p}" for i in range(4) for p in "ab")
+
+
+def test_expired_lease_is_released_to_another_worker(harness, monkeypatch, manager):
+    queue, log, _, _, _ = harness
+    queue.lease_seconds = 0.2
+    stalled = manager.list()
+
+    def ingest(queue, run_id, payload):
+        log.append(("ingest", payload["shard_no"]))
+        if payload["shard_no"] == 0 and not stalled:
+            # A worker that stops heartbeating: its lease expires mid-shard
+            stalled.append(os.getpid())
+            time.sleep(1.0)
+        return {}
+
+    monkeypatch.setitem(worker.HANDLERS, "ingest", ingest)
+    plan(queue, "run_c", 3)
+
+    assert worker.run_local("run_c", 2)
+
+    assert log.count(("ingest", 0)) == 2
+    shard = queue.shards[("run_c", "ingest", 0)]
+    assert shard["status"] == "DONE" and shard["attempts"] == 2
+    assert not shard["owner"].startswith(f"{stalled[0]}:")
+
+
+def test_shard_fails_after_max_attempts(harness, monkeypatch):
+    queue, log, rows, _, failed_runs = harness
+
+    def ingest(queue, run_id, payload):
+        log.append(("ingest", payload["shard_no"]))
+        if payload["shard_no"] == 1:
+            raise ValueError("bad shard")
+        return {}
+
+    monkeypatch.setitem(worker.HANDLERS, "ingest", ingest)
+    plan(queue, "run_d", 3)
+
+    assert not worker.run_local("run_d", 2)
+
+    assert log.count(("ingest", 1)) == queue.max_attempts
+    assert queue.stage_status("run_d", "ingest") == {"DONE": 2, "FAILED": 1}
+    assert "bad shard" in queue.shards[("run_d", "ingest", 1)]["error"]
+    assert "run_d" in failed_runs
+    # The run stops before the next stage
+    assert queue.stage_status("run_d", "features") == {"PENDING": 3}
+    assert len(rows) == 0
+
+
+# ---------- WorkQueue SQL on a real database ----------
+TEST_DATABASE = os.environ.get("NAIRS_TEST_DATABASE")
+mysql_only = pytest.mark.skipif(not TEST_DATABASE, reason="NAIRS_TEST_DATABASE is not set")
+
+
+def sql_connect():
+    with open(os.path.join(ROOT, "config", "config.yml")) as file:
+        cfg = yaml.safe_load(file)["mysql"]
+    return connection_factory({**cfg, "database": TEST_DATABASE})
+
+
+def lease_all(run_id, n):
+    """Worker process body: lease (never complete) up to n shards, return their numbers."""
+    queue = WorkQueue(sql_connect(), lease_seconds=60)
+    leased = []
+    for _ in range(n):
+        lease = queue.lease(run_id, "ingest")
+        if lease is None:
+            break
+        lease.release()
+        leased.append(lease.shard_no)
+    return leased
+
+
+@pytest.fixture
+def sql_queue():
+    queue = WorkQueue(sql_connect(), lease_seconds=60, max_attempts=2)
+    queue.ensure_table()
+    run_id = f"TEST_{uuid.uuid4().hex[:8]}"
+    yield queue, run_id
+    queue._execute("DELETE FROM work_shards WHERE run_id=%s", (run_id,))
+
+
+@mysql_only
+def test_concurrent_leases_never_share_a_shard(sql_queue):
+    queue, run_id = sql_queue
+    queue.create_shards(run_id, "ingest", [{"n": i} for i in range(40)])
+
+    with multiprocessing.get_context("fork").Pool(6) as pool:
+        leased = [n for shard in pool.starmap(lease_all, [(run_id, 40)] * 6) for n in shard]
+
+    assert sorted(leased) == list(range(40))
+    assert queue.stage_status(run_id, "ingest") == {"LEASED": 40}
+
+
+@mysql_only
+def test_expired_lease_is_re_leased_then_fails_at_max_attempts(sql_queue):
+    queue, run_id = sql_queue
+    queue.lease_seconds = 1
+    queue.create_shards(run_id, "ingest", [{}])
+
+    first = queue.lease(run_id, "ingest")
+    first.release()
+    assert queue.lease(run_id, "ingest") is None
+    time.sleep(2.1)
+
+    second = queue.lease(run_id, "ingest")
+    second.release()
+    assert second.shard_no == first.shard_no
+    assert not queue.complete(first, {"stale": True})
+    assert queue.fail(second, "boom")
+
+    assert queue.lease(run_id, "ingest") is None
+    assert queue.stage_status(run_id, "ingest") == {"FAILED": 1}
@@ -0,0 +1,310 @@
+import os
+import subprocess
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+
+import yaml
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(ROOT, "ingestion"))
+sys.path.append(os.path.join(ROOT, "feature_store"))
+from db.background_writer import connection_factory
+from db.work_queue import WorkQueue
+from providers import get_provider
+from indices import configured_indices, sync_index_dimension
+from revisions import ensure_revisions_table
+from loader import load_symbols
+import technical_indicator
+
+python_exe = sys.executable
+
+with open(os.path.join(ROOT, 'config', 'config.yml'), 'r') as file:
+    config = yaml.safe_load(file)
+
+# =====================================================
+# COORDINATED WORKERS
+# =====================================================
+# `--plan` splits a run into shards in the `work_shards` table; any number
+# of `--run <run_id>` workers, on this host or others sharing the MySQL
+# instance, lease shards and work through the stages below in order. A
+# stage starts once every shard of the previous one is DONE. Shards of
+# a dead or stalled worker are re-leased when their lease expires; every
+# stage is safe to repeat (price upserts compare row hashes, feature
+# shards rewrite from their watermark).
+#
+# ingest           symbol shards: fetch + upsert prices, record revisions
+# quality          one shard: quality checks over the new bars
+# features_prepare one shard: feature tables/state, then the feature shards
+# features         symbol shards: incremental indicators (run_shard)
+# features_finish  one shard: backfills, cross-section, snapshot, run record
+# downstream       one shard: decisions and feedback
+
+STAGES = ["ingest", "quality", "features_prepare", "features", "features_finish", "downstream"]
+
+worker_cfg = config.get("workers", {})
+connect = connection_factory(config["mysql"])
+
+
+def make_queue():
+    return WorkQueue(connect, worker_cfg.get("lease_seconds", 300), worker_cfg.get("max_attempts", 3))
+
+
+def run_script(file):
+    """Run one pipeline script; its stderr becomes the shard error on failure."""
+    result = subprocess.run([python_exe, os.path.join(ROOT, file)], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{file} failed: {result.stderr.strip()[-1000:]}")
+    return {"warnings": bool(result.stderr.strip())}
+
+
+# =====================================================
+# STAGE HANDLERS (payload -> JSON-able result; raise to fail the shard)
+# =====================================================
+def ingest_shard(queue, run_id, payload):
+    index_names = set(payload["index_names"])
+    provider = get_provider(config, payload["provider"])
+    interval = config["market_data"]["interval"]
+    overlap_days = config["ingestion"].get("overlap_days", 5)
+
+    con = connect()
+    try:
+        cursor = con.cursor()
+        rows, revised, failed = 0, 0, {}
+        stocks = [s for s in payload["symbols"] if s not in index_names]
+        indices = [s for s in payload["symbols"] if s in index_names]
+        for symbols, table, key_column in ((stocks, "raw_prices", "stock_symbol"),
+                                           (indices, "index_prices", "index_name")):
+            if not symbols:
+                continue
+            new_rows, changed_rows, shard_revised, shard_failed = load_symbols(
+                con, cursor, provider, symbols, table, key_column,
+                payload["start_date"], payload["end_date"], interval, overlap_days, run_id, payload["full"]
+            )
+            rows += len(new_rows) + len(changed_rows)
+            revised += len(shard_revised)
+            failed.update(shard_failed)
+        con.commit()
+        cursor.close()
+    finally:
+        con.close()
+
+    for symbol, error in failed.items():
+        print(f"WARNING: {symbol} fetch failed: {error}", file=sys.stderr)
+    return {"rows": rows, "revised": revised, "failed": sorted(failed)}
+
+
+def quality_shard(queue, run_id, payload):
+    return run_script("quality_gate/quality_setup.py")
+
+
+def features_prepare_shard(queue, run_id, payload):
+    con = connect()
+    try:
+        symbols, revised, revision_ids, stale_columns = technical_indicator.prepare_features(
+            con, payload["incremental"]
+        )
+    finally:
+        con.close()
+
+    shards = technical_indicator.plan_shards(symbols, payload["feature_shards"])
+    queue.create_shards(run_id, "features", [
+        {"symbols": shard, "features_run_id": payload["features_run_id"],
+         "revised": {s: revised[s].isoformat() for s in shard if s in revised}}
+        for shard in shards
+    ])
+    return {"symbols": len(symbols), "shards": len(shards),
+            "revision_ids": list(revision_ids), "stale_columns": stale_columns}
+
+
+def features_shard(queue, run_id, payload):
+    report = technical_indicator.run_shard(
+        payload["shard_no"], payload["symbols"], payload["features_run_id"], payload["revised"]
+    )
+    for symbol, error in report["failed"]:
+        print(f"WARNING: {symbol} skipped: {error}", file=sys.stderr)
+    if report["error"]:
+        raise RuntimeError(report["error"])
+    first_date = report["first_date"].isoformat() if report["first_date"] else None
+    return {"rows": report["rows"], "first_date": first_date, "failed": len(report["failed"])}
+
+
+def features_finish_shard(queue, run_id, payload):
+    prepared, = queue.results(run_id, "features_prepare")
+    reports = queue.results(run_id, "features")
+    rows = sum(r["rows"] for r in reports)
+    new_dates = [date.fromisoformat(r["first_date"]) for r in reports if r["first_date"]]
+
+    con = connect()
+    try:
+        technical_indicator.finish_features(
+            con, payload["features_run_id"], rows, new_dates, payload["incremental"],
+            prepared["stale_columns"], prepared["revision_ids"]
+        )
+    finally:
+        con.close()
+    return {"rows": rows}
+
+
+def downstream_shard(queue, run_id, payload):
+    run_script("decision_engine/decision_setup.py")
+    run_script("feedback_system/feedback_setup.py")
+    ingested = sum(r["rows"] for r in queue.results(run_id, "ingest"))
+
+    con = connect()
+    try:
+        cursor = con.cursor()
+        cursor.execute("""
+            UPDATE ingestion_logs
+            SET end_time=%s, status=%s, records_loaded=%s
+            WHERE run_id=%s
+            """, (datetime.now(), "SUCCESS", ingested, run_id))
+        con.commit()
+        cursor.close()
+    finally:
+        con.close()
+    return {"ingested": ingested}
+
+
+HANDLERS = {
+    "ingest": ingest_shard,
+    "quality": quality_shard,
+    "features_prepare": features_prepare_shard,
+    "features": features_shard,
+    "features_finish": features_finish_shard,
+    "downstream": downstream_shard,
+}
+
+
+# =====================================================
+# PLAN / RUN
+# =====================================================
+def plan_run(provider_name=None, full=False, incremental=True):
+    """Create the shards of a new run and its ingestion_logs row. Returns the run id."""
+    run_id = f"SHARDED_{uuid.uuid4().hex[:8]}"
+    features_run_id = f"techind_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    market = config["market_data"]
+    end_date = date.today().isoformat() if market["end_date"].lower() == "today" else market["end_date"]
+
+    provider = get_provider(config, provider_name)
+    index_names = [i["name"] for i in configured_indices(config)]
+    universe = index_names + sorted(provider.list_symbols())
+    shard_size = worker_cfg.get("ingest_shard_size", 100)
+
+    queue = make_queue()
+    queue.ensure_table()
+    con = connect()
+    try:
+        ensure_revisions_table(con)
+        sync_index_dimension(con, config)
+        cursor = con.cursor()
+        cursor.execute("""
+        INSERT INTO ingestion_logs (run_id, pipeline_type, start_time, status)
+        VALUES (%s, %s, %s, %s)
+        """, (run_id, "sharded", datetime.now(), "RUNNING"))
+        con.commit()
+        cursor.close()
+    finally:
+        con.close()
+
+    queue.create_shards(run_id, "ingest", [
+        {"symbols": universe[i:i + shard_size], "index_names": index_names, "provider": provider_name,
+         "start_date": market["start_date"], "end_date": end_date, "full": full}
+        for i in range(0, len(universe), shard_size)
+    ])
+    single = {"features_run_id": features_run_id, "incremental": incremental,
+              "feature_shards": worker_cfg.get("feature_shards", 16)}
+    for stage in ("quality", "features_prepare", "features_finish", "downstream"):
+        queue.create_shards(run_id, stage, [single])
+
+    print(f"Planned {run_id}: {len(universe)} symbols in {-(-len(universe) // shard_size)} ingest shards "
+          f"(features run {features_run_id})")
+    return run_id
+
+
+def mark_failed(run_id):
+    con = connect()
+    try:
+        cursor = con.cursor()
+        cursor.execute("UPDATE ingestion_logs SET end_time=%s, status=%s WHERE run_id=%s",
+                       (datetime.now(), "FAILED", run_id))
+        con.commit()
+        cursor.close()
+    finally:
+        con.close()
+
+
+def work(run_id, worker_no=0):
+    """
+    Lease and run shards of `run_id` stage by stage until the run is done.
+    Returns False if a stage ended with FAILED shards.
+    """
+    queue = make_queue()
+    poll = worker_cfg.get("poll_seconds", 5)
+    tag = f"[worker {worker_no}]"
+
+    for stage in STAGES:
+        while True:
+            lease = queue.lease(run_id, stage)
+            if lease is not None:
+                payload = dict(lease.payload, shard_no=lease.shard_no)
+                started = time.monotonic()
+                try:
+                    result = HANDLERS[stage](queue, run_id, payload)
+                except Exception as e:
+                    queue.fail(lease, repr(e))
+                    print(f"{tag} {stage} shard {lease.shard_no} failed: {e!r}", file=sys.stderr)
+                    continue
+                if queue.complete(lease, result):
+                    print(f"{tag} {stage} shard {lease.shard_no} done in {time.monotonic() - started:.1f}s")
+                else:
+                    print(f"{tag} {stage} shard {lease.shard_no} lease lost; result discarded", file=sys.stderr)
+                continue
+
+            # Nothing leasable: wait for other workers' leases to finish or expire
+            queue.expire_exhausted(run_id, stage)
+            status = queue.stage_status(run_id, stage)
+            if status.get("FAILED"):
+                print(f"{tag} {stage}: {status['FAILED']} shards FAILED, stopping run {run_id}", file=sys.stderr)
+                mark_failed(run_id)
+                return False
+            if not status.get("PENDING") and not status.get("LEASED"):
+                break
+            time.sleep(poll)
+
+    print(f"{tag} run {run_id} complete")
+    return True
+
+
+def run_local(run_id, workers):
+    """`workers` worker processes on this host."""
+    if workers <= 1:
+        return work(run_id)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return all(pool.map(work, [run_id] * workers, range(workers)))
+
+
+if __name__ == "__main__":
+    # --plan [--provider <name>] [--full] [--full-features]   create a run, print its id
+    # --run <run_id>                                          work on an existing run
+    # --workers N   local worker processes (with --plan: plan, then work on it)
+    def arg(name, default=None):
+        return sys.argv[sys.argv.index(name) + 1] if name in sys.argv else default
+
+    workers = int(arg("--workers", 1))
+    if "--plan" in sys.argv:
+        run_id = plan_run(arg("--provider"), full="--full" in sys.argv,
+                          incremental="--full-features" not in sys.argv)
+        if "--workers" not in sys.argv:
+            print(run_id)
+            sys.exit(0)
+    elif "--run" in sys.argv:
+        run_id = arg("--run")
+    else:
+        print("Usage: python worker.py --plan [--workers N] | --run <run_id> [--workers N]")
+        sys.exit(2)
+
+    if not run_local(run_id, workers):
+        sys.exit(1)